@@ -12,6 +12,8 @@ import subprocess
 import sys
 
 DIR_OF_THIS_SCRIPT = p.dirname( p.abspath( __file__ ) )
+DIR_OF_THIRD_PARTY = p.join( DIR_OF_THIS_SCRIPT, 'third_party' )
+DIR_OF_WATCHDOG_DEPS = p.join( DIR_OF_THIRD_PARTY, 'watchdog_deps' )
 
 
 def ParseArguments():
@@ -19,6 +21,10 @@ def ParseArguments():
   parser.add_argument( '--msvc', type = int, choices = [ 14, 15, 16 ],
                        default = 16, help = 'Choose the Microsoft Visual '
                        'Studio version (default: %(default)s).' )
+  parser.add_argument( '--python', nargs = '*', metavar = 'BENCHMARK',
+                       help = 'Run the benchmarks of the Python code (all of '
+                       'them if none is given) instead of building and running '
+                       'the C++ benchmarks. ycmd must already be built.' )
 
   return parser.parse_known_args()
 
@@ -37,9 +43,27 @@ def BuildYcmdLibsAndRunBenchmark( args, extra_args ):
   subprocess.check_call( build_cmd )
 
 
+def RunPythonBenchmarks( benchmarks ):
+  python_path = [
+    DIR_OF_THIS_SCRIPT,
+    p.join( DIR_OF_THIRD_PARTY, 'regex-build' ),
+    p.join( DIR_OF_WATCHDOG_DEPS, 'watchdog', 'build', 'lib3' ),
+    p.join( DIR_OF_WATCHDOG_DEPS, 'pathtools' ),
+  ]
+  if os.environ.get( 'PYTHONPATH' ) is not None:
+    python_path.append( os.environ[ 'PYTHONPATH' ] )
+  os.environ[ 'PYTHONPATH' ] = os.pathsep.join( python_path )
+
+  subprocess.check_call( [ sys.executable, '-m', 'ycmd.benchmarks' ] +
+                         benchmarks )
+
+
 def Main():
   args, extra_args = ParseArguments()
-  BuildYcmdLibsAndRunBenchmark( args, extra_args )
+  if args.python is not None:
+    RunPythonBenchmarks( args.python )
+  else:
+    BuildYcmdLibsAndRunBenchmark( args, extra_args )
 
 
 if __name__ == "__main__":
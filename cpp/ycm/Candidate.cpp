@@ -18,60 +18,129 @@
 #include "Candidate.h"
 #include "Result.h"
 
+#include <algorithm>
+#include <new>
+
 namespace YouCompleteMe {
 
-void Candidate::ComputeCaseSwappedText() {
-  for ( const auto &character : Characters() ) {
-    case_swapped_text_.append( character->SwappedCase() );
+namespace {
+
+bool IsWordBoundaryChar( const CharacterSequence &characters,
+                        size_t position ) {
+  const auto &character = characters[ position ];
+  if ( position == 0 ) {
+    return !character->IsPunctuation();
   }
+
+  const auto &previous_character = characters[ position - 1 ];
+  return ( !previous_character->IsUppercase() && character->IsUppercase() ) ||
+         ( previous_character->IsPunctuation() && character->IsLetter() );
 }
 
 
-void Candidate::ComputeWordBoundaryChars() {
-  const CharacterSequence &characters = Characters();
+void DeleteFeatures( const void *features ) {
+  delete[] static_cast< const char * >( features );
+}
 
-  auto character_pos = characters.begin();
-  if ( character_pos == characters.end() ) {
-    return;
-  }
+} // unnamed namespace
 
-  const auto &first_character = *character_pos;
-  if ( !first_character->IsPunctuation() ) {
-    word_boundary_chars_.push_back( first_character );
-  }
 
-  auto previous_character_pos = characters.begin();
-  ++character_pos;
-  for ( ; character_pos != characters.end(); ++previous_character_pos,
-                                             ++character_pos ) {
-    const auto &previous_character = *previous_character_pos;
-    const auto &character = *character_pos;
+Candidate::Candidate( std::string&& text )
+  : Word( std::move( text ) ),
+    features_( nullptr ) {
+}
 
-    if ( ( !previous_character->IsUppercase() && character->IsUppercase() ) ||
-         ( previous_character->IsPunctuation() && character->IsLetter() ) ) {
-      word_boundary_chars_.push_back( character );
-    }
+
+Candidate::Candidate( const Candidate &other )
+  : Word( other ),
+    features_( nullptr ) {
+  const Features *features = other.features_.load( std::memory_order_acquire );
+  if ( features ) {
+    char *data = new char[ features->Size() ];
+    std::copy( reinterpret_cast< const char * >( features ),
+               reinterpret_cast< const char * >( features ) + features->Size(),
+               data );
+    features_.store( reinterpret_cast< const Features * >( data ),
+                     std::memory_order_relaxed );
   }
 }
 
 
-void Candidate::ComputeTextIsLowercase() {
-  for ( const auto &character : Characters() ) {
+Candidate::Candidate( Candidate &&other ) noexcept
+  : Word( std::move( other ) ),
+    features_( other.features_.exchange( nullptr,
+                                         std::memory_order_acq_rel ) ) {
+}
+
+
+Candidate& Candidate::operator=( Candidate &&other ) noexcept {
+  Word::operator=( std::move( other ) );
+  DeleteFeatures( features_.exchange(
+    other.features_.exchange( nullptr, std::memory_order_acq_rel ),
+    std::memory_order_acq_rel ) );
+  return *this;
+}
+
+
+Candidate::~Candidate() {
+  DeleteFeatures( features_.load( std::memory_order_relaxed ) );
+}
+
+
+const Candidate::Features *Candidate::ComputeFeatures() const {
+  const CharacterSequence &characters = Characters();
+
+  // Positions are stored on 16 bits. Characters past the first 65535 are never
+  // word boundary characters; Repository< Candidate > does not store texts
+  // nearly that long anyway.
+  size_t num_positioned_characters = std::min< size_t >( characters.size(),
+                                                         UINT16_MAX );
+
+  // Size the features first to build them in a single allocation.
+  Features header{ 0, 0, true };
+  for ( size_t position = 0; position < characters.size(); ++position ) {
+    const auto &character = characters[ position ];
+    header.case_swapped_text_size += character->SwappedCase().size();
     if ( character->IsUppercase() ) {
-      text_is_lowercase_ = false;
-      return;
+      header.text_is_lowercase = false;
+    }
+    if ( position < num_positioned_characters &&
+         IsWordBoundaryChar( characters, position ) ) {
+      ++header.num_word_boundary_chars;
     }
   }
 
-  text_is_lowercase_ = true;
-}
+  char *data = new char[ header.Size() ];
+  auto features = new ( data ) Features( header );
 
+  auto position_pos =
+    const_cast< uint16_t * >( features->WordBoundaryCharPositions() );
+  for ( size_t position = 0; position < num_positioned_characters;
+        ++position ) {
+    if ( IsWordBoundaryChar( characters, position ) ) {
+      *position_pos++ = static_cast< uint16_t >( position );
+    }
+  }
 
-Candidate::Candidate( std::string&& text )
-  : Word( std::move( text ) ) {
-  ComputeCaseSwappedText();
-  ComputeWordBoundaryChars();
-  ComputeTextIsLowercase();
+  auto case_swapped_text_pos =
+    const_cast< char * >( features->CaseSwappedText() );
+  for ( const auto &character : characters ) {
+    const std::string &swapped_case = character->SwappedCase();
+    case_swapped_text_pos = std::copy( swapped_case.begin(),
+                                       swapped_case.end(),
+                                       case_swapped_text_pos );
+  }
+
+  // Another thread may have computed the features in the meantime.
+  const Features *expected = nullptr;
+  if ( !features_.compare_exchange_strong( expected,
+                                           features,
+                                           std::memory_order_acq_rel,
+                                           std::memory_order_acquire ) ) {
+    DeleteFeatures( features );
+    return expected;
+  }
+  return features;
 }
 
 
@@ -20,49 +20,133 @@
 
 #include "Word.h"
 
-#include <memory>
+#include <atomic>
+#include <cstdint>
 #include <string>
+#include <string_view>
 
 namespace YouCompleteMe {
 
 class Result;
 
+// Characters of a word at the given positions, without copying them.
+class CharacterSubsequence {
+public:
+  CharacterSubsequence( const CharacterSequence &characters,
+                        const uint16_t *positions,
+                        size_t size )
+    : characters_( characters ),
+      positions_( positions ),
+      size_( size ) {
+  }
+
+  inline size_t size() const {
+    return size_;
+  }
+
+  inline const Character *operator[]( size_t index ) const {
+    return characters_[ positions_[ index ] ];
+  }
+
+private:
+  const CharacterSequence &characters_;
+  const uint16_t *positions_;
+  size_t size_;
+};
+
+
+// The features of a candidate used to rank it are computed the first time they
+// are requested, since most candidates never match a query. Threads requesting
+// them concurrently may each compute them, but only the first result is
+// published, so reading them never takes a lock.
 class Candidate : public Word {
 public:
 
   YCM_EXPORT explicit Candidate( std::string&& text );
   // Make class noncopyable
 private:
-  Candidate( const Candidate& ) = default;
-  Candidate& operator=( const Candidate& ) = default;
+  YCM_EXPORT Candidate( const Candidate &other );
+  Candidate& operator=( const Candidate& ) = delete;
 public:
   Candidate clone() const { return *this; }
-  Candidate( Candidate&& ) = default;
-  Candidate& operator=( Candidate&& ) = default;
-  ~Candidate() = default;
+  YCM_EXPORT Candidate( Candidate &&other ) noexcept;
+  YCM_EXPORT Candidate& operator=( Candidate &&other ) noexcept;
+  YCM_EXPORT ~Candidate();
 
-  inline const std::string &CaseSwappedText() const {
-    return case_swapped_text_;
+  inline std::string_view CaseSwappedText() const {
+    const Features &features = GetFeatures();
+    return { features.CaseSwappedText(), features.case_swapped_text_size };
   }
 
-  inline const CharacterSequence &WordBoundaryChars() const {
-    return word_boundary_chars_;
+  inline size_t NumWordBoundaryChars() const {
+    return GetFeatures().num_word_boundary_chars;
+  }
+
+  // Positions in Characters() of the word boundary characters.
+  inline const uint16_t *WordBoundaryCharPositions() const {
+    return GetFeatures().WordBoundaryCharPositions();
+  }
+
+  inline CharacterSubsequence WordBoundaryChars() const {
+    const Features &features = GetFeatures();
+    return { Characters(),
+             features.WordBoundaryCharPositions(),
+             features.num_word_boundary_chars };
   }
 
   inline bool TextIsLowercase() const {
-    return text_is_lowercase_;
+    return GetFeatures().text_is_lowercase;
+  }
+
+  // Whether the features have been computed. Only useful for testing.
+  inline bool HasFeatures() const {
+    return features_.load( std::memory_order_acquire ) != nullptr;
+  }
+
+  // Approximate number of bytes used by this object.
+  inline size_t MemoryUsage() const {
+    const Features *features = features_.load( std::memory_order_acquire );
+    return Word::MemoryUsage() - sizeof( Word ) + sizeof( Candidate ) +
+           ( features ? features->Size() : 0 );
   }
 
   YCM_EXPORT Result QueryMatchResult( const Word &query ) const;
 
 private:
-  void ComputeCaseSwappedText();
-  void ComputeTextIsLowercase();
-  void ComputeWordBoundaryChars();
+  // Header of a single allocation, followed by the word boundary character
+  // positions and then the case-swapped text.
+  struct Features {
+    uint32_t case_swapped_text_size;
+    uint16_t num_word_boundary_chars;
+    bool text_is_lowercase;
+
+    inline const uint16_t *WordBoundaryCharPositions() const {
+      return reinterpret_cast< const uint16_t * >( this + 1 );
+    }
+
+    inline const char *CaseSwappedText() const {
+      return reinterpret_cast< const char * >(
+        WordBoundaryCharPositions() + num_word_boundary_chars );
+    }
+
+    inline size_t Size() const {
+      return sizeof( Features ) +
+             num_word_boundary_chars * sizeof( uint16_t ) +
+             case_swapped_text_size;
+    }
+  };
+
+  inline const Features &GetFeatures() const {
+    const Features *features = features_.load( std::memory_order_acquire );
+    if ( !features ) {
+      features = ComputeFeatures();
+    }
+    return *features;
+  }
+
+  YCM_EXPORT const Features *ComputeFeatures() const;
 
-  std::string case_swapped_text_;
-  CharacterSequence word_boundary_chars_;
-  bool text_is_lowercase_;
+  mutable std::atomic< const Features * > features_;
 };
 
 } // namespace YouCompleteMe
@@ -18,6 +18,8 @@
 #ifndef CHARACTER_H_YTIET2HZ
 #define CHARACTER_H_YTIET2HZ
 
+#include "Utils.h"
+
 #include <string>
 #include <string_view>
 #include <vector>
@@ -40,19 +42,19 @@ public:
   Character( Character&& ) = default;
   Character& operator=( Character&& ) = default;
 
-  inline std::string Normal() const {
+  inline const std::string &Normal() const {
     return normal_;
   }
 
-  inline std::string Base() const {
+  inline const std::string &Base() const {
     return base_;
   }
 
-  inline std::string FoldedCase() const {
+  inline const std::string &FoldedCase() const {
     return folded_case_;
   }
 
-  inline std::string SwappedCase() const {
+  inline const std::string &SwappedCase() const {
     return swapped_case_;
   }
 
@@ -60,6 +62,15 @@ public:
     return is_base_;
   }
 
+  // Approximate number of bytes used by this object.
+  inline size_t MemoryUsage() const {
+    return sizeof( Character ) +
+           HeapMemoryUsage( normal_ ) +
+           HeapMemoryUsage( base_ ) +
+           HeapMemoryUsage( folded_case_ ) +
+           HeapMemoryUsage( swapped_case_ );
+  }
+
   inline bool IsLetter() const {
     return is_letter_;
   }
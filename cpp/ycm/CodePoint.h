@@ -18,6 +18,8 @@
 #ifndef CODE_POINT_H_3W0LNCLY
 #define CODE_POINT_H_3W0LNCLY
 
+#include "Utils.h"
+
 #include <stdexcept>
 #include <string>
 #include <vector>
@@ -94,6 +96,14 @@ public:
     return normal_;
   }
 
+  // Approximate number of bytes used by this object.
+  inline size_t MemoryUsage() const {
+    return sizeof( CodePoint ) +
+           HeapMemoryUsage( normal_ ) +
+           HeapMemoryUsage( folded_case_ ) +
+           HeapMemoryUsage( swapped_case_ );
+  }
+
   inline std::string FoldedCase() const {
     return folded_case_;
   }
@@ -84,6 +84,7 @@ void IdentifierDatabase::AddSingleIdentifier(
   std::string&& filepath ) {
   std::lock_guard locker( filetype_candidate_map_mutex_ );
   std::vector< std::string > candidate_vector( 1 );
+  auto lease = candidate_repository_.Acquire();
   auto candidate_pointer = candidate_repository_.GetElements(
          { new_candidate } )[ 0 ];
   auto& current_identifier_set = GetCandidateSet( std::move( filetype ),
@@ -129,7 +130,7 @@ std::vector< Result > IdentifierDatabase::ResultsForQueryAndType(
            CandidateHasher,
            CandidateCompareEq > seen_candidates;
   seen_candidates.reserve( candidate_repository_.NumStoredElements() );
-  std::vector< Result > results;
+  TopKSelector< Result > results( max_results );
 
   {
     std::lock_guard locker( filetype_candidate_map_mutex_ );
@@ -148,14 +149,13 @@ std::vector< Result > IdentifierDatabase::ResultsForQueryAndType(
         Result result = candidate.QueryMatchResult( query_object );
 
         if ( result.IsSubsequence() ) {
-          results.push_back( result );
+          results.Push( std::move( result ) );
         }
       }
     }
   }
 
-  PartialSort( results, max_results );
-  return results;
+  return results.TakeSorted();
 }
 
 
@@ -178,6 +178,7 @@ void IdentifierDatabase::RecreateIdentifiersNoLock(
 
   auto& current_identifier_set = GetCandidateSet( std::move( filetype ),
                                                   std::move( filepath ) );
+  auto lease = candidate_repository_.Acquire();
   auto candidate_pointers = candidate_repository_.GetElements(
                   std::move( new_candidates ) );
   current_identifier_set.clear();
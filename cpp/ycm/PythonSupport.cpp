@@ -21,6 +21,8 @@
 #include "Result.h"
 #include "Utils.h"
 
+#include <algorithm>
+#include <thread>
 #include <utility>
 #include <vector>
 
@@ -28,6 +30,14 @@ namespace YouCompleteMe {
 
 namespace {
 
+// Minimum number of candidates scored by each thread. Below twice this number,
+// candidates are scored on the calling thread as the cost of starting threads
+// outweighs the gain.
+constexpr size_t MIN_CANDIDATES_PER_THREAD = 16384;
+
+// Maximum number of threads scoring candidates.
+constexpr size_t MAX_THREADS = 8;
+
 std::vector< const Candidate * > CandidatesFromObjectList(
   const pybind11::list& candidates,
   pybind11::str candidate_property,
@@ -51,6 +61,88 @@ std::vector< const Candidate * > CandidatesFromObjectList(
            std::move( candidate_strings ) );
 }
 
+
+// Scores the candidates in [|begin|, |end|) of |candidates| against |query| and
+// returns the |max_candidates| best matching ones (all of them if
+// |max_candidates| is 0), sorted.
+std::vector< ResultAnd< size_t > > ScoreCandidates(
+  const std::vector< const Candidate * > &candidates,
+  const Word &query,
+  size_t begin,
+  size_t end,
+  size_t max_candidates ) {
+
+  TopKSelector< ResultAnd< size_t > > result_and_objects( max_candidates );
+  for ( size_t i = begin; i < end; ++i ) {
+    const Candidate *candidate = candidates[ i ];
+
+    if ( candidate->IsEmpty() || !candidate->ContainsBytes( query ) ) {
+      continue;
+    }
+
+    Result result = candidate->QueryMatchResult( query );
+
+    if ( result.IsSubsequence() ) {
+      result_and_objects.Push( ResultAnd< size_t >( result, i ) );
+    }
+  }
+
+  return result_and_objects.TakeSorted();
+}
+
+
+size_t NumScoringThreads( size_t num_candidates ) {
+  size_t hardware_threads = std::thread::hardware_concurrency();
+  return std::max( size_t{ 1 },
+                   std::min( { hardware_threads,
+                               MAX_THREADS,
+                               num_candidates / MIN_CANDIDATES_PER_THREAD } ) );
+}
+
+
+// Splits the scoring of |candidates| across worker threads, each keeping its
+// own top |max_candidates| results, then merges these results.
+std::vector< ResultAnd< size_t > > ScoreCandidatesInParallel(
+  const std::vector< const Candidate * > &candidates,
+  const Word &query,
+  size_t max_candidates,
+  size_t num_threads ) {
+
+  size_t num_candidates = candidates.size();
+  std::vector< std::vector< ResultAnd< size_t > > > thread_results(
+    num_threads );
+  std::vector< std::thread > workers;
+  workers.reserve( num_threads - 1 );
+
+  auto score_chunk = [ & ]( size_t chunk ) {
+    thread_results[ chunk ] = ScoreCandidates(
+      candidates,
+      query,
+      num_candidates * chunk / num_threads,
+      num_candidates * ( chunk + 1 ) / num_threads,
+      max_candidates );
+  };
+
+  for ( size_t chunk = 1; chunk < num_threads; ++chunk ) {
+    workers.emplace_back( score_chunk, chunk );
+  }
+  // The calling thread scores the first chunk.
+  score_chunk( 0 );
+  for ( auto &worker : workers ) {
+    worker.join();
+  }
+
+  // Merge the results of each chunk, in order, and keep the best ones.
+  TopKSelector< ResultAnd< size_t > > result_and_objects( max_candidates );
+  for ( auto &chunk_results : thread_results ) {
+    for ( auto &result_and_object : chunk_results ) {
+      result_and_objects.Push( std::move( result_and_object ) );
+    }
+  }
+
+  return result_and_objects.TakeSorted();
+}
+
 } // unnamed namespace
 
 
@@ -61,6 +153,8 @@ pybind11::list FilterAndSortCandidates(
   const size_t max_candidates ) {
 
   auto num_candidates = size_t( PyList_GET_SIZE( candidates.ptr() ) );
+  // Keeps the repository candidates alive until they are scored.
+  auto lease = Repository< Candidate >::Instance().Acquire();
   std::vector< const Candidate * > repository_candidates =
     CandidatesFromObjectList( candidates,
                               std::move( candidate_property ),
@@ -71,21 +165,19 @@ pybind11::list FilterAndSortCandidates(
     pybind11::gil_scoped_release unlock;
     Word query_object( std::move( query ) );
 
-    for ( size_t i = 0; i < num_candidates; ++i ) {
-      const Candidate *candidate = repository_candidates[ i ];
-
-      if ( candidate->IsEmpty() || !candidate->ContainsBytes( query_object ) ) {
-        continue;
-      }
-
-      Result result = candidate->QueryMatchResult( query_object );
-
-      if ( result.IsSubsequence() ) {
-        result_and_objects.emplace_back( result, i );
-      }
+    size_t num_threads = NumScoringThreads( num_candidates );
+    if ( num_threads > 1 ) {
+      result_and_objects = ScoreCandidatesInParallel( repository_candidates,
+                                                      query_object,
+                                                      max_candidates,
+                                                      num_threads );
+    } else {
+      result_and_objects = ScoreCandidates( repository_candidates,
+                                            query_object,
+                                            0,
+                                            num_candidates,
+                                            max_candidates );
     }
-
-    PartialSort( result_and_objects, max_candidates );
   }
 
   pybind11::list filtered_candidates( result_and_objects.size() );
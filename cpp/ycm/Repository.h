@@ -36,22 +36,135 @@ template< typename K, typename V >
 using HashMap = std::unordered_map< K, V >;
 } // namespace YouCompleteMe
 #endif
+#include <algorithm>
 #include <memory>
+#include <mutex>
+#include <new>
 #include <shared_mutex>
 #include <string>
+#include <utility>
 #include <vector>
 
 namespace YouCompleteMe {
 
+// Default maximum memory used by the elements of Repository< Candidate >
+// before the least recently used ones are evicted. Every string filtered
+// through FilterAndSortCandidates is stored there.
+//
+// Repository< Character > and Repository< CodePoint > have no maximum: their
+// elements are referenced by the Words of every Candidate, including the
+// copies kept by the IdentifierDatabase, which outlive any lease. Their size is
+// bounded by the number of distinct characters and code points in the
+// candidates, which does not grow with the number of candidates.
+constexpr size_t MAX_CANDIDATE_REPOSITORY_MEMORY = 64 * 1024 * 1024;
+
+
+// Allocates T objects in contiguous blocks of ELEMENTS_PER_BLOCK slots instead
+// of one heap allocation per object, so that elements requested together are
+// stored next to each other. The slots of destroyed elements are reused.
+// Destroying the arena does not destroy the elements it holds.
+//
+// This class is not thread-safe.
+template< typename T >
+class ElementArena {
+  struct Slot {
+    alignas( T ) unsigned char storage[ sizeof( T ) ];
+  };
+
+public:
+  static constexpr size_t ELEMENTS_PER_BLOCK = 1024;
+
+  template< typename... Args >
+  T *Create( Args&&... args ) {
+    Slot *slot;
+    if ( !free_slots_.empty() ) {
+      slot = free_slots_.back();
+      free_slots_.pop_back();
+    } else {
+      if ( blocks_.empty() || num_used_in_last_block_ == ELEMENTS_PER_BLOCK ) {
+        blocks_.push_back( std::make_unique< Slot[] >( ELEMENTS_PER_BLOCK ) );
+        num_used_in_last_block_ = 0;
+      }
+      slot = &blocks_.back()[ num_used_in_last_block_++ ];
+    }
+    return new ( slot->storage ) T( std::forward< Args >( args )... );
+  }
+
+  void Destroy( T *element ) {
+    element->~T();
+    free_slots_.push_back( reinterpret_cast< Slot * >( element ) );
+  }
+
+  // Releases all the blocks. The elements must have been destroyed.
+  void Clear() {
+    blocks_.clear();
+    free_slots_.clear();
+    num_used_in_last_block_ = 0;
+  }
+
+  // Number of bytes allocated for the slots, used or not.
+  size_t MemoryUsage() const {
+    return blocks_.size() * ELEMENTS_PER_BLOCK * sizeof( Slot ) +
+           HeapMemoryUsage( free_slots_ );
+  }
+
+private:
+  std::vector< std::unique_ptr< Slot[] > > blocks_;
+  std::vector< Slot * > free_slots_;
+  size_t num_used_in_last_block_ = 0;
+};
+
+
 // This singleton stores already built T objects. If Ts are requested for
 // previously unseen strings, new T objects are built.
 //
+// When the memory used by the stored elements exceeds the maximum set by
+// SetMaxMemoryUsage, the least recently requested elements are evicted. Since
+// evicted elements are destroyed, users of a repository with a maximum memory
+// must hold the Lease returned by Acquire while using the elements returned by
+// GetElements. Eviction happens when the first lease is acquired, when the last
+// one is released, and in GetElements when at most one lease is held. The
+// elements requested since that lease was acquired are never evicted, so a
+// single lease requesting more elements than fit in the maximum memory exceeds
+// it until the lease is released.
+//
 // This class is thread-safe.
 template< typename T >
 class Repository {
+  struct Entry {
+    // Owned by element_arena_.
+    T *element;
+    // Value of generation_ when the element was last requested.
+    size_t last_used;
+    // Including the key and the element.
+    size_t memory_usage;
+    size_t element_memory_usage;
+  };
+
 public:
-  using Holder = HashMap< std::string, std::unique_ptr< T > >;
+  using Holder = HashMap< std::string, Entry >;
   using Sequence = std::vector< const T* >;
+
+  // Guarantees that the elements requested while it is held are not evicted.
+  class Lease {
+  public:
+    explicit Lease( Repository &repository )
+      : repository_( &repository ) {
+    }
+    Lease( Lease &&other ) noexcept
+      : repository_( std::exchange( other.repository_, nullptr ) ) {
+    }
+    Lease &operator=( Lease&& ) = delete;
+    ~Lease() {
+      if ( repository_ ) {
+        repository_->Release();
+      }
+    }
+
+  private:
+    Repository *repository_;
+  };
+
   static Repository &Instance() {
     static Repository repo;
     return repo;
@@ -65,6 +178,42 @@ public:
     return element_holder_.size();
   }
 
+  // Approximate number of bytes used by the stored elements.
+  size_t MemoryUsage() const {
+    std::shared_lock locker( element_holder_mutex_ );
+    return memory_usage_;
+  }
+
+  size_t NumEvictedElements() const {
+    std::shared_lock locker( element_holder_mutex_ );
+    return num_evicted_elements_;
+  }
+
+  size_t MaxMemoryUsage() const {
+    std::shared_lock locker( element_holder_mutex_ );
+    return max_memory_usage_;
+  }
+
+  // Sets the memory, in bytes, above which elements are evicted. 0 means
+  // elements are never evicted. Only Repository< Candidate > may evict its
+  // elements; see MAX_CANDIDATE_REPOSITORY_MEMORY.
+  void SetMaxMemoryUsage( size_t max_memory_usage ) {
+    std::lock_guard locker( element_holder_mutex_ );
+    max_memory_usage_ = max_memory_usage;
+  }
+
+  // Evicts the least recently requested elements if the stored elements use
+  // more memory than allowed and no lease is held, then returns a lease
+  // guaranteeing that the elements requested while it is held are not evicted.
+  Lease Acquire() {
+    std::lock_guard locker( element_holder_mutex_ );
+    if ( num_leases_++ == 0 ) {
+      EvictElementsNoLock( generation_ );
+      lease_generation_ = generation_;
+    }
+    return Lease( *this );
+  }
+
   Sequence GetElements(
     std::vector< std::string >&& elements ) {
     Sequence element_objects( elements.size() );
@@ -72,6 +221,7 @@ public:
   
     {
       std::lock_guard locker( element_holder_mutex_ );
+      ++generation_;
   
       for ( auto&& element : elements ) {
         if constexpr ( std::is_same_v< T, Candidate > ) {
@@ -79,16 +229,33 @@ public:
             element = "";
           }
         }
-        std::unique_ptr< T > &element_object = GetValueElseInsert(
-                                                           element_holder_,
-                                                           element,
-                                                           nullptr );
+        Entry &entry = GetValueElseInsert( element_holder_,
+                                           element,
+                                           Entry{ nullptr, 0, 0, 0 } );
   
-        if ( !element_object ) {
-          element_object = std::make_unique< T >( std::move( element ) );
+        if ( !entry.element ) {
+          entry.memory_usage = sizeof( typename Holder::value_type ) +
+                               HeapMemoryUsage( element );
+          memory_usage_ += entry.memory_usage;
+          entry.element = element_arena_.Create( std::move( element ) );
         }
+        // Also accounts for the memory used since the element was last
+        // requested, e.g. by the lazily computed features of a Candidate.
+        size_t element_memory_usage = entry.element->MemoryUsage();
+        entry.memory_usage += element_memory_usage -
+                              entry.element_memory_usage;
+        memory_usage_ += element_memory_usage - entry.element_memory_usage;
+        entry.element_memory_usage = element_memory_usage;
+        entry.last_used = generation_;
   
-        *it++ = element_object.get();
+        *it++ = entry.element;
+      }
+
+      // Scanning the elements again for every holder of concurrent leases
+      // would be wasted: none of the elements they requested can be evicted.
+      if ( num_leases_ <= 1 ) {
+        EvictElementsNoLock( num_leases_ == 0 ? generation_ - 1 :
+                                                lease_generation_ );
       }
     }
   
@@ -97,16 +264,88 @@ public:
 
   // This should only be used to isolate tests and benchmarks.
   void ClearElements() {
-    element_holder_.clear();
+    std::lock_guard locker( element_holder_mutex_ );
+    DestroyElementsNoLock();
+    memory_usage_ = 0;
+    num_evicted_elements_ = 0;
   }
 
 private:
-  Repository() = default;
-  ~Repository() = default;
+  Repository()
+    : max_memory_usage_( std::is_same_v< T, Candidate > ?
+                         MAX_CANDIDATE_REPOSITORY_MEMORY : 0 ) {
+  }
+  ~Repository() {
+    DestroyElementsNoLock();
+  }
+
+  void Release() {
+    std::lock_guard locker( element_holder_mutex_ );
+    if ( --num_leases_ == 0 ) {
+      EvictElementsNoLock( generation_ );
+    }
+  }
 
-  // This data structure owns all the T pointers
+  void DestroyElementsNoLock() {
+    for ( auto& [ text, entry ] : element_holder_ ) {
+      element_arena_.Destroy( entry.element );
+    }
+    element_holder_.clear();
+    element_arena_.Clear();
+  }
+
+  // Evicts the least recently requested elements, among those last requested
+  // at or before |last_evictable_generation|, until the stored elements use at
+  // most three quarters of the maximum memory, so that eviction does not run
+  // again on the next request. The caller must hold the element_holder_mutex_
+  // exclusively.
+  void EvictElementsNoLock( size_t last_evictable_generation ) {
+    if ( max_memory_usage_ == 0 || memory_usage_ <= max_memory_usage_ ) {
+      return;
+    }
+
+    std::vector< std::pair< size_t, const std::string * > > entries;
+    entries.reserve( element_holder_.size() );
+    for ( const auto& [ text, entry ] : element_holder_ ) {
+      if ( entry.last_used <= last_evictable_generation ) {
+        entries.emplace_back( entry.last_used, &text );
+      }
+    }
+    std::sort( entries.begin(), entries.end() );
+
+    size_t target_memory_usage = max_memory_usage_ / 4 * 3;
+    std::vector< std::string > evicted_texts;
+    for ( const auto& [ last_used, text ] : entries ) {
+      if ( memory_usage_ <= target_memory_usage ) {
+        break;
+      }
+      memory_usage_ -= element_holder_.find( *text )->second.memory_usage;
+      evicted_texts.push_back( *text );
+    }
+
+    // Erasing invalidates the pointers to the keys.
+    for ( const auto &text : evicted_texts ) {
+      auto entry = element_holder_.find( text );
+      element_arena_.Destroy( entry->second.element );
+      element_holder_.erase( entry );
+    }
+    num_evicted_elements_ += evicted_texts.size();
+  }
+
+  // Maps the texts to their elements, which are stored in element_arena_.
   Holder element_holder_;
+  ElementArena< T > element_arena_;
   mutable std::shared_mutex element_holder_mutex_;
+
+  size_t num_leases_ = 0;
+  // Value of generation_ when the oldest lease still held was acquired, or
+  // older. Elements requested after it may be in use.
+  size_t lease_generation_ = 0;
+
+  size_t generation_ = 0;
+  size_t memory_usage_ = 0;
+  size_t max_memory_usage_;
+  size_t num_evicted_elements_ = 0;
 };
 
 extern template class YCM_EXPORT Repository< Candidate >;
@@ -22,11 +22,9 @@ namespace YouCompleteMe {
 
 namespace {
 
-size_t LongestCommonSubsequenceLength( const CharacterSequence &first,
-                                       const CharacterSequence &second ) {
-  const auto &longer  = first.size() > second.size() ? first  : second;
-  const auto &shorter = first.size() > second.size() ? second : first;
-
+template< typename Longer, typename Shorter >
+size_t OrderedLongestCommonSubsequenceLength( const Longer &longer,
+                                              const Shorter &shorter ) {
   size_t longer_len  = longer.size();
   size_t shorter_len = shorter.size();
 
@@ -51,6 +49,16 @@ size_t LongestCommonSubsequenceLength( const CharacterSequence &first,
 }
 
 
+size_t LongestCommonSubsequenceLength(
+  const CharacterSequence &query,
+  const CharacterSubsequence &word_boundary_chars ) {
+  if ( query.size() > word_boundary_chars.size() ) {
+    return OrderedLongestCommonSubsequenceLength( query, word_boundary_chars );
+  }
+  return OrderedLongestCommonSubsequenceLength( word_boundary_chars, query );
+}
+
+
 } // unnamed namespace
 
 Result::Result( const Candidate *candidate,
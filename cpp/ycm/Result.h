@@ -47,7 +47,7 @@ public:
   }
 
   inline size_t NumWordBoundaryChars() const {
-    return candidate_->WordBoundaryChars().size();
+    return candidate_->NumWordBoundaryChars();
   }
 
   inline bool IsSubsequence() const {
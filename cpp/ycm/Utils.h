@@ -25,6 +25,7 @@
 #include <string>
 #include <string_view>
 #include <type_traits>
+#include <utility>
 #include <vector>
 
 namespace fs = std::filesystem;
@@ -58,6 +59,20 @@ YCM_EXPORT inline std::string Lowercase( std::string_view text ) {
 }
 
 
+// Returns the number of bytes allocated on the heap by |text|. Short strings
+// are stored inline and do not allocate.
+inline size_t HeapMemoryUsage( const std::string &text ) {
+  static const size_t inline_capacity = std::string().capacity();
+  return text.capacity() > inline_capacity ? text.capacity() + 1 : 0;
+}
+
+
+template <typename Element>
+size_t HeapMemoryUsage( const std::vector< Element > &elements ) {
+  return elements.capacity() * sizeof( Element );
+}
+
+
 // Reads the entire contents of the specified file. If the file does not exist,
 // an exception is thrown.
 std::vector< std::string > ReadUtf8File( const fs::path &filepath );
@@ -112,43 +127,58 @@ bool Erase( Container &container, const Key &key ) {
 }
 
 
-// Shrink a vector to its sorted |num_sorted_elements| smallest elements. If
-// |num_sorted_elements| is 0 or larger than the vector size, sort the whole
-// vector.
+// Selects the |max_elements| smallest elements of a stream of elements without
+// storing the others. If |max_elements| is 0, all the elements are kept. The
+// selected elements are kept in a max-heap so that an element that cannot
+// replace the largest selected one is rejected with a single comparison.
 template <typename Element>
-void PartialSort( std::vector< Element > &elements,
-                  const size_t num_sorted_elements ) {
-
-  using diff = typename std::vector< Element >::iterator::difference_type;
-  size_t nb_elements = elements.size();
-  size_t max_elements = num_sorted_elements > 0 &&
-                        nb_elements >= num_sorted_elements ?
-                        num_sorted_elements : nb_elements;
-
-  // When the number of elements to sort is more than 1024 and one sixty-fourth
-  // of the total number of elements, switch to std::nth_element followed by
-  // std::sort. This heuristic is based on the observation that
-  // std::partial_sort (heapsort) is the most efficient algorithm when the
-  // number of elements to sort is small and that std::nth_element (introselect)
-  // combined with std::sort (introsort) always perform better than std::sort
-  // alone in other cases.
-  if ( max_elements <= std::max( static_cast< size_t >( 1024 ),
-                                 nb_elements / 64 ) ) {
-    std::partial_sort( elements.begin(),
-                       elements.begin() + static_cast< diff >( max_elements ),
-                       elements.end() );
-  } else {
-    std::nth_element( elements.begin(),
-                      elements.begin() + static_cast< diff >( max_elements ),
-                      elements.end() );
-    std::sort( elements.begin(), elements.begin() + static_cast< diff >( max_elements ) );
+class TopKSelector {
+public:
+  explicit TopKSelector( size_t max_elements )
+    : max_elements_( max_elements ) {
   }
 
-  // Remove the unsorted elements. Use erase instead of resize as it doesn't
-  // require a default constructor on Element.
-  elements.erase( elements.begin() + static_cast< diff >( max_elements ),
-                  elements.end() );
-}
+  void Push( Element &&element ) {
+    if ( max_elements_ == 0 ) {
+      elements_.push_back( std::move( element ) );
+      return;
+    }
+
+    if ( elements_.size() < max_elements_ ) {
+      elements_.push_back( std::move( element ) );
+      std::push_heap( elements_.begin(), elements_.end() );
+      return;
+    }
+
+    if ( !( element < elements_.front() ) ) {
+      return;
+    }
+
+    std::pop_heap( elements_.begin(), elements_.end() );
+    elements_.back() = std::move( element );
+    std::push_heap( elements_.begin(), elements_.end() );
+  }
+
+  size_t Size() const {
+    return elements_.size();
+  }
+
+  // Returns the selected elements in sorted order. The selector is left empty.
+  std::vector< Element > TakeSorted() {
+    std::vector< Element > elements;
+    elements.swap( elements_ );
+    if ( max_elements_ == 0 ) {
+      std::sort( elements.begin(), elements.end() );
+    } else {
+      std::sort_heap( elements.begin(), elements.end() );
+    }
+    return elements;
+  }
+
+private:
+  size_t max_elements_;
+  std::vector< Element > elements_;
+};
 
 } // namespace YouCompleteMe
 
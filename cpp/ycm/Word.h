@@ -68,6 +68,13 @@ public:
     return characters_.empty();
   }
 
+  // Approximate number of bytes used by this object.
+  inline size_t MemoryUsage() const {
+    return sizeof( Word ) +
+           HeapMemoryUsage( text_ ) +
+           HeapMemoryUsage( characters_ );
+  }
+
 private:
   void BreakIntoCharacters();
   void ComputeBytesPresent();
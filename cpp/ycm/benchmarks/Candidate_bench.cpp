@@ -0,0 +1,87 @@
+// Copyright (C) 2026 ycmd contributors
+//
+// This file is part of ycmd.
+//
+// ycmd is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// ycmd is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+#include "BenchUtils.h"
+#include "Repository.h"
+#include "IdentifierCompleter.h"
+
+#include <benchmark/benchmark.h>
+
+namespace YouCompleteMe {
+
+// Candidates compute their ranking features on the first query that matches
+// them. These benchmarks measure separately the cost of ingesting candidates
+// and of the first query on them.
+class CandidateFixture : public benchmark::Fixture {
+public:
+  void SetUp( const benchmark::State& ) {
+    Repository< Candidate >::Instance().ClearElements();
+    Repository< Character >::Instance().ClearElements();
+    Repository< CodePoint >::Instance().ClearElements();
+  }
+};
+
+
+BENCHMARK_DEFINE_F( CandidateFixture, IngestCandidates )(
+    benchmark::State& state ) {
+
+  std::vector< std::string > candidates =
+    GenerateCandidatesWithCommonPrefix( "a_A_a_", state.range( 0 ) );
+
+  for ( auto _ : state ) {
+    state.PauseTiming();
+    Repository< Candidate >::Instance().ClearElements();
+    std::vector< std::string > copied_candidates = candidates;
+    state.ResumeTiming();
+    IdentifierCompleter completer( std::move( copied_candidates ) );
+    benchmark::DoNotOptimize( completer );
+  }
+
+  state.SetComplexityN( state.range( 0 ) );
+}
+
+
+BENCHMARK_DEFINE_F( CandidateFixture, FirstQuery )(
+    benchmark::State& state ) {
+
+  std::vector< std::string > candidates =
+    GenerateCandidatesWithCommonPrefix( "a_A_a_", state.range( 0 ) );
+
+  for ( auto _ : state ) {
+    state.PauseTiming();
+    Repository< Candidate >::Instance().ClearElements();
+    std::vector< std::string > copied_candidates = candidates;
+    IdentifierCompleter completer( std::move( copied_candidates ) );
+    state.ResumeTiming();
+    benchmark::DoNotOptimize( completer.CandidatesForQuery( "aA", 10 ) );
+  }
+
+  state.SetComplexityN( state.range( 0 ) );
+}
+
+
+BENCHMARK_REGISTER_F( CandidateFixture, IngestCandidates )
+    ->RangeMultiplier( 1 << 4 )
+    ->Range( 1, 1 << 16 )
+    ->Complexity();
+
+BENCHMARK_REGISTER_F( CandidateFixture, FirstQuery )
+    ->RangeMultiplier( 1 << 4 )
+    ->Range( 1, 1 << 16 )
+    ->Complexity();
+
+} // namespace YouCompleteMe
@@ -119,4 +119,22 @@ BENCHMARK_REGISTER_F( PythonSupportFixture,
     ->Ranges( { { 1, 1 << 16 }, { 50, 50 } } )
     ->Complexity();
 
+// Large candidate lists are scored on several threads. Measure the wall-clock
+// time since the CPU time only accounts for the calling thread.
+BENCHMARK_REGISTER_F( PythonSupportFixture,
+                      FilterAndSortUnstoredCandidatesWithCommonPrefix )
+    ->Args( { 100000, 50 } )
+    ->Args( { 1000000, 50 } )
+    ->Unit( benchmark::kMillisecond )
+    ->UseRealTime();
+
+BENCHMARK_REGISTER_F( PythonSupportFixture,
+                      FilterAndSortStoredCandidatesWithCommonPrefix )
+    ->Args( { 100000, 0 } )
+    ->Args( { 100000, 50 } )
+    ->Args( { 1000000, 0 } )
+    ->Args( { 1000000, 50 } )
+    ->Unit( benchmark::kMillisecond )
+    ->UseRealTime();
+
 } // namespace YouCompleteMe
@@ -20,6 +20,8 @@
 #include "Candidate.h"
 #include "Result.h"
 
+#include <thread>
+
 namespace YouCompleteMe {
 
 class CandidateRepositoryTest : public ::testing::Test {
@@ -32,6 +34,10 @@ protected:
     repo_.ClearElements();
   }
 
+  virtual void TearDown() {
+    repo_.SetMaxMemoryUsage( MAX_CANDIDATE_REPOSITORY_MEMORY );
+  }
+
   Repository< Candidate > &repo_;
 };
 
@@ -83,6 +89,151 @@ TEST_F( CandidateRepositoryTest, NonPrintableCandidates ) {
   EXPECT_EQ( "\x01\x05\x0a\x15", candidates[ 0 ]->Text() );
 }
 
+TEST_F( CandidateRepositoryTest, MemoryAccounting ) {
+  EXPECT_EQ( 0U, repo_.MemoryUsage() );
+
+  repo_.GetElements( { "foo" } );
+  size_t memory_usage = repo_.MemoryUsage();
+  EXPECT_GT( memory_usage, sizeof( Candidate ) );
+
+  // Already stored.
+  repo_.GetElements( { "foo" } );
+  EXPECT_EQ( memory_usage, repo_.MemoryUsage() );
+
+  repo_.GetElements( { "a_much_longer_candidate_than_foo" } );
+  EXPECT_GT( repo_.MemoryUsage(), 2 * memory_usage );
+
+  repo_.ClearElements();
+  EXPECT_EQ( 0U, repo_.MemoryUsage() );
+}
+
+
+TEST_F( CandidateRepositoryTest, MemoryAccountingOfFeatures ) {
+  const Candidate *candidate = repo_.GetElements( { "FooBar" } )[ 0 ];
+  size_t memory_usage = repo_.MemoryUsage();
+
+  // The features are accounted for the next time the candidate is requested.
+  candidate->CaseSwappedText();
+  EXPECT_EQ( memory_usage, repo_.MemoryUsage() );
+  repo_.GetElements( { "FooBar" } );
+  EXPECT_GT( repo_.MemoryUsage(), memory_usage );
+  memory_usage = repo_.MemoryUsage();
+
+  repo_.GetElements( { "FooBar" } );
+  EXPECT_EQ( memory_usage, repo_.MemoryUsage() );
+}
+
+
+TEST_F( CandidateRepositoryTest, EvictLeastRecentlyUsed ) {
+  repo_.GetElements( { "first" } );
+  size_t memory_usage = repo_.MemoryUsage();
+  repo_.SetMaxMemoryUsage( 4 * memory_usage );
+
+  repo_.GetElements( { "secnd" } );
+  repo_.GetElements( { "third" } );
+  repo_.GetElements( { "forth" } );
+  // Request the first one again.
+  repo_.GetElements( { "first" } );
+  EXPECT_EQ( 4U, repo_.NumStoredElements() );
+
+  // Evicts down to 3 elements, starting with the least recently used ones.
+  repo_.GetElements( { "fifth" } );
+  EXPECT_EQ( 3U, repo_.NumStoredElements() );
+  EXPECT_EQ( 2U, repo_.NumEvictedElements() );
+  EXPECT_EQ( 3 * memory_usage, repo_.MemoryUsage() );
+
+  // Evicted elements are built again.
+  const Candidate *candidate = repo_.GetElements( { "secnd" } )[ 0 ];
+  EXPECT_EQ( 4U, repo_.NumStoredElements() );
+  EXPECT_EQ( "secnd", candidate->Text() );
+}
+
+
+TEST_F( CandidateRepositoryTest, EvictOlderElementsWhileLeased ) {
+  repo_.GetElements( { "first" } );
+  size_t memory_usage = repo_.MemoryUsage();
+  repo_.SetMaxMemoryUsage( 2 * memory_usage );
+  repo_.GetElements( { "secnd" } );
+
+  {
+    auto lease = repo_.Acquire();
+    std::vector< const Candidate * > candidates =
+      repo_.GetElements( { "third", "forth", "fifth" } );
+
+    // Only the elements requested before the lease was acquired are evicted.
+    EXPECT_EQ( 3U, repo_.NumStoredElements() );
+    EXPECT_EQ( 2U, repo_.NumEvictedElements() );
+    EXPECT_EQ( "third", candidates[ 0 ]->Text() );
+    EXPECT_EQ( "forth", candidates[ 1 ]->Text() );
+    EXPECT_EQ( "fifth", candidates[ 2 ]->Text() );
+  }
+
+  // Releasing the lease evicts the elements it used.
+  EXPECT_EQ( 1U, repo_.NumStoredElements() );
+  EXPECT_EQ( 4U, repo_.NumEvictedElements() );
+}
+
+
+TEST_F( CandidateRepositoryTest, NoEvictionWhileLeased ) {
+  repo_.GetElements( { "first" } );
+  repo_.SetMaxMemoryUsage( repo_.MemoryUsage() );
+
+  auto lease = repo_.Acquire();
+  const Candidate *candidate = repo_.GetElements( { "secnd" } )[ 0 ];
+  EXPECT_EQ( 1U, repo_.NumStoredElements() );
+
+  // Another lease does not evict the elements in use.
+  std::thread( [ this ]() {
+    auto other_lease = repo_.Acquire();
+    repo_.GetElements( { "third" } );
+  } ).join();
+  EXPECT_EQ( 2U, repo_.NumStoredElements() );
+  EXPECT_EQ( "secnd", candidate->Text() );
+}
+
+
+TEST( ElementArenaTest, ElementsAreContiguous ) {
+  ElementArena< Candidate > arena;
+  Candidate *first = arena.Create( "first" );
+  Candidate *second = arena.Create( "second" );
+
+  EXPECT_EQ( first + 1, second );
+  EXPECT_EQ( "first", first->Text() );
+  EXPECT_EQ( "second", second->Text() );
+
+  arena.Destroy( first );
+  arena.Destroy( second );
+}
+
+
+TEST( ElementArenaTest, DestroyedSlotsAreReused ) {
+  ElementArena< Candidate > arena;
+  Candidate *first = arena.Create( "first" );
+  arena.Destroy( first );
+  Candidate *second = arena.Create( "second" );
+
+  EXPECT_EQ( first, second );
+  EXPECT_EQ( "second", second->Text() );
+
+  arena.Destroy( second );
+}
+
+
+TEST( ElementArenaTest, NewBlockWhenFull ) {
+  ElementArena< CodePoint > arena;
+  std::vector< CodePoint * > code_points;
+  for ( size_t i = 0; i <= ElementArena< CodePoint >::ELEMENTS_PER_BLOCK;
+        ++i ) {
+    code_points.push_back( arena.Create( "a" ) );
+  }
+  EXPECT_EQ( 2 * ElementArena< CodePoint >::ELEMENTS_PER_BLOCK *
+             sizeof( CodePoint ),
+             arena.MemoryUsage() );
+
+  for ( auto code_point : code_points ) {
+    arena.Destroy( code_point );
+  }
+}
 
 } // namespace YouCompleteMe
 
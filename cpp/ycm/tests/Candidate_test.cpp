@@ -20,6 +20,8 @@
 
 #include <gtest/gtest.h>
 #include <gmock/gmock.h>
+#include <thread>
+#include <vector>
 
 using ::testing::Not;
 
@@ -29,8 +31,13 @@ MATCHER_P( HasWordBoundaryCharacters,
            boundary_chars,
            std::string( negation ? "has not" : "has" ) +
            " word boundary characters " + boundary_chars ) {
-  return Candidate( arg ).WordBoundaryChars() ==
-         Word( boundary_chars ).Characters();
+  Candidate candidate( arg );
+  auto word_boundary_chars = candidate.WordBoundaryChars();
+  CharacterSequence characters;
+  for ( size_t i = 0; i < word_boundary_chars.size(); ++i ) {
+    characters.push_back( word_boundary_chars[ i ] );
+  }
+  return characters == Word( boundary_chars ).Characters();
 }
 
 TEST( WordBoundaryCharsTest, SimpleOneWord ) {
@@ -148,6 +155,67 @@ TEST( CandidateTest, TextValid ) {
   EXPECT_EQ( "foo", Candidate( "foo" ).Text() );
 }
 
+TEST( CandidateTest, CaseSwappedText ) {
+  EXPECT_EQ( "",          Candidate( "" ).CaseSwappedText() );
+  EXPECT_EQ( "fOObAR",    Candidate( "FooBar" ).CaseSwappedText() );
+  EXPECT_EQ( "σΣ_Foo",    Candidate( "Σσ_fOO" ).CaseSwappedText() );
+}
+
+TEST( CandidateTest, FeaturesComputedOnFirstUse ) {
+  Candidate candidate( "FooBar" );
+  EXPECT_FALSE( candidate.HasFeatures() );
+  size_t memory_usage = candidate.MemoryUsage();
+
+  EXPECT_FALSE( candidate.TextIsLowercase() );
+  EXPECT_TRUE( candidate.HasFeatures() );
+  EXPECT_GT( candidate.MemoryUsage(), memory_usage );
+}
+
+TEST( CandidateTest, FeaturesComputedConcurrently ) {
+  Candidate candidate( "simple_FooBar" );
+
+  std::vector< const uint16_t * > positions( 8 );
+  std::vector< std::thread > threads;
+  for ( size_t i = 0; i < positions.size(); ++i ) {
+    threads.emplace_back( [ &candidate, &positions, i ]() {
+      positions[ i ] = candidate.WordBoundaryCharPositions();
+    } );
+  }
+  for ( auto &thread : threads ) {
+    thread.join();
+  }
+
+  // Every thread sees the same published features.
+  for ( const auto *position : positions ) {
+    EXPECT_EQ( candidate.WordBoundaryCharPositions(), position );
+  }
+  EXPECT_EQ( 3U, candidate.NumWordBoundaryChars() );
+}
+
+TEST( CandidateTest, MoveKeepsFeatures ) {
+  Candidate candidate( "FooBar" );
+  std::string_view case_swapped_text = candidate.CaseSwappedText();
+
+  Candidate moved( std::move( candidate ) );
+  EXPECT_TRUE( moved.HasFeatures() );
+  EXPECT_EQ( case_swapped_text.data(), moved.CaseSwappedText().data() );
+  EXPECT_EQ( "fOObAR", moved.CaseSwappedText() );
+}
+
+TEST( CandidateTest, CloneKeepsFeatures ) {
+  Candidate candidate( "simple_FooBar" );
+  Candidate clone = candidate.clone();
+
+  EXPECT_EQ( candidate.Text(), clone.Text() );
+  EXPECT_EQ( candidate.CaseSwappedText(), clone.CaseSwappedText() );
+  EXPECT_EQ( candidate.TextIsLowercase(), clone.TextIsLowercase() );
+  ASSERT_EQ( 3U, clone.NumWordBoundaryChars() );
+  for ( size_t i = 0; i < clone.NumWordBoundaryChars(); ++i ) {
+    EXPECT_EQ( candidate.WordBoundaryChars()[ i ],
+               clone.WordBoundaryChars()[ i ] );
+  }
+}
+
 MATCHER_P( IsSubsequence,
            candidate,
            std::string( negation ? "is not" : "is" ) + " a subsequence of " +
@@ -46,5 +46,27 @@ TEST( UtilsTest, Lowercase ) {
   EXPECT_EQ( Lowercase( "lOwER_CasE" ), "lower_case" );
 }
 
+TEST( UtilsTest, TopKSelector ) {
+  TopKSelector< int > selector( 3 );
+  for ( int element : { 5, 1, 4, 1, 3, 9, 2, 6 } ) {
+    selector.Push( std::move( element ) );
+  }
+  EXPECT_EQ( selector.Size(), 3U );
+  EXPECT_EQ( selector.TakeSorted(), ( std::vector< int >{ 1, 1, 2 } ) );
+  EXPECT_EQ( selector.Size(), 0U );
+
+  // Fewer elements than the limit.
+  selector.Push( 7 );
+  selector.Push( 3 );
+  EXPECT_EQ( selector.TakeSorted(), ( std::vector< int >{ 3, 7 } ) );
+}
+
+TEST( UtilsTest, TopKSelector_Unbounded ) {
+  TopKSelector< int > selector( 0 );
+  for ( int element : { 5, 1, 4, 1, 3 } ) {
+    selector.Push( std::move( element ) );
+  }
+  EXPECT_EQ( selector.TakeSorted(), ( std::vector< int >{ 1, 1, 3, 4, 5 } ) );
+}
 
 } // namespace YouCompleteMe
@@ -19,6 +19,7 @@
 #include "CodePoint.h"
 #include "IdentifierCompleter.h"
 #include "PythonSupport.h"
+#include "Repository.h"
 #include "versioning.h"
 
 #ifdef USE_CLANG_COMPLETER
@@ -46,6 +47,25 @@ static bool HasClangSupport() {
 #endif // USE_CLANG_COMPLETER
 }
 
+template< typename T >
+static py::dict RepositoryStatistics() {
+  const auto &repository = Repository< T >::Instance();
+  py::dict statistics;
+  statistics[ "elements" ] = repository.NumStoredElements();
+  statistics[ "memory_bytes" ] = repository.MemoryUsage();
+  statistics[ "max_memory_bytes" ] = repository.MaxMemoryUsage();
+  statistics[ "evicted_elements" ] = repository.NumEvictedElements();
+  return statistics;
+}
+
+static py::dict RepositoriesStatistics() {
+  py::dict statistics;
+  statistics[ "candidates" ] = RepositoryStatistics< Candidate >();
+  statistics[ "characters" ] = RepositoryStatistics< Character >();
+  statistics[ "code_points" ] = RepositoryStatistics< CodePoint >();
+  return statistics;
+}
+
 PYBIND11_MAKE_OPAQUE( std::vector< std::string > )
 #ifdef USE_CLANG_COMPLETER
 PYBIND11_MAKE_OPAQUE( std::vector< UnsavedFile > )
@@ -69,6 +89,8 @@ PYBIND11_MODULE( ycm_core, mod )
 
   mod.def( "YcmCoreVersion", &YcmCoreVersion );
 
+  mod.def( "RepositoriesStatistics", &RepositoriesStatistics );
+
   // This is exposed so that we can test it.
   mod.def( "GetUtf8String", []( py::object o ) -> py::bytes {
                                   return GetUtf8String( o ); } );
@@ -47,6 +47,7 @@ import logging
 import json
 import argparse
 import signal
+import socket
 import base64
 
 from ycmd import extra_conf_store, user_options_store, utils
@@ -55,7 +56,9 @@ from ycmd.utils import ( ImportAndCheckCore,
                          OpenForStdHandle,
                          ReadFile,
                          ToBytes )
-from ycmd.wsgi_server import StoppableWSGIServer
+from ycmd.wsgi_server import ( DEFAULT_WORKER_THREADS,
+                               PooledWSGIServer,
+                               StoppableWSGIServer )
 
 
 def YcmCoreSanityCheck():
@@ -111,6 +114,9 @@ def ParseArguments():
   # Default of 0 will make the OS pick a free port for us
   parser.add_argument( '--port', type = int, default = 0,
                        help = 'server port' )
+  parser.add_argument( '--unix_socket', type = str, default = None,
+                       help = 'path of a Unix domain socket to listen on '
+                              'instead of --host and --port' )
   parser.add_argument( '--log', type = str, default = 'info',
                        help = 'log level, one of '
                               '[debug|info|warning|error|critical]' )
@@ -127,7 +133,19 @@ def ParseArguments():
                        help = 'optional file to use for stderr' )
   parser.add_argument( '--keep_logfiles', action = 'store_true', default = None,
                        help = 'retain logfiles after the server exits' )
-  return parser.parse_args()
+  parser.add_argument( '--wsgi_server', type = str, default = 'threaded',
+                       choices = [ 'threaded', 'pooled' ],
+                       help = 'threaded: a new thread and connection for '
+                              'each request; pooled: a fixed pool of worker '
+                              'threads and persistent connections' )
+  parser.add_argument( '--worker_threads', type = int,
+                       default = DEFAULT_WORKER_THREADS,
+                       help = 'number of worker threads of the pooled server' )
+  args = parser.parse_args()
+  if args.unix_socket and not hasattr( socket, 'AF_UNIX' ):
+    parser.error( '--unix_socket: Unix domain sockets are not supported on '
+                  'this platform' )
+  return args
 
 
 def SetupLogging( log_level ):
@@ -183,6 +201,7 @@ def Main():
   # ycm_core which we want to be imported ONLY after extra conf
   # preload has executed.
   from ycmd import handlers
+  from ycmd.metrics import MetricsPlugin
   from ycmd.watchdog_plugin import WatchdogPlugin
   handlers.UpdateUserOptions( options )
   handlers.SetHmacSecret( hmac_secret )
@@ -197,13 +216,26 @@ def Main():
   handlers.app.install( WatchdogPlugin( args.idle_suicide_seconds,
                                         args.check_interval_seconds ) )
   handlers.app.install( HmacPlugin( hmac_secret ) )
+  # Installed last so that it runs after the HMAC of the request is checked.
+  handlers.app.install( MetricsPlugin() )
   CloseStdin()
-  handlers.wsgi_server = StoppableWSGIServer( handlers.app,
-                                              host = args.host,
-                                              port = args.port )
+  if args.wsgi_server == 'pooled':
+    handlers.wsgi_server = PooledWSGIServer( handlers.app,
+                                             host = args.host,
+                                             port = args.port,
+                                             threads = args.worker_threads,
+                                             unix_socket = args.unix_socket )
+  else:
+    handlers.wsgi_server = StoppableWSGIServer( handlers.app,
+                                                host = args.host,
+                                                port = args.port,
+                                                unix_socket = args.unix_socket )
   if sys.stdin is not None:
-    print( f'serving on http://{ handlers.wsgi_server.server_name }:'
-           f'{ handlers.wsgi_server.server_port }' )
+    if args.unix_socket:
+      print( f'serving on unix:{ handlers.wsgi_server.server_address }' )
+    else:
+      print( f'serving on http://{ handlers.wsgi_server.server_name }:'
+             f'{ handlers.wsgi_server.server_port }' )
   handlers.wsgi_server.serve_forever()
   handlers.wsgi_server.server_close()
   handlers.ServerCleanup()
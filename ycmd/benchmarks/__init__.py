@@ -0,0 +1,40 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Micro-benchmarks of the Python parts of ycmd. The C++ parts are benchmarked
+with Google Benchmark, see cpp/ycm/benchmarks. Run them with:
+
+  python -m ycmd.benchmarks [name ...]
+
+or with benchmark.py --python."""
+
+import timeit
+
+
+def Measure( function, repeat = 5 ):
+  """Returns the shortest time, in seconds, taken by a call to |function| over
+  |repeat| runs."""
+  return min( timeit.repeat( function, number = 1, repeat = repeat ) )
+
+
+def PrintResult( name, seconds, size = None ):
+  """Prints the time taken by the benchmark |name| and, if |size| (in bytes) is
+  given, the corresponding throughput."""
+  result = f'{ name:<50} { seconds * 1000:10.3f} ms'
+  if size:
+    result += f' { size / seconds / 1024 / 1024:10.1f} MiB/s'
+  print( result )
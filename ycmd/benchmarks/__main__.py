@@ -0,0 +1,48 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import importlib
+
+BENCHMARKS = [
+  'lsp_framing',
+  'server_file_state',
+]
+
+
+def ParseArguments():
+  parser = argparse.ArgumentParser( description = 'Run the Python '
+                                                  'micro-benchmarks of ycmd.' )
+  parser.add_argument( 'benchmarks', nargs = '*',
+                       help = 'Benchmarks to run, among '
+                              f'{ ", ".join( BENCHMARKS ) } (default: all).' )
+  args = parser.parse_args()
+  for name in args.benchmarks:
+    if name not in BENCHMARKS:
+      parser.error( f'unknown benchmark: { name }' )
+  return args
+
+
+def Main():
+  args = ParseArguments()
+  for name in args.benchmarks or BENCHMARKS:
+    print( f'{ name }:' )
+    importlib.import_module( f'ycmd.benchmarks.{ name }_bench' ).Run()
+
+
+if __name__ == '__main__':
+  Main()
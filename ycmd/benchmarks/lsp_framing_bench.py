@@ -0,0 +1,115 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks the framing parser of the language server message pump with
+synthetic traffic. The time per MiB should stay constant as the messages grow
+and as the server output is split into more, smaller reads."""
+
+import json
+
+from ycmd.benchmarks import Measure, PrintResult
+from ycmd.completers.language_server import language_server_completer as lsc
+
+
+class ReplayConnection( lsc.LanguageServerConnection ):
+  """Connection whose server output is a fixed list of chunks, each returned by
+  a single ReadData call."""
+  def __init__( self, chunks ):
+    super().__init__( None, None, None )
+    self._chunks = iter( chunks )
+    self.messages = 0
+
+
+  def TryServerConnectionBlocking( self ):
+    return True
+
+
+  def IsConnected( self ):
+    return True
+
+
+  def Shutdown( self ):
+    pass
+
+
+  def WriteData( self, data ):
+    pass
+
+
+  def ReadData( self, size = -1 ):
+    try:
+      return next( self._chunks )
+    except StopIteration:
+      raise lsc.LanguageServerConnectionStopped()
+
+
+  def _DispatchMessage( self, message ):
+    self.messages += 1
+
+
+def Frame( payload ):
+  return b'Content-Length: %d\r\n\r\n' % len( payload ) + payload
+
+
+def CompletionResponse( size ):
+  """Returns a response of roughly |size| bytes, like a large completion list
+  from jdt.ls."""
+  item = { 'label': 'someMethod(int arg)', 'kind': 2, 'detail': 'x' * 50 }
+  count = max( size // len( json.dumps( item ) ), 1 )
+  return Frame( json.dumps( {
+    'jsonrpc': '2.0',
+    'id': 1,
+    'result': { 'isIncomplete': False, 'items': [ item ] * count }
+  } ).encode( 'utf-8' ) )
+
+
+def Split( data, chunk_size ):
+  return [ data[ i : i + chunk_size ]
+           for i in range( 0, len( data ), chunk_size ) ]
+
+
+def ReadAll( chunks ):
+  connection = ReplayConnection( chunks )
+  try:
+    connection._ReadMessages()
+  except lsc.LanguageServerConnectionStopped:
+    pass
+  return connection.messages
+
+
+def Benchmark( name, chunks ):
+  size = sum( len( chunk ) for chunk in chunks )
+  PrintResult( name, Measure( lambda: ReadAll( chunks ) ), size )
+
+
+def Run():
+  for megabytes in [ 1, 4, 16 ]:
+    data = CompletionResponse( megabytes * 1024 * 1024 )
+    for chunk_size in [ 65536, 4096, 64 ]:
+      Benchmark( f'{ megabytes } MiB message in { chunk_size } byte reads',
+                 Split( data, chunk_size ) )
+
+  # Many small notifications in a few large reads, with headers split between
+  # reads.
+  notification = Frame( json.dumps( {
+    'jsonrpc': '2.0',
+    'method': 'window/logMessage',
+    'params': { 'type': 4, 'message': 'x' * 100 }
+  } ).encode( 'utf-8' ) )
+  for count in [ 10000, 40000 ]:
+    Benchmark( f'{ count } small messages in 4093 byte reads',
+               Split( notification * count, 4093 ) )
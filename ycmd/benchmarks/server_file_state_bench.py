@@ -0,0 +1,69 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks the change detection of ServerFileState on multi-MiB buffers,
+with each of the content fingerprints. The contents are checked against the
+ones last sent to the server, which is done for every open buffer on every
+request."""
+
+from unittest.mock import patch
+
+from ycmd.benchmarks import Measure, PrintResult
+from ycmd.completers.language_server import language_server_protocol as lsp
+
+FINGERPRINTS = [
+  ( 'SHA1', lsp.Sha1Fingerprint ),
+  ( 'hash', lsp.HashFingerprint ),
+  ( 'direct comparison', None ),
+]
+
+
+def Buffer( size, last = 'a' ):
+  """Returns a buffer of |size| characters, mostly ASCII with some non-ASCII
+  lines, ending with |last|."""
+  line = 'int someVariable = someFunction( argument ); // é\n'
+  return ( line * ( size // len( line ) + 1 ) )[ : size - 1 ] + last
+
+
+def Copies( contents, count ):
+  """Returns |count| distinct copies of |contents|, as decoded from successive
+  client requests. Python caches the hash of each string object, so the same
+  object must not be fingerprinted twice."""
+  return iter( [ contents[ : -1 ] + contents[ -1 ] for _ in range( count ) ] )
+
+
+def Run():
+  repeat = 3
+  for megabytes in [ 1, 4, 16 ]:
+    size = megabytes * 1024 * 1024
+    contents = Buffer( size )
+    # The contents are only fingerprinted or compared when their length is
+    # unchanged. The first check finds a change, the following ones don't; both
+    # go through the whole buffer.
+    same_length = Buffer( size, last = 'b' )
+
+    for name, fingerprint in FINGERPRINTS:
+      with patch.object( lsp, 'CONTENT_FINGERPRINT', fingerprint ):
+        file_state = lsp.ServerFileState( 'file' )
+        file_state.GetDirtyFileAction( contents )
+
+        copies = Copies( same_length, repeat )
+        PrintResult( f'{ megabytes } MiB buffer, { name }',
+                     Measure( lambda: file_state.GetSavedFileAction(
+                                next( copies ) ),
+                              repeat ),
+                     size )
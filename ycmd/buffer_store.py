@@ -0,0 +1,181 @@
+# Copyright (C) 2020 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+from ycmd.responses import ServerError
+from ycmd.utils import SplitLines
+
+
+class BufferVersionMismatch( ServerError ):
+  """Raised when a request contains changes against a version of a buffer that
+  the server doesn't know. The client should send the full contents of the
+  buffer instead."""
+  def __init__( self, filepath, base_version, version ):
+    super().__init__( f'Changes to { filepath } are against version '
+                      f'{ base_version } but the server has version '
+                      f'{ version }' )
+    self.filepath = filepath
+
+
+class BufferFileData( dict ):
+  """A file_data entry whose contents were rebuilt from changes. The contents
+  are only joined from the lines when they are first accessed, but the entry
+  otherwise behaves as if they were always there, e.g. when it is copied or
+  serialised to be forwarded to a subserver.
+
+  |lines| is a tuple shared with the BufferStore and the other requests for the
+  same version of the buffer."""
+  def __init__( self, file_data, lines ):
+    super().__init__( file_data )
+    self.lines = lines
+
+
+  def _Join( self ):
+    if not dict.__contains__( self, 'contents' ):
+      dict.__setitem__( self, 'contents', '\n'.join( self.lines ) )
+
+
+  def __missing__( self, key ):
+    if key != 'contents':
+      raise KeyError( key )
+    self._Join()
+    return dict.__getitem__( self, 'contents' )
+
+
+  def __contains__( self, key ):
+    return key == 'contents' or dict.__contains__( self, key )
+
+
+  def __len__( self ):
+    return dict.__len__( self ) + ( not dict.__contains__( self, 'contents' ) )
+
+
+def _JoiningFirst( method ):
+  def Wrapper( self, *args, **kwargs ):
+    self._Join()
+    return method( self, *args, **kwargs )
+  Wrapper.__name__ = method.__name__
+  return Wrapper
+
+
+# The other ways to read the entry see the contents once they are joined.
+for _name in [ 'get', 'keys', 'values', 'items', 'copy', 'pop', 'popitem',
+               'setdefault', '__iter__', '__eq__', '__ne__', '__repr__',
+               '__reduce_ex__' ]:
+  setattr( BufferFileData, _name, _JoiningFirst( getattr( dict, _name ) ) )
+del _name
+
+
+class _Buffer:
+  """A version of a buffer. Either the contents or the lines are known, the
+  other is computed when first needed."""
+  def __init__( self, version, contents = None, lines = None ):
+    self.version = version
+    self._contents = contents
+    self._lines = lines
+
+
+  def Lines( self ):
+    if self._lines is None:
+      self._lines = tuple( SplitLines( self._contents ) )
+      self._contents = None
+    return self._lines
+
+
+class BufferStore:
+  """Keeps the latest version of the lines of each buffer sent by the client, so
+  that subsequent requests only need to send the lines which changed.
+
+  A file_data entry which includes a 'version' alongside its 'contents' is
+  recorded in the store. A later entry may then omit the 'contents' and instead
+  supply 'changes' against its 'base_version':
+
+    {
+      'filetypes': [ 'cpp' ],
+      'base_version': 3,
+      'version': 4,
+      'changes': [ { 'start_line': 10, 'end_line': 12, 'lines': [ 'foo' ] } ]
+    }
+
+  Each change replaces the lines from 'start_line' up to, but not including,
+  'end_line' (1-based) with 'lines'. Changes are applied in order."""
+
+  def __init__( self ):
+    self._buffers = {}
+    self._lock = threading.Lock()
+
+
+  def UpdateFileData( self, file_data ):
+    """Records the versioned buffers in the |file_data| map of a request, and
+    replaces the entries which contain changes with BufferFileData objects."""
+    for filepath, data in file_data.items():
+      if isinstance( data, BufferFileData ):
+        # Already rebuilt, e.g. shared by the requests of a batch.
+        continue
+      if 'changes' in data:
+        file_data[ filepath ] = BufferFileData(
+          data,
+          self._ApplyChanges( filepath, data ) )
+      elif 'version' in data:
+        self._Store( filepath, data[ 'version' ], data[ 'contents' ] )
+
+
+  def Remove( self, filepath ):
+    with self._lock:
+      self._buffers.pop( filepath, None )
+
+
+  def _Store( self, filepath, version, contents ):
+    # The contents are only split into lines if changes are sent against them.
+    with self._lock:
+      self._buffers[ filepath ] = _Buffer( version, contents = contents )
+
+
+  def _ApplyChanges( self, filepath, data ):
+    base_version = data.get( 'base_version' )
+    version = data.get( 'version' )
+    with self._lock:
+      stored = self._buffers.get( filepath )
+      stored_version = stored.version if stored else None
+
+      # The same changes may be sent with concurrent requests. The lines are a
+      # tuple, so the requests can share them without altering the stored
+      # buffer.
+      if version is not None and stored_version == version:
+        return stored.Lines()
+
+      if base_version is None or stored_version != base_version:
+        raise BufferVersionMismatch( filepath, base_version, stored_version )
+
+      # The stored tuple is shared by the requests for the base version, so the
+      # new version is a new sequence of lines. Only the references to the
+      # lines are copied, not the lines themselves.
+      lines = list( stored.Lines() )
+      for change in data[ 'changes' ]:
+        start = change[ 'start_line' ] - 1
+        end = change[ 'end_line' ] - 1
+        if not 0 <= start <= end <= len( lines ):
+          raise ServerError( f'Invalid change to { filepath }: lines '
+                             f'{ change[ "start_line" ] } to '
+                             f'{ change[ "end_line" ] } out of range' )
+        lines[ start : end ] = change[ 'lines' ]
+
+      lines = tuple( lines )
+      if version is not None:
+        self._buffers[ filepath ] = _Buffer( version, lines = lines )
+      return lines
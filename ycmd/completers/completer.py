@@ -17,21 +17,40 @@
 
 import abc
 import threading
+import traceback
+from collections import OrderedDict
 from ycmd import extra_conf_store
 from ycmd.completers import completer_utils
-from ycmd.responses import NoDiagnosticSupport, SignatureHelpAvailalability
-from ycmd.utils import LOGGER
+from ycmd.responses import ( BuildExceptionResponse,
+                             NoDiagnosticSupport,
+                             SignatureHelpAvailalability )
+from ycmd.utils import LOGGER, StartThread
 
 NO_USER_COMMANDS = 'This completer does not define any commands.'
 
 # Number of seconds to block before returning True in PollForMessages
 MESSAGE_POLL_TIMEOUT = 10
 
+# Bounds of the completions cache of each completer: the maximum number of
+# requests whose completions are cached, and the maximum estimated size of these
+# completions.
+MAX_COMPLETIONS_CACHE_ENTRIES = 16
+MAX_COMPLETIONS_CACHE_BYTES = 16 * 1024 * 1024
+
+# Estimated size of any object in the completions cache, on top of its contents.
+_OBJECT_OVERHEAD_BYTES = 50
+
 
 class CompletionsChanged( Exception ):
   pass # pragma: no cover
 
 
+class RequestSuperseded( Exception ):
+  """Raised by Completer.ComputeCandidates when the client sent a newer
+  completion request while the current one was being computed."""
+  pass # pragma: no cover
+
+
 class Completer( metaclass = abc.ABCMeta ):
   """A base class for all Completers in YCM.
 
@@ -172,6 +191,15 @@ class Completer( metaclass = abc.ABCMeta ):
    - True if a timeout occurred, and the poll should be restarted
    - False if an error occurred, and no further polling should be attempted
 
+  When the async_file_ready_to_parse option is set, OnFileReadyToParse,
+  OnBufferVisit and OnInsertLeave are called on a background thread, where
+  bursts of events for the same file are coalesced. OnFileReadyToParse is called
+  through PublishFileReadyToParse. The
+  diagnostics it returns (or the exception it raises) are then returned to the
+  client by PollForMessages, before any message from PollForMessagesInner. In
+  that mode, the default PollForMessagesInner waits for such messages instead of
+  returning False.
+
   If your completer uses an external server process, then it can be useful to
   implement the ServerIsHealthy member function to handle the /healthy request.
   This is very useful for the test suite.
@@ -208,7 +236,20 @@ class Completer( metaclass = abc.ABCMeta ):
         default_triggers = {} )
       if not user_options[ 'disable_signature_help' ] else None )
 
-    self._completions_cache = CompletionsCache()
+    self._completions_cache = CompletionsCache( type( self ).__name__ )
+    self._async_file_ready_to_parse = bool(
+      user_options[ 'async_file_ready_to_parse' ] )
+    # Messages published by PublishFileReadyToParse, keyed by file path, which
+    # have not been returned by PollForMessages yet.
+    self._parse_messages = {}
+    self._parse_messages_condition = threading.Condition()
+    # Incremented for each completion request. A request is superseded once the
+    # generation no longer matches the one it started with.
+    self._completion_generation = 0
+    self._completion_generation_lock = threading.Lock()
+    # The latest request whose candidates are computed in the background.
+    self._completion_job = None
+    self._completion_job_lock = threading.Lock()
     self._max_candidates = user_options[ 'max_num_candidates' ]
     self._max_candidates_to_detail = user_options[
       'max_num_candidates_to_detail' ]
@@ -221,14 +262,15 @@ class Completer( metaclass = abc.ABCMeta ):
   # version of it.
   def ShouldUseNow( self, request_data ):
     if not self.ShouldUseNowInner( request_data ):
-      self._completions_cache.Invalidate()
+      self._completions_cache.Invalidate( request_data )
       return False
 
     # We have to do the cache valid check and get the completions as part of one
     # call because we have to ensure a different thread doesn't change the cache
     # data.
     cache_completions = self._completions_cache.GetCompletionsIfCacheValid(
-      request_data )
+      request_data,
+      record_statistics = False )
 
     # If None, then the cache isn't valid and we know we should return true
     if cache_completions is None:
@@ -300,13 +342,71 @@ class Completer( metaclass = abc.ABCMeta ):
          not self.ShouldUseNow( request_data ) ):
       return []
 
-    candidates = self._GetCandidatesFromSubclass( request_data )
+    # Only a request which needs new candidates supersedes the requests in
+    # progress, whose candidates could be cached for the following requests.
+    # A request answered from the cache is never superseded.
+    generation = None
+    if self._completions_cache.GetCompletionsIfCacheValid(
+        request_data,
+        record_statistics = False ) is None:
+      generation = self._StartCompletionRequest()
+
+    try:
+      candidates = self._GetCandidatesFromSubclass( request_data )
+    except Exception:
+      # The failure may be due to the request being cancelled.
+      self._RaiseIfSuperseded( generation )
+      raise
+    self._RaiseIfSuperseded( generation )
+
     candidates = self.FilterAndSortCandidates( candidates,
                                                request_data[ 'query' ] )
+    self._RaiseIfSuperseded( generation )
 
     return self.DetailCandidates( request_data, candidates )
 
 
+  def ComputeCandidatesAsync( self, request_data ):
+    """Starts computing the candidates for |request_data| in a background
+    thread and returns the CompletionJob. If the candidates of a request at the
+    same position, and with the same buffer contents, are still being computed,
+    that job is returned instead: restarting it would supersede the request to
+    the completion server, whereas its candidates will be cached once it is
+    done."""
+    with self._completion_job_lock:
+      job = self._completion_job
+      if ( job is None or
+           job.Done() or
+           job.cache_key != request_data[ 'cache_key' ] ):
+        job = self._completion_job = CompletionJob( self, request_data )
+        job.Start()
+      return job
+
+
+  def _StartCompletionRequest( self ):
+    with self._completion_generation_lock:
+      self._completion_generation += 1
+      generation = self._completion_generation
+    self.OnCompletionRequestsSuperseded()
+    return generation
+
+
+  def _RaiseIfSuperseded( self, generation ):
+    if generation is None:
+      return
+    with self._completion_generation_lock:
+      superseded = generation != self._completion_generation
+    if superseded:
+      raise RequestSuperseded( 'Completion request superseded' )
+
+
+  def OnCompletionRequestsSuperseded( self ):
+    """Called when a new completion request starts, making any request still in
+    progress obsolete. Completers which wait on external servers may cancel the
+    requests made on behalf of the obsolete requests."""
+    pass
+
+
   def ShouldDetailCandidateList( self, candidates ):
     if self._max_candidates_to_detail < 0:
       return True
@@ -320,6 +420,7 @@ class Completer( metaclass = abc.ABCMeta ):
   def ResolveCompletionItem( self, request_data ):
     candidates = self._completions_cache.GetCompletionsIfCacheValid(
       request_data,
+      record_statistics = False,
       ignore_incomplete = True )
 
     if not candidates:
@@ -504,6 +605,20 @@ class Completer( metaclass = abc.ABCMeta ):
     return ''
 
 
+  def QueueDepths( self ):
+    """Called by the /metrics handler. Returns a dictionary of the number of
+    items in each of the completer's internal queues (e.g. requests awaiting a
+    response from the completion server)."""
+    return {}
+
+
+  def CompletionsCacheStatistics( self ):
+    """Called by the /debug_info handler. Returns the number of entries, the
+    estimated size and the hit, miss and eviction counts of the completions
+    cache."""
+    return self._completions_cache.Statistics()
+
+
   def Shutdown( self ):
     pass # pragma: no cover
 
@@ -522,16 +637,70 @@ class Completer( metaclass = abc.ABCMeta ):
     return True
 
 
-  def PollForMessages( self, request_data ):
-    return self.PollForMessagesInner( request_data, MESSAGE_POLL_TIMEOUT )
+  def PollForMessages( self, request_data, timeout = None ):
+    """Returns the pending messages, waiting up to |timeout| seconds, or
+    MESSAGE_POLL_TIMEOUT if None, for one if there are none. A |timeout| of 0
+    only returns the pending messages."""
+    messages = self._PopParseMessages()
+    if messages:
+      return messages
+    if timeout is None:
+      timeout = MESSAGE_POLL_TIMEOUT
+    return self.PollForMessagesInner( request_data, timeout )
 
 
   def PollForMessagesInner( self, request_data, timeout ):
     # Most completers don't implement this. It's only required where unsolicited
     # messages or diagnostics are supported, such as in the Language Server
     # Protocol. As such, the default implementation just returns False, meaning
-    # that unsolicited messages are not supported for this filetype.
-    return False
+    # that unsolicited messages are not supported for this filetype, unless
+    # FileReadyToParse is handled asynchronously.
+    if not self._async_file_ready_to_parse:
+      return False
+
+    with self._parse_messages_condition:
+      self._parse_messages_condition.wait_for( lambda: self._parse_messages,
+                                               timeout )
+    return self._PopParseMessages() or True
+
+
+  def PublishFileReadyToParse( self, request_data ):
+    """Called on a background thread when FileReadyToParse is handled
+    asynchronously. Calls OnFileReadyToParse and queues the returned
+    diagnostics, or the raised exception, to be returned by PollForMessages.
+    Only the latest message for each file is kept."""
+    filepath = request_data[ 'filepath' ]
+    try:
+      diagnostics = self.OnFileReadyToParse( request_data )
+    except Exception as error:
+      LOGGER.exception( 'Error while parsing %s', filepath )
+      self._PublishParseMessage( filepath, {
+        'error': BuildExceptionResponse( error, traceback.format_exc() ),
+        'filepath': filepath
+      } )
+      return
+
+    if diagnostics is not None:
+      self._PublishParseMessage( filepath, {
+        'diagnostics': diagnostics,
+        'filepath': filepath
+      } )
+
+
+  def _PublishParseMessage( self, filepath, message ):
+    with self._parse_messages_condition:
+      # Move the file to the end, so that messages are returned in the order
+      # they were last published.
+      self._parse_messages.pop( filepath, None )
+      self._parse_messages[ filepath ] = message
+      self._parse_messages_condition.notify_all()
+
+
+  def _PopParseMessages( self ):
+    with self._parse_messages_condition:
+      messages = list( self._parse_messages.values() )
+      self._parse_messages = {}
+    return messages
 
 
   def AdditionalFormattingOptions( self, request_data ):
@@ -557,22 +726,109 @@ class Completer( metaclass = abc.ABCMeta ):
     return {}
 
 
-class CompletionsCache:
-  """Cache of computed completions for a particular request."""
+class CompletionJob:
+  """Computes the candidates of a request in a background thread. The job works
+  on a copy of the request data, as completers may change its start column."""
 
-  def __init__( self ):
+  def __init__( self, completer, request_data ):
+    self.cache_key = request_data[ 'cache_key' ]
+    self.request_data = request_data.Copy()
+    self._original_request_data = request_data
+    self._completer = completer
+    self._done = threading.Event()
+    self._candidates = None
+    self._exception = None
+
+
+  def Start( self ):
+    StartThread( self._Run )
+
+
+  def _Run( self ):
+    try:
+      self._candidates = self._completer.ComputeCandidates( self.request_data )
+    except Exception as exception:
+      self._exception = exception
+    finally:
+      self._done.set()
+
+
+  def IsFor( self, request_data ):
+    """Returns whether the job was started for |request_data|, rather than
+    for a previous request at the same position."""
+    return self._original_request_data is request_data
+
+
+  def Done( self ):
+    return self._done.is_set()
+
+
+  def Wait( self, timeout ):
+    """Waits up to |timeout| seconds for the job to finish. Returns whether it
+    has finished."""
+    return self._done.wait( max( timeout, 0 ) )
+
+
+  def Result( self ):
+    """Returns the candidates, or raises the exception raised while computing
+    them. Must only be called once the job is done."""
+    if self._exception is not None:
+      raise self._exception
+    return self._candidates
+
+
+class CompletionsCacheEntry:
+  """The completions computed for a request. Subclasses of CompletionsCache may
+  record additional state about the completions on the entry."""
+
+  def __init__( self, request_data, completions ):
+    self.request_data = request_data
+    self.request_key = request_data[ 'cache_key' ]
+    self.completions = completions
+    self.size = _EstimateSize( completions )
+
+
+class CompletionsCache:
+  """Least recently used cache of the completions computed for recent requests.
+
+  Entries are keyed on the completer owning the cache (|completer_name|) and on
+  the file, line and start codepoint of the request. An entry is only returned
+  while the rest of the request (the version of the buffer contents outside the
+  current line, the filetypes, the extra conf data, etc.) is unchanged, as
+  determined by comparing the 'cache_key' of the requests; a stale entry is
+  dropped when it is looked up. The cache holds at most |max_entries| entries
+  and evicts the least recently used ones once the estimated size of the
+  completions exceeds |max_bytes|, always keeping the most recent entry."""
+
+  def __init__( self,
+                completer_name = None,
+                max_entries = MAX_COMPLETIONS_CACHE_ENTRIES,
+                max_bytes = MAX_COMPLETIONS_CACHE_BYTES ):
     self._access_lock = threading.Lock()
-    self.Invalidate()
+    self._completer_name = completer_name
+    self._max_entries = max_entries
+    self._max_bytes = max_bytes
+    self._entries = OrderedDict()
+    self._size = 0
+    self._hits = 0
+    self._misses = 0
+    self._evictions = 0
 
 
-  def Invalidate( self ):
+  def Invalidate( self, request_data = None ):
     with self._access_lock:
-      self.InvalidateNoLock()
+      self.InvalidateNoLock( request_data )
 
 
-  def InvalidateNoLock( self ):
-    self._request_data = None
-    self._completions = None
+  def InvalidateNoLock( self, request_data = None ):
+    """Drops the entry for the position of |request_data|, or all the entries if
+    |request_data| is None."""
+    if request_data is None:
+      self._entries.clear()
+      self._size = 0
+      return
+
+    self._RemoveNoLock( self._KeyNoLock( request_data ) )
 
 
   def Update( self, request_data, completions ):
@@ -581,16 +837,109 @@ class CompletionsCache:
 
 
   def UpdateNoLock( self, request_data, completions ):
-    self._request_data = request_data
-    self._completions = completions
+    """Caches |completions| for |request_data| and returns the new entry."""
+    key = self._KeyNoLock( request_data )
+    self._RemoveNoLock( key )
+    entry = CompletionsCacheEntry( request_data, completions )
+    self._entries[ key ] = entry
+    self._size += entry.size
+
+    while ( len( self._entries ) > 1 and
+            ( len( self._entries ) > self._max_entries or
+              self._size > self._max_bytes ) ):
+      _, evicted = self._entries.popitem( last = False )
+      self._size -= evicted.size
+      self._evictions += 1
+
+    return entry
+
+
+  def GetCompletionsIfCacheValid( self,
+                                  request_data,
+                                  record_statistics = True,
+                                  **kwargs ):
+    with self._access_lock:
+      entry = self.GetEntryIfCacheValidNoLock( request_data,
+                                               record_statistics,
+                                               **kwargs )
+      return entry.completions if entry else None
+
+
+  def GetEntryIfCacheValidNoLock( self,
+                                  request_data,
+                                  record_statistics = True,
+                                  **kwargs ):
+    """Returns the entry for |request_data| if it can be used to answer the
+    request, None otherwise. Lookups are counted as hits or misses unless
+    |record_statistics| is False, e.g. when merely checking whether the cache
+    has (non-empty) completions for the request."""
+    key = self._KeyNoLock( request_data )
+    entry = self._entries.get( key )
+    if entry is not None and entry.request_key != request_data[ 'cache_key' ]:
+      self._RemoveNoLock( key )
+      entry = None
+
+    if entry is not None and self._IsEntryUsable( entry,
+                                                  request_data,
+                                                  **kwargs ):
+      self._entries.move_to_end( key )
+    else:
+      entry = None
 
+    if record_statistics:
+      if entry is None:
+        self._misses += 1
+      else:
+        self._hits += 1
+    return entry
 
-  def GetCompletionsIfCacheValid( self, request_data, **kwargs ):
-    with self._access_lock:
-      return self.GetCompletionsIfCacheValidNoLock( request_data )
+
+  def _EntryAtPositionNoLock( self, request_data ):
+    """Returns the entry for the position of |request_data|, even if it cannot
+    be used to answer the request, or None."""
+    return self._entries.get( self._KeyNoLock( request_data ) )
 
 
-  def GetCompletionsIfCacheValidNoLock( self, request_data ):
-    if self._request_data and self._request_data == request_data:
-      return self._completions
-    return None
+  def _KeyNoLock( self, request_data ):
+    return ( self._completer_name,
+             request_data[ 'filepath' ],
+             request_data[ 'line_num' ],
+             request_data[ 'start_codepoint' ] )
+
+
+  def _RemoveNoLock( self, key ):
+    entry = self._entries.pop( key, None )
+    if entry is not None:
+      self._size -= entry.size
+
+
+  def _IsEntryUsable( self, entry, request_data, **kwargs ):
+    """Called under the lock with an entry matching |request_data|. Subclasses
+    may reject entries whose completions do not apply to the request."""
+    return True
+
+
+  def Statistics( self ):
+    with self._access_lock:
+      return {
+        'entries': len( self._entries ),
+        'size_bytes': self._size,
+        'hits': self._hits,
+        'misses': self._misses,
+        'evictions': self._evictions
+      }
+
+
+def _EstimateSize( value ):
+  """Returns a rough estimate of the memory used by |value|, counting the length
+  of the strings it contains and a fixed overhead for other objects."""
+  if isinstance( value, str ):
+    return len( value ) + _OBJECT_OVERHEAD_BYTES
+  if isinstance( value, dict ):
+    return _OBJECT_OVERHEAD_BYTES + sum(
+      _EstimateSize( key ) + _EstimateSize( item )
+      for key, item in value.items() )
+  if isinstance( value, ( list, tuple ) ):
+    return _OBJECT_OVERHEAD_BYTES + sum(
+      _EstimateSize( item ) for item in value )
+  return _OBJECT_OVERHEAD_BYTES
@@ -22,9 +22,9 @@ import contextlib
 import json
 import logging
 import os
+import re
 import socket
 import time
-import queue
 import subprocess
 import threading
 from watchdog.events import PatternMatchingEventHandler
@@ -45,9 +45,23 @@ REQUEST_TIMEOUT_INITIALISE = 30
 REQUEST_TIMEOUT_COMMAND    = 30
 CONNECTION_TIMEOUT         = 5
 
-# Size of the notification ring buffer
+# Maximum number of notifications not tied to a document (e.g. log messages)
+# kept until they are polled. Beyond that, the oldest ones are dropped.
 MAX_QUEUED_MESSAGES = 250
 
+# Notifications carrying the full state of a document, which supersede the
+# previous ones for the same document.
+COALESCED_NOTIFICATIONS = { 'textDocument/publishDiagnostics' }
+
+# Maximum number of requests awaiting a response from a server. Further requests
+# wait for a response to be received for up to REQUEST_QUEUE_TIMEOUT seconds.
+MAX_OUTSTANDING_REQUESTS = 64
+REQUEST_QUEUE_TIMEOUT = 30
+
+# The empty line that terminates the headers of a message. The protocol requires
+# '\r\n' line endings, but we also accept bare '\n'.
+HEADER_TERMINATOR_REGEX = re.compile( b'\r?\n\r?\n' )
+
 PROVIDERS_MAP = {
   'codeActionProvider': (
     lambda self, request_data, args: self.GetCodeActions( request_data, args )
@@ -140,6 +154,12 @@ class ResponseFailedException( Exception ):
   pass # pragma: no cover
 
 
+class ResponseCancelledException( Exception ):
+  """Raised by LanguageServerConnection if a request is cancelled by the client
+  before a response is received."""
+  pass # pragma: no cover
+
+
 class IncompatibleCompletionException( Exception ):
   """Internal exception returned when a completion item is encountered which is
   not supported by ycmd, or where the completion item is invalid."""
@@ -177,6 +197,7 @@ class Response:
     users should synchronously wait on AwaitResponse."""
     self._event = threading.Event()
     self._message = None
+    self._cancelled = False
     self._response_callback = response_callback
 
 
@@ -195,18 +216,35 @@ class Response:
     self.ResponseReceived( None )
 
 
+  def Cancel( self ):
+    """Called when the request is cancelled. Wakes up any waiter. The server may
+    still respond, but the response is ignored."""
+    self._cancelled = True
+    self._event.set()
+
+
+  def Done( self ):
+    """Returns whether the response was received, or the request aborted or
+    cancelled."""
+    return self._event.is_set()
+
+
   def AwaitResponse( self, timeout ):
     """Called by clients to wait synchronously for either a response to be
     received or for |timeout| seconds to have passed.
     Returns the message, or:
         - throws ResponseFailedException if the request fails
         - throws ResponseTimeoutException in case of timeout
-        - throws ResponseAbortedException in case the server is shut down."""
+        - throws ResponseAbortedException in case the server is shut down
+        - throws ResponseCancelledException in case the request is cancelled."""
     self._event.wait( timeout )
 
     if not self._event.is_set():
       raise ResponseTimeoutException( 'Response Timeout' )
 
+    if self._cancelled:
+      raise ResponseCancelledException( 'Response Cancelled' )
+
     if self._message is None:
       raise ResponseAbortedException( 'Response Aborted' )
 
@@ -221,6 +259,74 @@ class Response:
     return self._message
 
 
+class NotificationStore:
+  """Thread-safe store of the notifications received from the server that are
+  not yet polled by the client.
+
+  Notifications that replace the previous state of a document (see
+  COALESCED_NOTIFICATIONS) are keyed by ( method, uri ): a new one replaces the
+  pending one for the same document, moving it to the end. Other notifications
+  are kept in the order they are received; at most MAX_QUEUED_MESSAGES of them
+  are kept, the oldest ones being dropped."""
+
+  def __init__( self ):
+    self._condition = threading.Condition()
+    self._notifications = collections.OrderedDict()
+    self._unkeyed = collections.deque()
+    self._next_id = 0
+    self._woken = False
+
+
+  def _Key( self, notification ):
+    method = notification.get( 'method' )
+    if method in COALESCED_NOTIFICATIONS:
+      uri = ( notification.get( 'params' ) or {} ).get( 'uri' )
+      if uri is not None:
+        return ( method, uri )
+
+    self._next_id += 1
+    self._unkeyed.append( self._next_id )
+    if len( self._unkeyed ) > MAX_QUEUED_MESSAGES:
+      del self._notifications[ self._unkeyed.popleft() ]
+    return self._next_id
+
+
+  def Put( self, notification ):
+    with self._condition:
+      key = self._Key( notification )
+      self._notifications.pop( key, None )
+      self._notifications[ key ] = notification
+      self._condition.notify_all()
+
+
+  def Wake( self ):
+    """Wakes up a thread waiting in Take, even though there is no notification,
+    e.g. because there is another kind of message to return to the client."""
+    with self._condition:
+      self._woken = True
+      self._condition.notify_all()
+
+
+  def Take( self, timeout = 0 ):
+    """Returns all the pending notifications in the order they were received and
+    removes them from the store. Waits up to |timeout| seconds for one if there
+    is none; returns an empty list if none is received in that time or if Wake
+    is called."""
+    with self._condition:
+      self._condition.wait_for( lambda: self._notifications or self._woken,
+                                timeout )
+      self._woken = False
+      notifications = list( self._notifications.values() )
+      self._notifications.clear()
+      self._unkeyed.clear()
+      return notifications
+
+
+  def __len__( self ):
+    with self._condition:
+      return len( self._notifications )
+
+
 class LanguageServerConnection( threading.Thread ):
   """
   Abstract language server communication object.
@@ -335,7 +441,10 @@ class LanguageServerConnection( threading.Thread ):
     self._last_id = 0
     self._responses = {}
     self._response_mutex = threading.Lock()
-    self._notifications = queue.Queue( maxsize=MAX_QUEUED_MESSAGES )
+    # Notified whenever a request stops being outstanding.
+    self._response_slot_available = threading.Condition( self._response_mutex )
+    self._max_outstanding_requests = MAX_OUTSTANDING_REQUESTS
+    self._notifications = NotificationStore()
 
     self._connection_event = threading.Event()
     self._stop_event = threading.Event()
@@ -371,6 +480,7 @@ class LanguageServerConnection( threading.Thread ):
         for _, response in self._responses.items():
           response.Abort()
         self._responses.clear()
+        self._response_slot_available.notify_all()
 
       LOGGER.debug( 'Connection was closed cleanly' )
     except Exception:
@@ -383,6 +493,7 @@ class LanguageServerConnection( threading.Thread ):
         for _, response in self._responses.items():
           response.Abort()
         self._responses.clear()
+        self._response_slot_available.notify_all()
 
       # Close any remaining sockets or files
       self.Shutdown()
@@ -417,16 +528,38 @@ class LanguageServerConnection( threading.Thread ):
       return self._last_id
 
 
-  def GetResponseAsync( self, request_id, message, response_callback=None ):
+  def GetResponseAsync( self,
+                        request_id,
+                        message,
+                        response_callback=None,
+                        timeout=None ):
     """Issue a request to the server and return immediately. If a response needs
     to be handled, supply a method taking ( response, message ) in
     response_callback. Note |response| is the instance of Response and message
     is the message received from the server.
+
+    The returned Response is a future: several requests may be issued before
+    awaiting any of their responses, so that the server can handle them
+    concurrently and answer them in any order. When MAX_OUTSTANDING_REQUESTS
+    requests are already awaiting a response, waits for one of them to be
+    answered, or throws ResponseTimeoutException after |timeout| seconds, or
+    REQUEST_QUEUE_TIMEOUT seconds if that is shorter or |timeout| is None.
     Returns the Response instance created."""
+    queue_timeout = REQUEST_QUEUE_TIMEOUT
+    if timeout is not None:
+      queue_timeout = min( timeout, queue_timeout )
     response = Response( response_callback )
 
     with self._response_mutex:
       assert request_id not in self._responses
+      # The message pump thread must never wait, since it is the one receiving
+      # the responses.
+      if ( threading.current_thread() is not self and
+           not self._response_slot_available.wait_for(
+             lambda: ( len( self._responses ) <
+                       self._max_outstanding_requests ),
+             queue_timeout ) ):
+        raise ResponseTimeoutException( 'Too many outstanding requests' )
       self._responses[ request_id ] = response
 
     LOGGER.debug( 'TX: Sending message: %r', message )
@@ -435,11 +568,45 @@ class LanguageServerConnection( threading.Thread ):
     return response
 
 
+  def PendingRequestCount( self ):
+    """Returns the number of requests awaiting a response from the server."""
+    with self._response_mutex:
+      return len( self._responses )
+
+
+  def QueuedNotificationCount( self ):
+    """Returns the number of notifications from the server not yet polled."""
+    return len( self._notifications )
+
+
   def GetResponse( self, request_id, message, timeout ):
     """Issue a request to the server and await the response. See
-    Response.AwaitResponse for return values and exceptions."""
-    response = self.GetResponseAsync( request_id, message )
-    return response.AwaitResponse( timeout )
+    Response.AwaitResponse for return values and exceptions. A request which
+    times out is cancelled. The |timeout| includes the time spent waiting for an
+    outstanding request slot."""
+    deadline = time.monotonic() + timeout
+    response = self.GetResponseAsync( request_id, message, timeout = timeout )
+    try:
+      return response.AwaitResponse( max( deadline - time.monotonic(), 0 ) )
+    except ResponseTimeoutException:
+      self.CancelRequest( request_id )
+      raise
+
+
+  def CancelRequest( self, request_id ):
+    """Ask the server to cancel the request |request_id|, if it hasn't already
+    responded to it. Anyone awaiting the response is woken up immediately with
+    ResponseCancelledException. The request no longer counts towards
+    MAX_OUTSTANDING_REQUESTS, since the server may never answer it; a late
+    response is ignored."""
+    with self._response_mutex:
+      response = self._responses.pop( request_id, None )
+      if response is None:
+        return
+      self._response_slot_available.notify()
+
+    response.Cancel()
+    self.SendNotification( lsp.CancelRequest( request_id ) )
 
 
   def SendNotification( self, message ):
@@ -481,101 +648,79 @@ class LanguageServerConnection( threading.Thread ):
     When the server is shut down cleanly, raises
     LanguageServerConnectionStopped"""
 
-    data = bytes( b'' )
+    # All data read from the server is accumulated in a single buffer. Headers
+    # are located with a single search and payloads are handed to the parser
+    # through a memoryview, so that each byte received is copied as few times as
+    # possible regardless of how the server chunks its output.
+    data = bytearray()
     while True:
-      data, read_bytes, headers = self._ReadHeaders( data )
+      headers, content_start = self._ReadHeaders( data )
 
       if 'Content-Length' not in headers:
         # FIXME: We could try and recover this, but actually the message pump
         # just fails.
         raise ValueError( "Missing 'Content-Length' header" )
 
-      content_length = int( headers[ 'Content-Length' ] )
+      content_end = content_start + int( headers[ 'Content-Length' ] )
 
-      # We need to read content_length bytes for the payload of this message.
-      # This may be in the remainder of `data`, but equally we may need to read
-      # more data from the socket.
-      content = bytes( b'' )
-      content_read = 0
-      if read_bytes < len( data ):
-        # There are bytes left in data, use them
-        data = data[ read_bytes: ]
+      # The payload of this message may be in the remainder of `data`, but
+      # equally we may need to read more data from the socket.
+      while len( data ) < content_end:
+        data += self.ReadData( content_end - len( data ) )
 
-        # Read up to content_length bytes from data
-        content_to_read = min( content_length, len( data ) )
-        content += data[ : content_to_read ]
-        content_read += len( content )
-        read_bytes = content_to_read
+      with memoryview( data ) as view:
+        with view[ content_start : content_end ] as content:
+          if LOGGER.isEnabledFor( logging.DEBUG ):
+            LOGGER.debug( 'RX: Received message: %r', bytes( content ) )
 
-      while content_read < content_length:
-        # There is more content to read, but data is exhausted - read more from
-        # the socket
-        data = self.ReadData( content_length - content_read )
-        content_to_read = min( content_length - content_read, len( data ) )
-        content += data[ : content_to_read ]
-        content_read += len( content )
-        read_bytes = content_to_read
+          # lsp will convert content to Unicode
+          message = lsp.Parse( content )
 
-      LOGGER.debug( 'RX: Received message: %r', content )
+      # Discard the consumed message. Anything left over is the start of the
+      # next message.
+      del data[ : content_end ]
 
-      # lsp will convert content to Unicode
-      self._DispatchMessage( lsp.Parse( content ) )
-
-      # We only consumed len( content ) of data. If there is more, we start
-      # again with the remainder and look for headers
-      data = data[ read_bytes : ]
+      self._DispatchMessage( message )
 
 
   def _ReadHeaders( self, data ):
-    """Starting with the data in |data| read headers from the stream/socket
-    until a full set of headers has been consumed. Returns a tuple (
-      - data: any remaining unused data from |data| or the socket
-      - read_bytes: the number of bytes of returned data that have been consumed
+    """Starting with the data in the bytearray |data| read headers from the
+    stream/socket until a full set of headers has been consumed. Any data read
+    is appended to |data|. Returns a tuple (
       - headers: a dictionary whose keys are the header names and whose values
                  are the header values
+      - content_start: the offset in |data| at which the message content begins
     )"""
     # LSP defines only 2 headers, of which only 1 is useful (Content-Length).
     # Headers end with an empty line, and there is no guarantee that a single
     # socket or stream read will contain only a single message, or even a whole
     # message.
+    search_start = 0
+    while True:
+      match = HEADER_TERMINATOR_REGEX.search( data, search_start )
+      if match:
+        break
 
-    headers_complete = False
-    prefix = bytes( b'' )
-    headers = {}
-
-    while not headers_complete:
-      read_bytes = 0
-      last_line = 0
-      if len( data ) == 0:
-        data = self.ReadData()
-
-      while read_bytes < len( data ):
-        if utils.ToUnicode( data[ read_bytes: ] )[ 0 ] == '\n':
-          line = prefix + data[ last_line : read_bytes ].strip()
-          prefix = bytes( b'' )
-          last_line = read_bytes
-
-          if not line.strip():
-            headers_complete = True
-            read_bytes += 1
-            break
-          else:
-            try:
-              key, value = utils.ToUnicode( line ).split( ':', 1 )
-              headers[ key.strip() ] = value.strip()
-            except Exception:
-              LOGGER.exception( 'Received invalid protocol data from server: '
-                                 + str( line ) )
-              raise
-
-        read_bytes += 1
+      # The terminator may straddle two reads, so rescan the tail of the data
+      # we already have, but nothing before it.
+      search_start = max( 0, len( data ) - 3 )
+      data += self.ReadData()
 
-      if not headers_complete:
-        prefix = data[ last_line : ]
-        data = bytes( b'' )
+    headers = {}
+    for line in bytes( data[ : match.start() ] ).split( b'\n' ):
+      line = line.strip()
+      if not line:
+        continue
 
+      try:
+        key, value = utils.ToUnicode( line ).split( ':', 1 )
+        headers[ key.strip() ] = value.strip()
+      except Exception:
+        LOGGER.exception( 'Received invalid protocol data from server: '
+                           + str( line ) )
+        raise
 
-    return data, read_bytes, headers
+    return headers, match.end()
 
 
   def _HandleDynamicRegistrations( self, request ):
@@ -644,12 +789,17 @@ class LanguageServerConnection( threading.Thread ):
       else:
         # This is a response to the message with id message[ 'id' ]
         with self._response_mutex:
-          assert message_id in self._responses
-          self._responses[ message_id ].ResponseReceived( message )
-          del self._responses[ message_id ]
+          response = self._responses.pop( message_id, None )
+          if response is None:
+            # The request was cancelled, so nobody awaits its response.
+            LOGGER.debug( 'Ignoring response to cancelled request %s',
+                          message_id )
+            return
+          response.ResponseReceived( message )
+          self._response_slot_available.notify()
     else:
       # This is a notification
-      self._AddNotificationToQueue( message )
+      self._notifications.Put( message )
 
       # If there is an immediate (in-message-pump-thread) handler configured,
       # call it.
@@ -661,27 +811,6 @@ class LanguageServerConnection( threading.Thread ):
                             message )
 
 
-  def _AddNotificationToQueue( self, message ):
-    while True:
-      try:
-        self._notifications.put_nowait( message )
-        return
-      except queue.Full:
-        pass
-
-      # The queue (ring buffer) is full.  This indicates either a slow
-      # consumer or the message poll is not running. In any case, rather than
-      # infinitely queueing, discard the oldest message and try again.
-      try:
-        self._notifications.get_nowait()
-      except queue.Empty:
-        # This is only a theoretical possibility to prevent this thread
-        # blocking in the unlikely event that all elements are removed from
-        # the queue between put_nowait and get_nowait. Unfortunately, this
-        # isn't testable without a debugger, so coverage will show up red.
-        pass # pragma: no cover
-
-
 class StandardIOLanguageServerConnection( LanguageServerConnection ):
   """Concrete language server connection using stdin/stdout to communicate with
   the server. This should be the default choice for concrete completers."""
@@ -993,7 +1122,8 @@ class LanguageServerCompleter( Completer ):
     #    whole completion;
     #  - the current column was sent to the server: cache stays valid while the
     #    cached query is a prefix of the subsequent queries.
-    self._completions_cache = LanguageServerCompletionsCache()
+    self._completions_cache = LanguageServerCompletionsCache(
+      type( self ).__name__ )
 
     self._completer_name = self.__class__.__name__.replace( 'Completer', '' )
     self._language = self._completer_name.lower()
@@ -1031,6 +1161,9 @@ class LanguageServerCompleter( Completer ):
     Implementations are required to call this after disconnection and killing
     the downstream server."""
     self._server_file_state = lsp.ServerFileStateStore()
+    # IDs of the completion requests sent to the server and not yet answered.
+    self._pending_completion_requests = set()
+    self._pending_completion_requests_mutex = threading.Lock()
     self._latest_diagnostics_mutex = threading.Lock()
     self._latest_diagnostics = collections.defaultdict( list )
     self._sync_type = 'Full'
@@ -1284,9 +1417,15 @@ class LanguageServerCompleter( Completer ):
     request_id = self.GetConnection().NextRequestId()
 
     msg = lsp.Completion( request_id, request_data, codepoint )
-    response = self.GetConnection().GetResponse( request_id,
-                                                 msg,
-                                                 REQUEST_TIMEOUT_COMPLETION )
+    with self._pending_completion_requests_mutex:
+      self._pending_completion_requests.add( request_id )
+    try:
+      response = self.GetConnection().GetResponse( request_id,
+                                                   msg,
+                                                   REQUEST_TIMEOUT_COMPLETION )
+    finally:
+      with self._pending_completion_requests_mutex:
+        self._pending_completion_requests.discard( request_id )
     result = response.get( 'result' ) or []
 
     if isinstance( result, list ):
@@ -1312,6 +1451,21 @@ class LanguageServerCompleter( Completer ):
             is_incomplete )
 
 
+  def OnCompletionRequestsSuperseded( self ):
+    with self._pending_completion_requests_mutex:
+      request_ids = self._pending_completion_requests
+      self._pending_completion_requests = set()
+
+    connection = self.GetConnection()
+    # The server may have been shut down since these requests were sent.
+    if connection is None:
+      return
+
+    for request_id in request_ids:
+      LOGGER.debug( 'Cancelling superseded completion request %s', request_id )
+      connection.CancelRequest( request_id )
+
+
   def _GetCandidatesFromSubclass( self, request_data ):
     cache_completions = self._completions_cache.GetCompletionsIfCacheValid(
       request_data )
@@ -1346,7 +1500,8 @@ class LanguageServerCompleter( Completer ):
     return self._CandidatesFromCompletionItems(
       [ c[ 'extra_data' ][ 'item' ] for c in completions ],
       LanguageServerCompleter.RESOLVE_ALL,
-      request_data )
+      request_data,
+      cancel_when_superseded = True )
 
 
   def DetailSingleCandidate( self, request_data, completions, to_resolve ):
@@ -1360,21 +1515,63 @@ class LanguageServerCompleter( Completer ):
       request_data )[ 0 ]
 
 
-  def _ResolveCompletionItem( self, item ):
+  def _ResolveCompletionItems( self, items, cancel_when_superseded ):
+    """Resolves each of |items| in place. All the resolve requests are sent
+    before awaiting any response, so that the server handles them in a single
+    pipeline rather than one round trip at a time. Items which could not be
+    resolved by the (common) deadline keep their basic data; the requests for
+    them are cancelled. When |cancel_when_superseded| is set, the requests are
+    also cancelled when a new completion request starts."""
+    connection = self.GetConnection()
+    resolve_ids = [ connection.NextRequestId() for _ in items ]
+    if cancel_when_superseded:
+      with self._pending_completion_requests_mutex:
+        self._pending_completion_requests.update( resolve_ids )
+
+    deadline = time.monotonic() + REQUEST_TIMEOUT_COMPLETION
     try:
-      resolve_id = self.GetConnection().NextRequestId()
-      resolve = lsp.ResolveCompletion( resolve_id, item )
-      response = self.GetConnection().GetResponse(
-        resolve_id,
-        resolve,
-        REQUEST_TIMEOUT_COMPLETION )
-      item.clear()
-      item.update( response[ 'result' ] )
-    except ResponseFailedException:
-      LOGGER.exception( 'A completion item could not be resolved. Using '
-                        'basic data' )
+      pending_responses = []
+      for resolve_id, item in zip( resolve_ids, items ):
+        try:
+          pending_responses.append( ( item, resolve_id, (
+            connection.GetResponseAsync(
+              resolve_id,
+              lsp.ResolveCompletion( resolve_id, item ),
+              timeout = max( deadline - time.monotonic(), 0 ) ) ) ) )
+        except ResponseTimeoutException:
+          LOGGER.debug( 'Too many outstanding requests to resolve the '
+                        'remaining items. Using basic data' )
+          break
 
-    return item
+      self._AwaitResolvedCompletionItems( pending_responses, deadline )
+    finally:
+      with self._pending_completion_requests_mutex:
+        self._pending_completion_requests.difference_update( resolve_ids )
+
+
+  def _AwaitResolvedCompletionItems( self, pending_responses, deadline ):
+    """Updates each item of |pending_responses|, a list of ( item, resolve_id,
+    response ), with its resolved data, awaiting the responses until
+    |deadline|."""
+    connection = self.GetConnection()
+    for item, resolve_id, response in pending_responses:
+      try:
+        result = response.AwaitResponse(
+          max( deadline - time.monotonic(), 0 ) )[ 'result' ]
+      except ResponseFailedException:
+        LOGGER.exception( 'A completion item could not be resolved. Using '
+                          'basic data' )
+      except ResponseTimeoutException:
+        LOGGER.debug( 'Resolve request %s timed out. Using basic data',
+                      resolve_id )
+        connection.CancelRequest( resolve_id )
+        continue
+      except ResponseCancelledException:
+        continue
+      else:
+        item.clear()
+        item.update( result )
+      item[ '_resolved' ] = True
 
 
   def _ShouldResolveCompletionItems( self ):
@@ -1388,9 +1585,13 @@ class LanguageServerCompleter( Completer ):
   def _CandidatesFromCompletionItems( self,
                                       items,
                                       resolve_completions,
-                                      request_data ):
-    """Issue the resolve request for each completion item in |items|, then fix
-    up the items such that a single start codepoint is used."""
+                                      request_data,
+                                      cancel_when_superseded = False ):
+    """Issue the resolve requests for the completion items in |items|, then fix
+    up the items such that a single start codepoint is used. The resolve
+    requests are cancelled by a new completion request if
+    |cancel_when_superseded| is set, i.e. when resolving is part of the
+    completion request rather than a /resolve_completion request."""
 
     #
     # Important note on the following logic:
@@ -1427,19 +1628,15 @@ class LanguageServerCompleter( Completer ):
     unique_start_codepoints = []
     min_start_codepoint = request_data[ 'start_codepoint' ]
 
+    if resolve_completions and self._resolve_completion_items:
+      self._ResolveCompletionItems(
+        [ item for item in items if not item.get( '_resolved', False ) ],
+        cancel_when_superseded )
+
     # First generate all of the completion items and store their
     # start_codepoints. Then, we fix-up the completion texts to use the
     # earliest start_codepoint by borrowing text from the original line.
     for idx, item in enumerate( items ):
-      this_tem_is_resolved = item.get( '_resolved', False )
-
-      if ( resolve_completions and
-           not this_tem_is_resolved and
-           self._resolve_completion_items ):
-        self._ResolveCompletionItem( item )
-        item[ '_resolved' ] = True
-        this_tem_is_resolved = True
-
       try:
         insertion_text, extra_data, start_codepoint = (
           _InsertionTextForItem( request_data, item ) )
@@ -1633,6 +1830,16 @@ class LanguageServerCompleter( Completer ):
                                              servers = [ server ] )
 
 
+  def QueueDepths( self ):
+    connection = self.GetConnection()
+    if not connection:
+      return {}
+    return {
+      'pending_requests': connection.PendingRequestCount(),
+      'queued_notifications': connection.QueuedNotificationCount()
+    }
+
+
   def GetCustomSubcommands( self ):
     """Return a list of subcommand definitions to be used in conjunction with
     the subcommands detected by _DiscoverSubcommandSupport. The return is a dict
@@ -1802,7 +2009,7 @@ class LanguageServerCompleter( Completer ):
     # polling mechanism.
     filepath = request_data[ 'filepath' ]
     uri = lsp.FilePathToUri( filepath )
-    contents = GetFileLines( request_data, filepath )
+    contents = lsp.LineOffsetIndex( GetFileLines( request_data, filepath ) )
     with self._latest_diagnostics_mutex:
       if uri in self._latest_diagnostics:
         diagnostics = [ _BuildDiagnostic( contents, uri, diag )
@@ -1821,6 +2028,14 @@ class LanguageServerCompleter( Completer ):
     return self._AwaitServerMessages( request_data, timeout )
 
 
+  def _PublishParseMessage( self, filepath, message ):
+    super()._PublishParseMessage( filepath, message )
+    # Wake up a long-poll waiting for notifications from the server.
+    connection = self.GetConnection()
+    if connection:
+      connection._notifications.Wake()
+
+
   def _GetPendingMessages( self, request_data ):
     """Convert any pending notifications to messages and return them in a list.
     If there are no messages pending, returns an empty list. Returns False if an
@@ -1832,59 +2047,59 @@ class LanguageServerCompleter( Completer ):
       # pending, and in any case they will be handled later.
       return messages
 
-    try:
-      while True:
-        if not self.GetConnection():
-          # The server isn't running or something. Don't re-poll.
-          return False
-
-        notification = self.GetConnection()._notifications.get_nowait()
-        message = self.ConvertNotificationToMessage( request_data,
-                                                     notification )
+    if not self.GetConnection():
+      # The server isn't running or something. Don't re-poll.
+      return False
 
-        if message:
-          messages.append( message )
-    except queue.Empty:
-      # We drained the queue
-      pass
+    for notification in self.GetConnection()._notifications.Take():
+      message = self.ConvertNotificationToMessage( request_data,
+                                                   notification )
+      if message:
+        messages.append( message )
 
     return messages
 
 
   def _AwaitServerMessages( self, request_data, timeout ):
-    """Block until either we receive a notification, or a timeout occurs.
+    """Block until either we receive notifications, or a timeout occurs.
     Returns one of the following:
-       - a list containing a single message
+       - a list of the messages for all the notifications received
        - True if a timeout occurred, and the poll should be restarted
        - False if an error occurred, and no further polling should be attempted
     """
-    try:
-      while True:
-        if not self._initialize_event.is_set():
-          # The request came before we started up, wait for startup to complete,
-          # then tell the client to re-send the request. Note, we perform this
-          # check on every iteration, as the server may be legitimately
-          # restarted while this loop is running.
-          self._initialize_event.wait( timeout=timeout )
-
-          # If the timeout is hit waiting for the server to be ready, after we
-          # tried to start the server, we return False and kill the message
-          # poll.
-          return not self._server_started or self._initialize_event.is_set()
-
-        if not self.GetConnection():
-          # The server isn't running or something. Don't re-poll, as this will
-          # just cause errors.
-          return False
-
-        notification = self.GetConnection()._notifications.get(
-          timeout = timeout )
-        message = self.ConvertNotificationToMessage( request_data,
-                                                     notification )
-        if message:
-          return [ message ]
-    except queue.Empty:
-      return True
+    while True:
+      if not self._initialize_event.is_set():
+        # The request came before we started up, wait for startup to complete,
+        # then tell the client to re-send the request. Note, we perform this
+        # check on every iteration, as the server may be legitimately
+        # restarted while this loop is running.
+        self._initialize_event.wait( timeout=timeout )
+
+        # If the timeout is hit waiting for the server to be ready, after we
+        # tried to start the server, we return False and kill the message
+        # poll.
+        return not self._server_started or self._initialize_event.is_set()
+
+      if not self.GetConnection():
+        # The server isn't running or something. Don't re-poll, as this will
+        # just cause errors.
+        return False
+
+      notifications = self.GetConnection()._notifications.Take(
+        timeout = timeout )
+
+      # The wait is also interrupted when FileReadyToParse is handled
+      # asynchronously and its result is published.
+      messages = self._PopParseMessages()
+      messages.extend(
+        self.ConvertNotificationToMessage( request_data, notification )
+        for notification in notifications )
+      messages = [ message for message in messages if message ]
+      if messages:
+        return messages
+
+      if not notifications:
+        return True
 
 
   def GetDefaultNotificationHandler( self ):
@@ -1946,6 +2161,7 @@ class LanguageServerCompleter( Completer ):
             self._server_file_state[ filepath ].contents )
         else:
           contents = GetFileLines( request_data, filepath )
+      contents = lsp.LineOffsetIndex( contents )
       diagnostics = [ _BuildDiagnostic( contents, uri, x )
                       for x in params[ 'diagnostics' ] ]
       return {
@@ -2001,6 +2217,7 @@ class LanguageServerCompleter( Completer ):
         continue
 
       file_state = self._server_file_state[ file_name ]
+      previous_contents = file_state.contents
       action = file_state.GetDirtyFileAction( file_data[ 'contents' ] )
 
       LOGGER.debug( 'Refreshing file %s: State is %s/action %s',
@@ -2015,12 +2232,9 @@ class LanguageServerCompleter( Completer ):
 
         self.GetConnection().SendNotification( msg )
       elif action == lsp.ServerFileState.CHANGE_FILE:
-        # FIXME: DidChangeTextDocument doesn't actually do anything
-        # different from DidOpenTextDocument other than send the right
-        # message, because we don't actually have a mechanism for generating
-        # the diffs. This isn't strictly necessary, but might lead to
-        # performance problems.
-        msg = lsp.DidChangeTextDocument( file_state, file_data[ 'contents' ] )
+        msg = self._DidChangeTextDocument( file_state,
+                                           previous_contents,
+                                           file_data[ 'contents' ] )
 
         self.GetConnection().SendNotification( msg )
 
@@ -2039,10 +2253,14 @@ class LanguageServerCompleter( Completer ):
       # the request, we check to see if its on-disk contents match the latest in
       # the server. If they don't, we send an update.
       #
-      # FIXME: This is really inefficient currently, as it reads the entire file
-      # on every update. It might actually be better to close files which have
-      # been saved and are no longer "dirty", though that would likely be less
-      # efficient for downstream servers which cache e.g. AST.
+      # Reading and hashing every such file on every request is expensive, so
+      # the file is only read when its stat signature differs from the one
+      # recorded the last time we read it.
+      signature = utils.GetFileStatSignature( file_name )
+      if ( signature is not None and
+           signature == file_state.saved_file_signature ):
+        continue
+
       try:
         contents = GetFileContents( request_data, file_name )
       except IOError:
@@ -2058,14 +2276,30 @@ class LanguageServerCompleter( Completer ):
         files_to_purge.append( file_name )
         continue
 
+      previous_contents = file_state.contents
       action = file_state.GetSavedFileAction( contents )
+      if file_state.state == lsp.ServerFileState.OPEN:
+        file_state.saved_file_signature = signature
       if action == lsp.ServerFileState.CHANGE_FILE:
-        msg = lsp.DidChangeTextDocument( file_state, contents )
+        msg = self._DidChangeTextDocument( file_state,
+                                           previous_contents,
+                                           contents )
         self.GetConnection().SendNotification( msg )
 
     return files_to_purge
 
 
+  def _DidChangeTextDocument( self, file_state, previous_contents, contents ):
+    """Returns the didChange notification for the new |contents| of the file.
+    When the server supports incremental sync, only the lines which differ from
+    |previous_contents| (the contents last sent to the server) are sent."""
+    if self._sync_type == 'Incremental':
+      return lsp.DidChangeTextDocument( file_state,
+                                        contents,
+                                        previous_contents )
+    return lsp.DidChangeTextDocument( file_state, contents )
+
+
   def _PurgeMissingFilesUnderLock( self, files_to_purge ):
     # ycmd clients only send buffers which have changed, and are required to
     # send BufferUnload autocommand when files are closed.
@@ -2355,37 +2589,42 @@ class LanguageServerCompleter( Completer ):
     raise NoHoverInfoException( NO_HOVER_INFORMATION )
 
 
-  def _GoToRequest( self, request_data, handler ):
-    request_id = self.GetConnection().NextRequestId()
-    result = self.GetConnection().GetResponse(
-      request_id,
-      getattr( lsp, handler )( request_id, request_data ),
-      REQUEST_TIMEOUT_COMMAND )[ 'result' ]
-    if not result:
-      raise RuntimeError( 'Cannot jump to location' )
-    if not isinstance( result, list ):
-      return [ result ]
-    return result
-
-
   def GoTo( self, request_data, handlers ):
-    """Issues a GoTo request for each handler in |handlers| until it returns
-    multiple locations or a location the cursor does not belong since the user
-    wants to jump somewhere else. If that's the last handler, the location is
-    returned anyway."""
+    """Uses the result of the first handler in |handlers| which returns multiple
+    locations or a location the cursor does not belong since the user wants to
+    jump somewhere else. If that's the last handler, the location is returned
+    anyway. The requests for all the handlers are issued at once, and those
+    whose result is not needed are cancelled."""
     if not self.ServerIsReady():
       raise RuntimeError( 'Server is initializing. Please wait.' )
 
     self._UpdateServerWithFileContents( request_data )
 
-    if len( handlers ) == 1:
-      result = self._GoToRequest( request_data, handlers[ 0 ] )
-    else:
+    connection = self.GetConnection()
+    pending = []
+    deadline = time.monotonic() + REQUEST_TIMEOUT_COMMAND
+    try:
       for handler in handlers:
-        result = self._GoToRequest( request_data, handler )
+        request_id = connection.NextRequestId()
+        pending.append( ( request_id, connection.GetResponseAsync(
+          request_id,
+          getattr( lsp, handler )( request_id, request_data ),
+          timeout = max( deadline - time.monotonic(), 0 ) ) ) )
+
+      for _, response in pending:
+        result = response.AwaitResponse(
+          max( deadline - time.monotonic(), 0 ) )[ 'result' ]
+        if not result:
+          raise RuntimeError( 'Cannot jump to location' )
+        if not isinstance( result, list ):
+          result = [ result ]
         if len( result ) > 1 or not _CursorInsideLocation( request_data,
                                                            result[ 0 ] ):
           break
+    finally:
+      for request_id, response in pending:
+        if not response.Done():
+          connection.CancelRequest( request_id )
 
     return _LocationListToGoTo( request_data, result )
 
@@ -2593,7 +2832,7 @@ class LanguageServerCompleter( Completer ):
                                                  message,
                                                  REQUEST_TIMEOUT_COMMAND )
     filepath = request_data[ 'filepath' ]
-    contents = GetFileLines( request_data, filepath )
+    contents = lsp.LineOffsetIndex( GetFileLines( request_data, filepath ) )
     chunks = [ responses.FixItChunk( text_edit[ 'newText' ],
                                      _BuildRange( contents,
                                                   filepath,
@@ -2848,7 +3087,7 @@ def _InsertionTextForItem( request_data, item ):
 
   if additional_text_edits:
     filepath = request_data[ 'filepath' ]
-    contents = GetFileLines( request_data, filepath )
+    contents = lsp.LineOffsetIndex( GetFileLines( request_data, filepath ) )
     chunks = [ responses.FixItChunk( e[ 'newText' ],
                                      _BuildRange( contents,
                                                   filepath,
@@ -2967,25 +3206,27 @@ def _GetCompletionItemStartCodepointOrReject( text_edit, request_data ):
 
 def _LocationListToGoTo( request_data, positions ):
   """Convert a LSP list of locations to a ycmd GoTo response."""
+  indexes = LineOffsetIndexStore( request_data )
   try:
     if len( positions ) > 1:
       return [
         responses.BuildGoToResponseFromLocation(
-          *_PositionToLocationAndDescription( request_data, position ) )
+          *_PositionToLocationAndDescription( indexes, position ) )
         for position in positions
       ]
     return responses.BuildGoToResponseFromLocation(
-      *_PositionToLocationAndDescription( request_data, positions[ 0 ] ) )
+      *_PositionToLocationAndDescription( indexes, positions[ 0 ] ) )
   except ( IndexError, KeyError ):
     raise RuntimeError( 'Cannot jump to location' )
 
 
 def _SymbolInfoListToGoTo( request_data, symbols ):
   """Convert a list of LSP SymbolInformation into a YCM GoTo response"""
+  indexes = LineOffsetIndexStore( request_data )
 
   def BuildGoToLocationFromSymbol( symbol ):
     location, line_value = _PositionToLocationAndDescription(
-      request_data,
+      indexes,
       symbol[ 'location' ] )
 
     description = ( f'{ lsp.SYMBOL_KIND[ symbol[ "kind" ] ] }: '
@@ -3011,22 +3252,23 @@ def _SymbolInfoListToGoTo( request_data, symbols ):
     return locations
 
 
-def _PositionToLocationAndDescription( request_data, position ):
-  """Convert a LSP position to a ycmd location."""
+def _PositionToLocationAndDescription( indexes, position ):
+  """Convert a LSP position to a ycmd location. |indexes| is the
+  LineOffsetIndexStore of the response."""
   try:
     filename = lsp.UriToFilePath( position[ 'uri' ] )
-    file_contents = GetFileLines( request_data, filename )
+    file_contents = indexes[ filename ]
   except lsp.InvalidUriException:
     LOGGER.debug( 'Invalid URI, file contents not available in GoTo' )
     filename = ''
-    file_contents = []
+    file_contents = lsp.LineOffsetIndex( [] )
   except IOError:
     # It's possible to receive positions for files which no longer exist (due to
     # race condition). UriToFilePath doesn't throw IOError, so we can assume
     # that filename is already set.
     LOGGER.exception( 'A file could not be found when determining a '
                       'GoTo location' )
-    file_contents = []
+    file_contents = lsp.LineOffsetIndex( [] )
 
   return _BuildLocationAndDescription( filename,
                                        file_contents,
@@ -3034,18 +3276,19 @@ def _PositionToLocationAndDescription( request_data, position ):
 
 
 def _LspToYcmdLocation( file_contents, location ):
-  """Converts a LSP location to a ycmd one. Returns a tuple of (
+  """Converts a LSP location to a ycmd one. |file_contents| is the
+  lsp.LineOffsetIndex of the file. Returns a tuple of (
      - the contents of the line of |location|
      - the line number of |location|
      - the byte offset converted from the UTF-16 offset of |location|
   )"""
-  line_num = location[ 'line' ] + 1
+  line_index = location[ 'line' ]
+  line_num = line_index + 1
   try:
-    line_value = file_contents[ location[ 'line' ] ]
-    return line_value, line_num, utils.CodepointOffsetToByteOffset(
-      line_value,
-      lsp.UTF16CodeUnitsToCodepoints( line_value,
-                                      location[ 'character' ] + 1 ) )
+    line_value = file_contents[ line_index ]
+    return line_value, line_num, file_contents.UTF16CodeUnitsToBytes(
+      line_index,
+      location[ 'character' ] + 1 )
   except IndexError:
     # This can happen when there are stale diagnostics in OnFileReadyToParse,
     # just return the value as-is.
@@ -3064,7 +3307,7 @@ def _CursorInsideLocation( request_data, location ):
 
   line = request_data[ 'line_num' ]
   column = request_data[ 'column_num' ]
-  file_contents = GetFileLines( request_data, filepath )
+  file_contents = lsp.LineOffsetIndex( GetFileLines( request_data, filepath ) )
   lsp_range = location[ 'range' ]
 
   _, start_line, start_column = _LspToYcmdLocation( file_contents,
@@ -3093,7 +3336,8 @@ def _BuildLocationAndDescription( filename, file_contents, location ):
 
 
 def _BuildRange( contents, filename, r ):
-  """Returns a ycmd range from a LSP range |r|."""
+  """Returns a ycmd range from a LSP range |r|. |contents| is the
+  lsp.LineOffsetIndex of the file."""
   return responses.Range( _BuildLocationAndDescription( filename,
                                                         contents,
                                                         r[ 'start' ] )[ 0 ],
@@ -3127,15 +3371,18 @@ def _BuildDiagnostic( contents, uri, diag ):
     kind = lsp.SEVERITY[ diag.get( 'severity' ) or 1 ].upper() )
 
 
-def TextEditToChunks( request_data, uri, text_edit ):
-  """Returns a list of FixItChunks from a LSP textEdit."""
+def TextEditToChunks( request_data, uri, text_edit, indexes = None ):
+  """Returns a list of FixItChunks from a LSP textEdit. |indexes| is the
+  LineOffsetIndexStore shared by the response, if any."""
   try:
     filepath = lsp.UriToFilePath( uri )
   except lsp.InvalidUriException:
     LOGGER.debug( 'Invalid filepath received in TextEdit' )
     filepath = ''
 
-  contents = GetFileLines( request_data, filepath )
+  if indexes is None:
+    indexes = LineOffsetIndexStore( request_data )
+  contents = indexes[ filepath ]
   return [
     responses.FixItChunk( change[ 'newText' ],
                           _BuildRange( contents,
@@ -3155,6 +3402,7 @@ def WorkspaceEditToFixIt( request_data,
   if not workspace_edit:
     return None
 
+  indexes = LineOffsetIndexStore( request_data )
   if 'changes' in workspace_edit:
     chunks = []
     # We sort the filenames to make the response stable. Edits are applied in
@@ -3163,13 +3411,14 @@ def WorkspaceEditToFixIt( request_data,
     for uri in sorted( workspace_edit[ 'changes' ].keys() ):
       chunks.extend( TextEditToChunks( request_data,
                                        uri,
-                                       workspace_edit[ 'changes' ][ uri ] ) )
+                                       workspace_edit[ 'changes' ][ uri ],
+                                       indexes ) )
   else:
     chunks = []
     for text_document_edit in workspace_edit[ 'documentChanges' ]:
       uri = text_document_edit[ 'textDocument' ][ 'uri' ]
       edits = text_document_edit[ 'edits' ]
-      chunks.extend( TextEditToChunks( request_data, uri, edits ) )
+      chunks.extend( TextEditToChunks( request_data, uri, edits, indexes ) )
   return responses.FixIt(
     responses.Location( request_data[ 'line_num' ],
                         request_data[ 'column_num' ],
@@ -3179,45 +3428,49 @@ def WorkspaceEditToFixIt( request_data,
     kind )
 
 
-class LanguageServerCompletionsCache( CompletionsCache ):
-  """Cache of computed LSP completions for a particular request."""
+class LineOffsetIndexStore( dict ):
+  """Lazily builds the lsp.LineOffsetIndex of each file needed to build a single
+  response, so that each file is read and split, and each of its lines walked,
+  at most once however many positions the response contains."""
+  def __init__( self, request_data ):
+    super().__init__()
+    self._request_data = request_data
 
-  def Invalidate( self ):
-    with self._access_lock:
-      super().InvalidateNoLock()
-      self._is_incomplete = False
-      self._use_start_column = True
+
+  def __missing__( self, filepath ):
+    self[ filepath ] = lsp.LineOffsetIndex(
+      GetFileLines( self._request_data, filepath ) )
+    return self[ filepath ]
 
 
+class LanguageServerCompletionsCache( CompletionsCache ):
+  """Cache of computed LSP completions for recent requests. Each entry records
+  whether its completions were requested at the start column, and are thus
+  valid for the whole completion, or at the current column."""
+
   def Update( self, request_data, completions, is_incomplete ):
     with self._access_lock:
-      super().UpdateNoLock( request_data, completions )
-      self._is_incomplete = is_incomplete
-      if is_incomplete:
-        self._use_start_column = False
+      previous = self._EntryAtPositionNoLock( request_data )
+      use_start_column = previous is None or previous.use_start_column
+      entry = super().UpdateNoLock( request_data, completions )
+      entry.is_incomplete = is_incomplete
+      entry.use_start_column = use_start_column and not is_incomplete
 
 
   def GetCodepointForCompletionRequest( self, request_data ):
     with self._access_lock:
-      if self._use_start_column:
+      entry = self._EntryAtPositionNoLock( request_data )
+      if entry is None or entry.use_start_column:
         return request_data[ 'start_codepoint' ]
       return request_data[ 'column_codepoint' ]
 
 
-  # Must be called under the lock.
-  def _IsQueryPrefix( self, request_data ):
-    return request_data[ 'query' ].startswith( self._request_data[ 'query' ] )
-
-
-  def GetCompletionsIfCacheValid( self,
-                                  request_data,
-                                  **kwargs ):
-    with self._access_lock:
-      if ( ( not self._is_incomplete
-             or kwargs.get( 'ignore_incomplete' ) ) and
-           ( self._use_start_column or self._IsQueryPrefix( request_data ) ) ):
-        return super().GetCompletionsIfCacheValidNoLock( request_data )
-      return None
+  def _IsEntryUsable( self, entry, request_data, **kwargs ):
+    if entry.is_incomplete and not kwargs.get( 'ignore_incomplete' ):
+      return False
+    return ( entry.use_start_column or
+             request_data[ 'query' ].startswith(
+               entry.request_data[ 'query' ] ) )
 
 
 class RejectCollector:
@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
 import collections
 import os
 import json
@@ -23,6 +24,7 @@ from urllib.parse import urljoin, urlparse, unquote
 from urllib.request import pathname2url, url2pathname
 
 from ycmd.utils import ( ByteOffsetToCodepointOffset,
+                         SplitLines,
                          ToBytes,
                          ToUnicode,
                          UpdateDict )
@@ -144,6 +146,25 @@ class InvalidUriException( Exception ):
   pass
 
 
+def Sha1Fingerprint( contents ):
+  """Cryptographic checksum of the UTF-8 encoded |contents|. This is the most
+  expensive fingerprint as the whole buffer is encoded and hashed."""
+  return hashlib.sha1( ToBytes( contents ) ).digest()
+
+
+def HashFingerprint( contents ):
+  """Python's built-in, non-cryptographic, string hash of |contents|. It is
+  only stable within a single process, which is all ServerFileState needs."""
+  return hash( contents )
+
+
+# Function used by ServerFileState to fingerprint the contents of a file in
+# order to detect changes. If None, the contents are compared directly with the
+# last contents sent to the server. In all cases, the lengths of the contents
+# are compared first.
+CONTENT_FINGERPRINT = HashFingerprint
+
+
 class ServerFileStateStore( dict ):
   """Trivial default-dict-like class to hold ServerFileState for a given
   filepath. Language server clients must maintain one of these for each language
@@ -173,23 +194,28 @@ class ServerFileState:
     self.state = ServerFileState.CLOSED
     self.checksum = None
     self.contents = ''
+    # Stat signature (see utils.GetFileStatSignature) of the file on disk when
+    # its contents were last read, or None if the contents sent to the server
+    # came from a dirty buffer.
+    self.saved_file_signature = None
 
 
   def GetDirtyFileAction( self, contents ):
     """Progress the state for a file to be updated due to being supplied in the
     dirty buffers list. Returns any one of the Actions to perform."""
-    new_checksum = self._CalculateCheckSum( contents )
+    self.saved_file_signature = None
 
-    if ( self.state == ServerFileState.OPEN and
-         self.checksum.digest() == new_checksum.digest() ):
-      return ServerFileState.NO_ACTION
-    elif self.state == ServerFileState.CLOSED:
+    if self.state == ServerFileState.CLOSED:
       self.version = 0
-      action = ServerFileState.OPEN_FILE
-    else:
-      action = ServerFileState.CHANGE_FILE
+      return self._SendNewVersion( ServerFileState.OPEN_FILE, contents )
 
-    return self._SendNewVersion( new_checksum, action, contents )
+    changed, checksum = self._ContentsChanged( contents )
+    if not changed:
+      return ServerFileState.NO_ACTION
+
+    return self._SendNewVersion( ServerFileState.CHANGE_FILE,
+                                 contents,
+                                 checksum )
 
 
   def GetSavedFileAction( self, contents ):
@@ -200,18 +226,19 @@ class ServerFileState:
     if self.state != ServerFileState.OPEN:
       return ServerFileState.NO_ACTION
 
-    new_checksum = self._CalculateCheckSum( contents )
-    if self.checksum.digest() == new_checksum.digest():
+    changed, checksum = self._ContentsChanged( contents )
+    if not changed:
       return ServerFileState.NO_ACTION
 
-    return self._SendNewVersion( new_checksum,
-                                 ServerFileState.CHANGE_FILE,
-                                 contents )
+    return self._SendNewVersion( ServerFileState.CHANGE_FILE,
+                                 contents,
+                                 checksum )
 
 
   def GetFileCloseAction( self ):
     """Progress the state for a file which was closed in the client. Returns one
     of the actions to perform: either NO_ACTION or CLOSE_FILE."""
+    self.saved_file_signature = None
     if self.state == ServerFileState.OPEN:
       self.state = ServerFileState.CLOSED
       return ServerFileState.CLOSE_FILE
@@ -220,8 +247,11 @@ class ServerFileState:
     return ServerFileState.NO_ACTION
 
 
-  def _SendNewVersion( self, new_checksum, action, contents ):
-    self.checksum = new_checksum
+  def _SendNewVersion( self, action, contents, checksum = None ):
+    """Records |contents| as the version sent to the server. |checksum| is
+    their fingerprint, if it was already computed."""
+    self.checksum = ( checksum if checksum is not None else
+                      self._CalculateCheckSum( contents ) )
     self.version = self.version + 1
     self.state = ServerFileState.OPEN
     self.contents = contents
@@ -229,8 +259,26 @@ class ServerFileState:
     return action
 
 
+  def _ContentsChanged( self, contents ):
+    """Returns a tuple ( changed, checksum ) where |changed| is whether
+    |contents| differ from the contents last sent to the server and |checksum|
+    is their fingerprint if it had to be computed, None otherwise. The
+    fingerprint is returned so that it isn't computed again if the file is
+    updated."""
+    if len( contents ) != len( self.contents ):
+      return True, None
+
+    if CONTENT_FINGERPRINT is None:
+      return contents != self.contents, None
+
+    checksum = self._CalculateCheckSum( contents )
+    return checksum != self.checksum, checksum
+
+
   def _CalculateCheckSum( self, contents ):
-    return hashlib.sha1( ToBytes( contents ) )
+    if CONTENT_FINGERPRINT is None:
+      return None
+    return CONTENT_FINGERPRINT( contents )
 
 
 def BuildRequest( request_id, method, parameters ):
@@ -392,6 +440,12 @@ def DidChangeWatchedFiles( path, kind ):
   } )
 
 
+def CancelRequest( request_id ):
+  return BuildNotification( '$/cancelRequest', {
+    'id': request_id
+  } )
+
+
 def DidChangeConfiguration( config ):
   return BuildNotification( 'workspace/didChangeConfiguration', {
     'settings': config,
@@ -409,18 +463,69 @@ def DidOpenTextDocument( file_state, file_types, file_contents ):
   } )
 
 
-def DidChangeTextDocument( file_state, file_contents ):
+def DidChangeTextDocument( file_state,
+                           file_contents,
+                           previous_contents = None ):
+  """Builds a didChange notification for the new |file_contents|. If
+  |previous_contents| is supplied, the change is described as a single range
+  edit of the previous contents (incremental sync), otherwise the full contents
+  are sent (full sync)."""
+  if previous_contents is None:
+    change = { 'text': file_contents }
+  else:
+    change = IncrementalContentChange( previous_contents, file_contents )
+
   return BuildNotification( 'textDocument/didChange', {
     'textDocument': {
       'uri': FilePathToUri( file_state.filename ),
       'version': file_state.version,
     },
-    'contentChanges': [
-      { 'text': file_contents },
-    ]
+    'contentChanges': [ change ]
   } )
 
 
+def IncrementalContentChange( old_contents, new_contents ):
+  """Returns a TextDocumentContentChangeEvent replacing the smallest range of
+  whole lines of |old_contents| such that the result is |new_contents|."""
+  old_lines = SplitLines( old_contents )
+  new_lines = SplitLines( new_contents )
+  max_common = min( len( old_lines ), len( new_lines ) )
+
+  # Only the last line has no trailing newline, so restrict the common prefix
+  # to lines that are newline-terminated in both documents.
+  prefix = 0
+  while ( prefix < max_common - 1 and
+          old_lines[ prefix ] == new_lines[ prefix ] ):
+    prefix += 1
+
+  suffix = 0
+  while ( suffix < max_common - prefix and
+          old_lines[ -1 - suffix ] == new_lines[ -1 - suffix ] ):
+    suffix += 1
+
+  if suffix:
+    old_end = len( old_lines ) - suffix
+    end = { 'line': old_end, 'character': 0 }
+    changed_lines = new_lines[ prefix : len( new_lines ) - suffix ]
+    text = ''.join( line + '\n' for line in changed_lines )
+  else:
+    # The change runs to the end of the document.
+    last_line = old_lines[ -1 ]
+    end = {
+      'line': len( old_lines ) - 1,
+      'character': len( last_line.encode( 'utf-16-le' ) ) // 2
+    }
+    text = '\n'.join( new_lines[ prefix : ] )
+
+  return {
+    'range': {
+      'start': { 'line': prefix, 'character': 0 },
+      'end': end,
+    },
+    'text': text
+  }
+
+
 def DidSaveTextDocument( file_state, file_contents ):
   params = {
     'textDocument': {
@@ -667,7 +772,11 @@ def _BuildMessageData( message ):
 
 
 def Parse( data ):
-  """Reads the raw language server message payload into a Python dictionary"""
+  """Reads the raw language server message payload into a Python dictionary.
+  |data| may be any bytes-like object, such as a memoryview of the message
+  pump's read buffer."""
+  if isinstance( data, ( bytearray, memoryview ) ):
+    return json.loads( str( data, 'utf8' ) )
   return json.loads( ToUnicode( data ) )
 
 
@@ -683,6 +792,9 @@ def CodepointsToUTF16CodeUnits( line_value, codepoint_offset ):
   # change out of
   # https://github.com/Microsoft/language-server-protocol/issues/376 then we
   # have to jump through hoops.
+  if line_value.isascii():
+    return min( codepoint_offset, len( line_value ) + 1 )
+
   if codepoint_offset > len( line_value ):
     return ( len( line_value.encode( 'utf-16-le' ) ) + 2 ) // 2
 
@@ -698,6 +810,9 @@ def UTF16CodeUnitsToCodepoints( line_value, code_unit_offset ):
   # UTF16, snip everything up to the code_unit_offset * 2 bytes (each code unit
   # is 2 bytes), then re-encode as unicode and return the length (in
   # codepoints).
+  if line_value.isascii():
+    return min( code_unit_offset, len( line_value ) + 1 )
+
   value_as_utf16_bytes = ToBytes( line_value.encode( 'utf-16-le' ) )
 
   byte_offset_utf16 = code_unit_offset * 2
@@ -710,6 +825,96 @@ def UTF16CodeUnitsToCodepoints( line_value, code_unit_offset ):
   return len( bytes_included.decode( 'utf-16-le' ) )
 
 
+class LineOffsetIndex:
+  """Converts offsets into the lines of a file between UTF-16 code units, as
+  used by the protocol, and the codepoints and UTF-8 bytes used by ycmd. Indexed
+  like the list of lines |lines| it is built from.
+
+  Offsets into ASCII lines are the same in all encodings. For other lines, a
+  table of the cumulative UTF-16 and UTF-8 lengths of each codepoint is built
+  the first time the line is converted, so that converting many positions of a
+  file walks each line at most once. Conversions are consistent with
+  CodepointsToUTF16CodeUnits, UTF16CodeUnitsToCodepoints and
+  CodepointOffsetToByteOffset."""
+
+  def __init__( self, lines ):
+    self._lines = lines
+    self._tables = {}
+
+
+  def __len__( self ):
+    return len( self._lines )
+
+
+  def __getitem__( self, line_index ):
+    return self._lines[ line_index ]
+
+
+  def _Table( self, line_index ):
+    """Returns the lists of cumulative UTF-16 and UTF-8 lengths of the
+    codepoints of the line |line_index|, or None if the line is ASCII."""
+    try:
+      return self._tables[ line_index ]
+    except KeyError:
+      pass
+
+    line_value = self._lines[ line_index ]
+    table = None
+    if not line_value.isascii():
+      utf16 = [ 0 ]
+      utf8 = [ 0 ]
+      for character in line_value:
+        codepoint = ord( character )
+        utf16.append( utf16[ -1 ] + ( 2 if codepoint > 0xFFFF else 1 ) )
+        utf8.append( utf8[ -1 ] + ( 1 if codepoint < 0x80 else
+                                    2 if codepoint < 0x800 else
+                                    3 if codepoint < 0x10000 else
+                                    4 ) )
+      table = ( utf16, utf8 )
+    self._tables[ line_index ] = table
+    return table
+
+
+  def CodepointsToUTF16CodeUnits( self, line_index, codepoint_offset ):
+    """Return the 1-based UTF-16 code unit offset equivalent to the 1-based
+    codepoint offset |codepoint_offset| into the line |line_index|."""
+    table = self._Table( line_index )
+    if table is None:
+      return min( codepoint_offset, len( self._lines[ line_index ] ) + 1 )
+
+    utf16 = table[ 0 ]
+    if codepoint_offset >= len( utf16 ):
+      return utf16[ -1 ] + 1
+    return utf16[ codepoint_offset ]
+
+
+  def UTF16CodeUnitsToCodepoints( self, line_index, code_unit_offset ):
+    """Return the 1-based codepoint offset equivalent to the 1-based UTF-16 code
+    unit offset |code_unit_offset| into the line |line_index|."""
+    table = self._Table( line_index )
+    if table is None:
+      return min( code_unit_offset, len( self._lines[ line_index ] ) + 1 )
+
+    utf16 = table[ 0 ]
+    if code_unit_offset > utf16[ -1 ]:
+      return len( utf16 )
+    # 1-based index of the codepoint containing the code unit at
+    # |code_unit_offset|. An offset inside a surrogate pair maps to the
+    # codepoint encoded by the pair.
+    return max( 1, bisect.bisect_left( utf16, code_unit_offset ) )
+
+
+  def UTF16CodeUnitsToBytes( self, line_index, code_unit_offset ):
+    """Return the 1-based UTF-8 byte offset equivalent to the 1-based UTF-16
+    code unit offset |code_unit_offset| into the line |line_index|."""
+    codepoint_offset = self.UTF16CodeUnitsToCodepoints( line_index,
+                                                        code_unit_offset )
+    table = self._Table( line_index )
+    if table is None:
+      return codepoint_offset
+    return table[ 1 ][ codepoint_offset - 1 ] + 1
+
+
 def ComparePositions( a, b ):
   """Returns < 0 if a is before b, 0 if a and b are equal and > 0 if a is
   after b. a and b are both LSP positions."""
@@ -16,6 +16,8 @@
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
 import bottle
+import contextlib
+import functools
 import json
 import platform
 import sys
@@ -25,6 +27,7 @@ from bottle import request
 
 
 from ycmd import extra_conf_store, hmac_plugin, server_state, user_options_store
+from ycmd.metrics import METRICS, Phase
 from ycmd.responses import ( BuildExceptionResponse,
                              BuildCompletionResponse,
                              BuildResolveCompletionResponse,
@@ -32,7 +35,9 @@ from ycmd.responses import ( BuildExceptionResponse,
                              BuildSignatureHelpAvailableResponse,
                              SignatureHelpAvailalability,
                              UnknownExtraConf )
+from ycmd.request_scheduler import BACKGROUND, COMMAND, INTERACTIVE
 from ycmd.request_wrap import RequestWrap
+from ycmd.completers.completer import RequestSuperseded
 from ycmd.completers.completer_utils import FilterAndSortCandidatesWrap
 from ycmd.utils import LOGGER, StartThread, ImportCore
 ycm_core = ImportCore()
@@ -48,24 +53,94 @@ app = bottle.Bottle()
 wsgi_server = None
 
 
+def _Scheduled( priority_class ):
+  """Decorator running the handler as a request of |priority_class| (see
+  RequestScheduler)."""
+  def Decorator( handler ):
+    @functools.wraps( handler )
+    def Wrapper( *args, **kwargs ):
+      with _server_state.request_scheduler.Run( priority_class ):
+        return handler( *args, **kwargs )
+    return Wrapper
+  return Decorator
+
+
+# Events which are handled by the ParseScheduler when the
+# async_file_ready_to_parse option is set. BufferVisit is included so that it
+# stays ordered with FileReadyToParse. Only then are the events coalesced and
+# debounced; without that option, every event is handled as it arrives.
+BACKGROUND_EVENTS = { 'FileReadyToParse', 'BufferVisit' }
+
+# Cheap events which are handled synchronously without waiting for a
+# BACKGROUND slot, so that they do not queue behind long parses. InsertLeave
+# only adds the identifier under the cursor, which needn't wait for a parse, so
+# it is lightweight in both modes rather than queued.
+LIGHTWEIGHT_EVENTS = { 'BufferUnload',
+                       'CurrentIdentifierFinished',
+                       'FileSave',
+                       'InsertLeave' }
+
+
 @app.post( '/event_notification' )
 def EventNotification():
-  request_data = RequestWrap( request.json )
+  return _JsonResponse( _EventNotification( _WrapRequest( request.json ) ) )
+
+
+def _EventNotification( request_data ):
   event_name = request_data[ 'event_name' ]
   LOGGER.debug( 'Event name: %s', event_name )
 
+  if event_name == 'BufferUnload':
+    _server_state.buffer_store.Remove( request_data[ 'filepath' ] )
+    _server_state.parse_scheduler.Discard( request_data[ 'filepath' ] )
+
+  if ( event_name in BACKGROUND_EVENTS and
+       _server_state.user_options[ 'async_file_ready_to_parse' ] ):
+    # Only the latest of the events queued for a file is handled. The
+    # diagnostics are returned by /receive_messages instead.
+    filetypes = request_data[ 'filetypes' ]
+    _server_state.parse_scheduler.Schedule(
+      _HandleEventInBackground,
+      request_data,
+      key = ( request_data[ 'filepath' ], event_name ),
+      delay = _server_state.EventDebounceSeconds( filetypes ) )
+    return {}
+
+  event_handler = 'On' + event_name
+  if event_name in LIGHTWEIGHT_EVENTS:
+    scheduled = contextlib.nullcontext()
+  else:
+    scheduled = _server_state.request_scheduler.Run( BACKGROUND )
+  with scheduled:
+    getattr( _server_state.GetGeneralCompleter(), event_handler )(
+      request_data )
+
+    filetypes = request_data[ 'filetypes' ]
+    response_data = None
+    if _server_state.FiletypeCompletionUsable( filetypes ):
+      response_data = getattr( _server_state.GetFiletypeCompleter( filetypes ),
+                               event_handler )( request_data )
+
+  if response_data:
+    return response_data
+  return {}
+
+
+@_Scheduled( BACKGROUND )
+def _HandleEventInBackground( request_data ):
+  event_name = request_data[ 'event_name' ]
   event_handler = 'On' + event_name
   getattr( _server_state.GetGeneralCompleter(), event_handler )( request_data )
 
   filetypes = request_data[ 'filetypes' ]
-  response_data = None
-  if _server_state.FiletypeCompletionUsable( filetypes ):
-    response_data = getattr( _server_state.GetFiletypeCompleter( filetypes ),
-                             event_handler )( request_data )
+  if not _server_state.FiletypeCompletionUsable( filetypes ):
+    return
 
-  if response_data:
-    return _JsonResponse( response_data )
-  return _JsonResponse( {} )
+  completer = _server_state.GetFiletypeCompleter( filetypes )
+  if event_name == 'FileReadyToParse':
+    completer.PublishFileReadyToParse( request_data )
+  else:
+    getattr( completer, event_handler )( request_data )
 
 
 @app.get( '/signature_help_available' )
@@ -84,8 +159,9 @@ def GetSignatureHelpAvailable():
 
 
 @app.post( '/run_completer_command' )
+@_Scheduled( COMMAND )
 def RunCompleterCommand():
-  request_data = RequestWrap( request.json )
+  request_data = _WrapRequest( request.json )
   completer = _GetCompleterForRequestData( request_data )
 
   return _JsonResponse( completer.OnUserCommand(
@@ -94,8 +170,9 @@ def RunCompleterCommand():
 
 
 @app.post( '/resolve_fixit' )
+@_Scheduled( COMMAND )
 def ResolveFixit():
-  request_data = RequestWrap( request.json )
+  request_data = _WrapRequest( request.json )
   completer = _GetCompleterForRequestData( request_data )
 
   return _JsonResponse( completer.ResolveFixit( request_data ) )
@@ -103,11 +180,23 @@ def ResolveFixit():
 
 @app.post( '/completions' )
 def GetCompletions():
-  request_data = RequestWrap( request.json )
+  return _JsonResponse( _GetCompletions( _WrapRequest( request.json ) ) )
+
+
+@_Scheduled( INTERACTIVE )
+def _GetCompletions( request_data ):
+  start_time = time.monotonic()
   do_filetype_completion = _server_state.ShouldUseFiletypeCompleter(
     request_data )
   LOGGER.debug( 'Using filetype completion: %s', do_filetype_completion )
 
+  deadline_ms = _server_state.user_options[ 'semantic_completion_deadline_ms' ]
+  if ( do_filetype_completion and
+       deadline_ms > 0 and
+       not request_data[ 'force_semantic' ] ):
+    return _GetCompletionsWithDeadline( request_data,
+                                        start_time + deadline_ms / 1000 )
+
   errors = None
   completions = None
 
@@ -115,7 +204,12 @@ def GetCompletions():
     try:
       filetype_completer = _server_state.GetFiletypeCompleter(
         request_data[ 'filetypes' ] )
-      completions = filetype_completer.ComputeCandidates( request_data )
+      with METRICS.Timer( 'completer', type( filetype_completer ).__name__ ):
+        completions = filetype_completer.ComputeCandidates( request_data )
+    except RequestSuperseded:
+      # The client has already sent a newer request, so won't use the result.
+      LOGGER.debug( 'Completion request superseded' )
+      return BuildCompletionResponse( [], request_data[ 'start_column' ] )
     except Exception as exception:
       if request_data[ 'force_semantic' ]:
         # user explicitly asked for semantic completion, so just pass the error
@@ -129,18 +223,76 @@ def GetCompletions():
       errors = [ BuildExceptionResponse( exception, stack ) ]
 
   if not completions and not request_data[ 'force_semantic' ]:
-    completions = _server_state.GetGeneralCompleter().ComputeCandidates(
-      request_data )
+    try:
+      with METRICS.Timer( 'completer', 'GeneralCompleterStore' ):
+        completions = _server_state.GetGeneralCompleter().ComputeCandidates(
+          request_data )
+    except RequestSuperseded:
+      LOGGER.debug( 'Completion request superseded' )
+      return BuildCompletionResponse( [], request_data[ 'start_column' ] )
+
+  return BuildCompletionResponse( completions if completions else [],
+                                  request_data[ 'start_column' ],
+                                  errors = errors )
+
+
+def _GetCompletionsWithDeadline( request_data, deadline ):
+  """Computes the filetype completer candidates in the background while
+  computing the general completer ones. The former are returned if they are
+  ready by |deadline| (in the time.monotonic clock) and not empty, the latter
+  otherwise. Candidates which miss the deadline are cached by the filetype
+  completer for the next request."""
+  filetype_completer = _server_state.GetFiletypeCompleter(
+    request_data[ 'filetypes' ] )
+  job = filetype_completer.ComputeCandidatesAsync( request_data )
+
+  try:
+    with METRICS.Timer( 'completer', 'GeneralCompleterStore' ):
+      general_completions = (
+        _server_state.GetGeneralCompleter().ComputeCandidates( request_data ) )
+  except RequestSuperseded:
+    LOGGER.debug( 'Completion request superseded' )
+    return BuildCompletionResponse( [], request_data[ 'start_column' ] )
+
+  errors = None
+  try:
+    with METRICS.Timer( 'completer', type( filetype_completer ).__name__ ):
+      job = _AwaitCompletionJob(
+        filetype_completer, request_data, job, deadline )
+    if job is None:
+      LOGGER.debug( 'Semantic completion missed the deadline' )
+    elif job.Result():
+      return BuildCompletionResponse( job.Result(),
+                                      job.request_data[ 'start_column' ] )
+  except RequestSuperseded:
+    LOGGER.debug( 'Completion request superseded' )
+    return BuildCompletionResponse( [], request_data[ 'start_column' ] )
+  except Exception as exception:
+    LOGGER.exception( 'Exception from semantic completer (using general)' )
+    errors = [ BuildExceptionResponse( exception, traceback.format_exc() ) ]
+
+  return BuildCompletionResponse( general_completions or [],
+                                  request_data[ 'start_column' ],
+                                  errors = errors )
 
-  return _JsonResponse(
-      BuildCompletionResponse( completions if completions else [],
-                               request_data[ 'start_column' ],
-                               errors = errors ) )
+
+def _AwaitCompletionJob( completer, request_data, job, deadline ):
+  """Returns the job computing the candidates of |request_data| if it is done
+  by |deadline|, None otherwise. |job| may be the job of a previous request at
+  the same position."""
+  while job.Wait( deadline - time.monotonic() ):
+    if job.IsFor( request_data ):
+      return job
+    # The candidates of the previous request are now cached. Start a job for
+    # this request, which uses them.
+    job = completer.ComputeCandidatesAsync( request_data )
+  return None
 
 
 @app.post( '/resolve_completion' )
+@_Scheduled( INTERACTIVE )
 def ResolveCompletionItem():
-  request_data = RequestWrap( request.json )
+  request_data = _WrapRequest( request.json )
   completer = _GetCompleterForRequestData( request_data )
 
   errors = None
@@ -155,11 +307,14 @@ def ResolveCompletionItem():
 
 @app.post( '/signature_help' )
 def GetSignatureHelp():
-  request_data = RequestWrap( request.json )
+  return _JsonResponse( _GetSignatureHelp( _WrapRequest( request.json ) ) )
+
 
+@_Scheduled( INTERACTIVE )
+def _GetSignatureHelp( request_data ):
   if not _server_state.FiletypeCompletionUsable( request_data[ 'filetypes' ],
                                                  silent = True ):
-    return _JsonResponse( BuildSignatureHelpResponse( None ) )
+    return BuildSignatureHelpResponse( None )
 
   errors = None
   signature_info = None
@@ -174,11 +329,11 @@ def GetSignatureHelp():
 
   # No fallback for signature help. The general completer is unlikely to be able
   # to offer anything of for that here.
-  return _JsonResponse(
-      BuildSignatureHelpResponse( signature_info, errors = errors ) )
+  return BuildSignatureHelpResponse( signature_info, errors = errors )
 
 
 @app.post( '/filter_and_sort_candidates' )
+@_Scheduled( INTERACTIVE )
 def FilterAndSortCandidates():
   # Not using RequestWrap because no need and the requests coming in aren't like
   # the usual requests we handle.
@@ -212,19 +367,20 @@ def GetReady():
 @app.post( '/semantic_completion_available' )
 def FiletypeCompletionAvailable():
   return _JsonResponse( _server_state.FiletypeCompletionAvailable(
-      RequestWrap( request.json )[ 'filetypes' ] ) )
+      _WrapRequest( request.json )[ 'filetypes' ] ) )
 
 
 @app.post( '/defined_subcommands' )
 def DefinedSubcommands():
-  completer = _GetCompleterForRequestData( RequestWrap( request.json ) )
+  completer = _GetCompleterForRequestData( _WrapRequest( request.json ) )
 
   return _JsonResponse( completer.DefinedSubcommands() )
 
 
 @app.post( '/detailed_diagnostic' )
+@_Scheduled( COMMAND )
 def GetDetailedDiagnostic():
-  request_data = RequestWrap( request.json )
+  request_data = _WrapRequest( request.json )
   completer = _GetCompleterForRequestData( request_data )
 
   return _JsonResponse( completer.GetDetailedDiagnostic( request_data ) )
@@ -248,7 +404,7 @@ def IgnoreExtraConfFile():
 
 @app.post( '/debug_info' )
 def DebugInfo():
-  request_data = RequestWrap( request.json )
+  request_data = _WrapRequest( request.json )
 
   has_clang_support = ycm_core.HasClangSupport()
   clang_version = ycm_core.ClangVersion() if has_clang_support else None
@@ -274,18 +430,44 @@ def DebugInfo():
       'path': extra_conf_path,
       'is_loaded': is_loaded
     },
-    'completer': None
+    'completer': None,
+    'completions_cache': None,
+    'repositories': ycm_core.RepositoriesStatistics(),
+    'metrics': METRICS.Snapshot(),
+    'scheduler': _server_state.request_scheduler.DebugInfo()
   }
 
   try:
-    response[ 'completer' ] = _GetCompleterForRequestData(
-        request_data ).DebugInfo( request_data )
+    completer = _GetCompleterForRequestData( request_data )
+    response[ 'completer' ] = completer.DebugInfo( request_data )
+    response[ 'completions_cache' ] = completer.CompletionsCacheStatistics()
   except Exception:
     LOGGER.exception( 'Error retrieving completer debug info' )
 
   return _JsonResponse( response )
 
 
+@app.get( '/metrics' )
+def GetMetrics():
+  # Latency histograms are only recorded when the MetricsPlugin is installed.
+  return _JsonResponse( {
+    'latency': METRICS.Snapshot(),
+    'queue_depths': _QueueDepths()
+  } )
+
+
+def _QueueDepths():
+  depths = {}
+  if hasattr( wsgi_server, 'QueueDepth' ):
+    depths[ 'wsgi_server' ] = wsgi_server.QueueDepth()
+  depths[ 'parse_scheduler' ] = _server_state.parse_scheduler.QueueDepth()
+  for completer in _server_state.GetLoadedFiletypeCompleters():
+    completer_depths = completer.QueueDepths()
+    if completer_depths:
+      depths[ type( completer ).__name__ ] = completer_depths
+  return depths
+
+
 @app.post( '/shutdown' )
 def Shutdown():
   ServerShutdown()
@@ -298,15 +480,67 @@ def ReceiveMessages():
   # The client makes the request with a long timeout (1 hour).
   # When we have data to send, we send it and close the socket.
   # The client then sends a new request.
-  request_data = RequestWrap( request.json )
+  return _JsonResponse( _ReceiveMessages( _WrapRequest( request.json ) ) )
+
+
+def _ReceiveMessages( request_data ):
   try:
     completer = _GetCompleterForRequestData( request_data )
   except Exception:
     # No semantic completer for this filetype, don't requery. This is not an
     # error.
-    return _JsonResponse( False )
+    return False
 
-  return _JsonResponse( completer.PollForMessages( request_data ) )
+  return completer.PollForMessages( request_data )
+
+
+def _ReceivePendingMessages( request_data ):
+  # In a batch, the other responses would be held back while long-polling, so
+  # only the messages already pending are returned.
+  try:
+    completer = _GetCompleterForRequestData( request_data )
+  except Exception:
+    return False
+
+  return completer.PollForMessages( request_data, timeout = 0 )
+
+
+# Handlers which can be called from a /batch request. Each takes a RequestWrap
+# and returns the response data.
+BATCH_HANDLERS = {
+  'event_notification': _EventNotification,
+  'completions': _GetCompletions,
+  'signature_help': _GetSignatureHelp,
+  'receive_messages': _ReceivePendingMessages,
+}
+
+
+@app.post( '/batch' )
+def Batch():
+  # Executes several handler calls in one round-trip. The sub-requests are
+  # executed in order and share the 'file_data' of the batch, unless they
+  # supply their own.
+  batch = request.json
+  file_data = batch.get( 'file_data', {} )
+
+  responses = []
+  for item in batch[ 'requests' ]:
+    try:
+      handler = BATCH_HANDLERS.get( item[ 'handler' ] )
+      if not handler:
+        raise ValueError( f'Unknown batch handler: { item[ "handler" ] }' )
+      request_data = dict( item[ 'request' ] )
+      request_data.setdefault( 'file_data', file_data )
+      responses.append( {
+        'response': handler( _WrapRequest( request_data ) )
+      } )
+    except Exception as exception:
+      LOGGER.exception( 'Exception from batch handler' )
+      responses.append( {
+        'error': BuildExceptionResponse( exception, traceback.format_exc() )
+      } )
+
+  return _JsonResponse( responses )
 
 
 # The type of the param is Bottle.HTTPError
@@ -323,9 +557,10 @@ app.default_error_handler = ErrorHandler
 
 def _JsonResponse( data ):
   bottle.response.set_header( 'Content-Type', 'application/json' )
-  return json.dumps( data,
-                     separators = ( ',', ':' ),
-                     default = _UniversalSerialize )
+  with Phase( 'serialise' ):
+    return json.dumps( data,
+                       separators = ( ',', ':' ),
+                       default = _UniversalSerialize )
 
 
 def _UniversalSerialize( obj ):
@@ -337,6 +572,11 @@ def _UniversalSerialize( obj ):
     return str( obj )
 
 
+def _WrapRequest( request_json ):
+  return RequestWrap( request_json,
+                      buffer_store = _server_state.buffer_store )
+
+
 def _GetCompleterForRequestData( request_data ):
   completer_target = request_data.get( 'completer_target', None )
 
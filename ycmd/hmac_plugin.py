@@ -20,6 +20,7 @@ from bottle import request, abort, response
 from hmac import compare_digest
 from urllib.parse import urlparse
 from ycmd import hmac_utils
+from ycmd.metrics import Phase
 from ycmd.utils import LOGGER, ToBytes, ToUnicode
 
 HTTP_UNAUTHORIZED = 401
@@ -54,13 +55,16 @@ class HmacPlugin:
         return
 
       body = ToBytes( request.body.read() )
-      if not RequestAuthenticated( request.method, request.path, body,
-                                   self._hmac_secret ):
+      with Phase( 'hmac' ):
+        authenticated = RequestAuthenticated( request.method, request.path,
+                                              body, self._hmac_secret )
+      if not authenticated:
         LOGGER.info( 'Dropping request with bad HMAC' )
         abort( HTTP_UNAUTHORIZED, 'Unauthorized, received bad HMAC.' )
         return
       body = callback( *args, **kwargs )
-      SetHmacHeader( body, self._hmac_secret )
+      with Phase( 'hmac' ):
+        SetHmacHeader( body, self._hmac_secret )
       return body
     return wrapper
 
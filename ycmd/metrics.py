@@ -0,0 +1,162 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import time
+from bottle import request
+from contextlib import contextmanager
+from threading import Lock
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. Latencies
+# above the last bound are counted in an overflow bucket.
+BUCKET_BOUNDS_MS = ( 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000 )
+
+# Key of the request environ entry accumulating the time spent in each phase of
+# the current request.
+_PHASES_KEY = 'ycmd.metrics.phases'
+
+
+class LatencyHistogram:
+  """Counts latencies in the fixed buckets of BUCKET_BOUNDS_MS. Not thread-safe;
+  see Metrics."""
+
+  def __init__( self ):
+    self._counts = [ 0 ] * ( len( BUCKET_BOUNDS_MS ) + 1 )
+    self._count = 0
+    self._total_ms = 0.0
+    self._max_ms = 0.0
+
+
+  def Record( self, elapsed_ms ):
+    self._counts[ bisect.bisect_left( BUCKET_BOUNDS_MS, elapsed_ms ) ] += 1
+    self._count += 1
+    self._total_ms += elapsed_ms
+    self._max_ms = max( self._max_ms, elapsed_ms )
+
+
+  def Percentile( self, percentile ):
+    """Returns the upper bound of the bucket containing the |percentile|th
+    latency, or the maximum latency if that is in the overflow bucket."""
+    if not self._count:
+      return None
+    rank = percentile * self._count / 100
+    seen = 0
+    for bound, count in zip( BUCKET_BOUNDS_MS, self._counts ):
+      seen += count
+      if seen >= rank:
+        return round( min( bound, self._max_ms ), 3 )
+    return round( self._max_ms, 3 )
+
+
+  def Snapshot( self ):
+    buckets = { str( bound ): count
+                for bound, count in zip( BUCKET_BOUNDS_MS, self._counts ) }
+    buckets[ '+Inf' ] = self._counts[ -1 ]
+    return {
+      'count': self._count,
+      'total_ms': round( self._total_ms, 3 ),
+      'max_ms': round( self._max_ms, 3 ),
+      'p50_ms': self.Percentile( 50 ),
+      'p90_ms': self.Percentile( 90 ),
+      'p99_ms': self.Percentile( 99 ),
+      'buckets': buckets
+    }
+
+
+class Metrics:
+  """Thread-safe collection of latency histograms, grouped by kind (e.g.
+  'route', 'completer' or 'phase') and then by name."""
+
+  def __init__( self ):
+    self._lock = Lock()
+    self._histograms = {}
+
+
+  def Record( self, group, name, elapsed_seconds ):
+    with self._lock:
+      histogram = self._histograms.setdefault( group, {} ).get( name )
+      if histogram is None:
+        histogram = self._histograms[ group ][ name ] = LatencyHistogram()
+      histogram.Record( elapsed_seconds * 1000 )
+
+
+  @contextmanager
+  def Timer( self, group, name ):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.Record( group, name, time.perf_counter() - start )
+
+
+  def Snapshot( self ):
+    with self._lock:
+      return { group: { name: histogram.Snapshot()
+                        for name, histogram in histograms.items() }
+               for group, histograms in self._histograms.items() }
+
+
+  def Clear( self ):
+    with self._lock:
+      self._histograms = {}
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def Phase( name ):
+  """Times a phase of the current request: records it in the 'phase' group of
+  METRICS and adds it to the request's own phase timings."""
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    elapsed = time.perf_counter() - start
+    METRICS.Record( 'phase', name, elapsed )
+    phases = request.environ.setdefault( _PHASES_KEY, {} )
+    phases[ name ] = phases.get( name, 0 ) + elapsed
+
+
+class MetricsPlugin:
+  """Records the latency of every route, and of the 'json_parse' and 'compute'
+  phases of each request. It must be installed after the HmacPlugin, so that
+  only authenticated requests are parsed."""
+  name = 'metrics'
+  api = 2
+
+
+  def apply( self, callback, route ):
+    rule = route.rule
+
+    def wrapper( *args, **kwargs ):
+      start = time.perf_counter()
+      try:
+        if request.method == 'POST':
+          # Bottle caches the parsed body; the handler does not parse it again.
+          with Phase( 'json_parse' ):
+            request.json
+        return callback( *args, **kwargs )
+      finally:
+        elapsed = time.perf_counter() - start
+        METRICS.Record( 'route', rule, elapsed )
+        phases = request.environ.get( _PHASES_KEY, {} )
+        METRICS.Record( 'phase',
+                        'compute',
+                        elapsed - phases.get( 'json_parse', 0 ) -
+                                  phases.get( 'serialise', 0 ) )
+    return wrapper
@@ -0,0 +1,122 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from ycmd.utils import LOGGER, StartThread
+
+# A job that keeps being replaced is postponed by at most this many times its
+# delay after it was first scheduled, so that it still runs while events keep
+# coming faster than the debounce window (e.g. during continuous typing).
+MAX_POSTPONED_DELAYS = 2
+
+
+class _Job:
+  def __init__( self, function, request_data, due, deadline ):
+    self.function = function
+    self.request_data = request_data
+    self.due = due
+    self.deadline = deadline
+
+
+class ParseScheduler:
+  """Runs parse jobs (e.g. the FileReadyToParse event handlers) one at a time
+  on a background thread. The thread is only started when the first job is
+  scheduled.
+
+  Jobs are identified by a key, typically the file and the event. Scheduling a
+  job whose key is already queued replaces the queued job, so that only the
+  latest version of a file is parsed, and postpones it (debouncing), up to
+  MAX_POSTPONED_DELAYS times its delay after the replaced job was first
+  scheduled. Jobs are run in the order they become due."""
+
+  def __init__( self ):
+    # Insertion ordered, so that jobs due at the same time run in the order
+    # they were scheduled.
+    self._jobs = {}
+    self._condition = threading.Condition()
+    self._thread = None
+    self._stopping = False
+
+
+  def Schedule( self, function, request_data, key = None, delay = 0 ):
+    """Schedules the call |function|( |request_data| ) in |delay| seconds,
+    replacing the queued job with the same |key|, if any. Jobs without a key
+    are never replaced."""
+    now = time.monotonic()
+    due = now + delay
+    deadline = now + MAX_POSTPONED_DELAYS * delay
+    with self._condition:
+      if self._thread is None:
+        self._thread = StartThread( self._Run )
+      if key is None:
+        key = object()
+      replaced = self._jobs.pop( key, None )
+      if replaced is not None:
+        deadline = min( deadline, replaced.deadline )
+        due = min( due, deadline )
+      self._jobs[ key ] = _Job( function, request_data, due, deadline )
+      self._condition.notify()
+
+
+  def Discard( self, filepath ):
+    """Drops the queued jobs for |filepath|, e.g. because the buffer was
+    closed."""
+    with self._condition:
+      self._jobs = { key: job for key, job in self._jobs.items()
+                     if job.request_data[ 'filepath' ] != filepath }
+
+
+  def QueueDepth( self ):
+    with self._condition:
+      return len( self._jobs )
+
+
+  def Shutdown( self ):
+    with self._condition:
+      self._stopping = True
+      self._jobs = {}
+      self._condition.notify()
+
+
+  def _NextDueJob( self ):
+    """Waits until a job is due and returns it, or returns None when the
+    scheduler is shut down."""
+    with self._condition:
+      while not self._stopping:
+        if not self._jobs:
+          self._condition.wait()
+          continue
+        key, job = min( self._jobs.items(), key = lambda item: item[ 1 ].due )
+        timeout = job.due - time.monotonic()
+        if timeout <= 0:
+          del self._jobs[ key ]
+          return job
+        self._condition.wait( timeout )
+    return None
+
+
+  def _Run( self ):
+    while True:
+      job = self._NextDueJob()
+      if job is None:
+        return
+      try:
+        job.function( job.request_data )
+      except Exception:
+        LOGGER.exception( 'Error while parsing %s',
+                          job.request_data[ 'filepath' ] )
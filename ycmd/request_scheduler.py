@@ -0,0 +1,105 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes, from the highest priority to the lowest.
+INTERACTIVE = 'interactive'
+COMMAND = 'command'
+BACKGROUND = 'background'
+PRIORITY_CLASSES = ( INTERACTIVE, COMMAND, BACKGROUND )
+
+# Maximum number of requests of each class running at the same time.
+DEFAULT_MAX_CONCURRENCY = {
+  INTERACTIVE: 8,
+  COMMAND: 4,
+  BACKGROUND: 2,
+}
+
+# Number of seconds after which a waiting request stops yielding to requests of
+# higher priority classes, so that a stream of interactive requests (e.g. to a
+# hung server) cannot starve the other classes.
+DEFAULT_MAX_WAIT_SECONDS = 1.0
+
+
+class RequestScheduler:
+  """Admits requests by priority class. At most |max_concurrency|[ class ]
+  requests of a class run at the same time, and a request waits while a request
+  of a higher priority class is waiting, so that under load interactive
+  requests (completion, signature help) start before commands, and commands
+  before parsing. A request which has waited for |max_wait_seconds| only waits
+  for a free slot of its own class."""
+
+  def __init__( self,
+                max_concurrency = DEFAULT_MAX_CONCURRENCY,
+                max_wait_seconds = DEFAULT_MAX_WAIT_SECONDS ):
+    self._max_concurrency = dict( max_concurrency )
+    self._max_wait_seconds = max_wait_seconds
+    self._running = dict.fromkeys( PRIORITY_CLASSES, 0 )
+    self._waiting = dict.fromkeys( PRIORITY_CLASSES, 0 )
+    self._condition = threading.Condition()
+
+
+  def _CanStart( self, priority_class, waited_enough ):
+    running = self._running[ priority_class ]
+    if running >= self._max_concurrency[ priority_class ]:
+      return False
+    if waited_enough:
+      return True
+    for higher_class in PRIORITY_CLASSES:
+      if higher_class == priority_class:
+        return True
+      if self._waiting[ higher_class ]:
+        return False
+
+
+  @contextmanager
+  def Run( self, priority_class ):
+    """Waits until a request of |priority_class| can start and runs the body of
+    the with statement as that request."""
+    with self._condition:
+      self._waiting[ priority_class ] += 1
+      deadline = time.monotonic() + self._max_wait_seconds
+      try:
+        while True:
+          remaining = deadline - time.monotonic()
+          if self._CanStart( priority_class, remaining <= 0 ):
+            break
+          self._condition.wait( remaining if remaining > 0 else None )
+      finally:
+        self._waiting[ priority_class ] -= 1
+      self._running[ priority_class ] += 1
+      # Removing a waiter may let lower priority requests start.
+      self._condition.notify_all()
+
+    try:
+      yield
+    finally:
+      with self._condition:
+        self._running[ priority_class ] -= 1
+        self._condition.notify_all()
+
+
+  def DebugInfo( self ):
+    with self._condition:
+      return { priority_class: {
+                 'running': self._running[ priority_class ],
+                 'waiting': self._waiting[ priority_class ],
+                 'max_concurrency': self._max_concurrency[ priority_class ]
+               } for priority_class in PRIORITY_CLASSES }
@@ -50,10 +50,12 @@ def _MissingFieldsForFileData( request_json ):
   missing = set()
   data_for_file = request_json[ 'file_data' ].get( request_json[ 'filepath' ] )
   if data_for_file:
-    required_data = [ 'filetypes', 'contents' ]
-    for required in required_data:
-      if required not in data_for_file:
-        missing.add( _SingleFileDataFieldSpec( request_json, required ) )
+    if 'filetypes' not in data_for_file:
+      missing.add( _SingleFileDataFieldSpec( request_json, 'filetypes' ) )
+    # Instead of the contents, a request may contain changes to a previous
+    # version of the buffer (see BufferStore).
+    if 'contents' not in data_for_file and 'changes' not in data_for_file:
+      missing.add( _SingleFileDataFieldSpec( request_json, 'contents' ) )
     filetypes = data_for_file.get( 'filetypes', [] )
     if not filetypes:
       missing.add(
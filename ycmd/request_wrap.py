@@ -22,6 +22,7 @@ from ycmd.utils import ( ByteOffsetToCodepointOffset,
                          ToUnicode,
                          ToBytes,
                          SplitLines )
+from ycmd.buffer_store import BufferFileData
 from ycmd.identifier_utils import StartOfLongestIdentifierEndingAtIndex
 from ycmd.request_validation import EnsureRequestValid
 
@@ -29,9 +30,13 @@ from ycmd.request_validation import EnsureRequestValid
 # TODO: Change the custom computed (and other) keys to be actual properties on
 # the object.
 class RequestWrap:
-  def __init__( self, request, validate = True ):
+  def __init__( self, request, validate = True, buffer_store = None ):
     if validate:
       EnsureRequestValid( request )
+    # Rebuild the buffers sent as changes to a previous version and record the
+    # versioned ones.
+    if buffer_store is not None and 'file_data' in request:
+      buffer_store.UpdateFileData( request[ 'file_data' ] )
     self._request = request
 
     # Maps the keys returned by this objects __getitem__ to a # tuple of
@@ -83,6 +88,16 @@ class RequestWrap:
       'lines': ( self._CurrentLines, None ),
 
       'extra_conf_data': ( self._GetExtraConfData, None ),
+
+      # A fingerprint of the contents of the buffers, excluding the current
+      # line.
+      'buffer_fingerprint': ( self._BufferFingerprint, None ),
+
+      # A hashable key which is equal for two requests that compare equal. It
+      # is computed once per request, so that caches can compare requests in
+      # constant time. Requests with different buffer contents may in theory
+      # have the same key, if the hashes of their contents collide.
+      'cache_key': ( self._CacheKey, None ),
     }
     self._cached_computed = {}
 
@@ -142,6 +157,13 @@ class RequestWrap:
     return True
 
 
+  def Copy( self ):
+    """Returns a wrapper of the same request without any of the computed values,
+    so that e.g. a completer running in another thread can change the start
+    column independently."""
+    return RequestWrap( self._request, validate = False )
+
+
   def get( self, key, default = None ):
     try:
       return self[ key ]
@@ -151,8 +173,10 @@ class RequestWrap:
 
   def _CurrentLines( self ):
     current_file = self[ 'filepath' ]
-    contents = self[ 'file_data' ][ current_file ][ 'contents' ]
-    return SplitLines( contents )
+    file_data = self[ 'file_data' ][ current_file ]
+    if isinstance( file_data, BufferFileData ):
+      return file_data.lines
+    return SplitLines( file_data[ 'contents' ] )
 
 
   def _CurrentLine( self ):
@@ -186,9 +210,11 @@ class RequestWrap:
 
     # The same applies to the 'prefix' (the bit before the start column) and the
     # 'query' (the bit after the start column up to the cursor column). They are
-    # dependent on the 'start_codepoint' so we must reset them.
+    # dependent on the 'start_codepoint' so we must reset them, along with the
+    # 'cache_key' which includes both.
     self._cached_computed.pop( 'prefix', None )
     self._cached_computed.pop( 'query', None )
+    self._cached_computed.pop( 'cache_key', None )
 
 
   def _GetCompletionStartCodepoint( self ):
@@ -210,9 +236,11 @@ class RequestWrap:
 
     # The same applies to the 'prefix' (the bit before the start column) and the
     # 'query' (the bit after the start column up to the cursor column). They are
-    # dependent on the 'start_codepoint' so we must reset them.
+    # dependent on the 'start_codepoint' so we must reset them, along with the
+    # 'cache_key' which includes both.
     self._cached_computed.pop( 'prefix', None )
     self._cached_computed.pop( 'query', None )
+    self._cached_computed.pop( 'cache_key', None )
 
 
   def _Query( self ):
@@ -245,6 +273,38 @@ class RequestWrap:
     return HashableDict( self._request.get( 'extra_conf_data', {} ) )
 
 
+  def _BufferFingerprint( self ):
+    lines = self[ 'lines' ]
+    line_num = self[ 'line_num' ]
+    other_files = frozenset(
+      ( filename, _FileDataFingerprint( file_data ) )
+      for filename, file_data in self[ 'file_data' ].items()
+      if filename != self[ 'filepath' ] )
+    return ( len( lines ),
+             hash( tuple( lines[ : line_num - 1 ] ) ),
+             hash( tuple( lines[ line_num : ] ) ),
+             hash( other_files ) )
+
+
+  def _CacheKey( self ):
+    return ( self[ 'filepath' ],
+             tuple( self[ 'filetypes' ] ),
+             self[ 'line_num' ],
+             self[ 'start_column' ],
+             self[ 'prefix' ],
+             self[ 'force_semantic' ],
+             hash( self[ 'extra_conf_data' ] ),
+             self[ 'buffer_fingerprint' ] )
+
+
+def _FileDataFingerprint( file_data ):
+  # The lines of a buffer rebuilt from changes are hashed rather than joined.
+  contents = ( tuple( file_data.lines )
+               if isinstance( file_data, BufferFileData ) else
+               file_data[ 'contents' ] )
+  return ( hash( contents ), tuple( file_data[ 'filetypes' ] ) )
+
+
 def CompletionStartColumn( line_value, column_num, filetype ):
   """Returns the 1-based byte index where the completion query should start.
   So if the user enters:
@@ -17,9 +17,12 @@
 
 import threading
 from importlib import import_module
+from ycmd.buffer_store import BufferStore
 from ycmd.completers.general.general_completer_store import (
     GeneralCompleterStore )
 from ycmd.completers.language_server import generic_lsp_completer
+from ycmd.parse_scheduler import ParseScheduler
+from ycmd.request_scheduler import RequestScheduler
 from ycmd.utils import LOGGER
 
 
@@ -38,6 +41,9 @@ class ServerState:
     self._filetype_completers = {}
     self._filetype_completers_lock = threading.Lock()
     self._gencomp = GeneralCompleterStore( self._user_options )
+    self._buffer_store = BufferStore()
+    self._parse_scheduler = ParseScheduler()
+    self._request_scheduler = RequestScheduler()
 
 
   @property
@@ -45,7 +51,24 @@ class ServerState:
     return self._user_options
 
 
+  @property
+  def buffer_store( self ):
+    return self._buffer_store
+
+
+  @property
+  def parse_scheduler( self ):
+    return self._parse_scheduler
+
+
+  @property
+  def request_scheduler( self ):
+    return self._request_scheduler
+
+
   def Shutdown( self ):
+    self._parse_scheduler.Shutdown()
+
     with self._filetype_completers_lock:
       for completer in self._filetype_completers.values():
         if completer:
@@ -119,6 +142,21 @@ class ServerState:
              self.FiletypeCompletionAvailable( filetypes, silent ) )
 
 
+  def EventDebounceSeconds( self, filetypes ):
+    """Returns how long to wait for further events for the same file before
+    handling an event in the background, as set for the first of |filetypes|
+    (or '*') in the user option 'event_debounce_ms'. The window is set per
+    filetype, not per completer: the general completers, and any semantic
+    completer, handling a file share it. It only applies when the
+    'async_file_ready_to_parse' option is set; otherwise events are handled
+    synchronously, neither coalesced nor delayed."""
+    debounce_ms = self._user_options[ 'event_debounce_ms' ]
+    for filetype in filetypes:
+      if filetype in debounce_ms:
+        return debounce_ms[ filetype ] / 1000
+    return debounce_ms.get( '*', 0 ) / 1000
+
+
   def ShouldUseFiletypeCompleter( self, request_data ):
     """Determines whether or not the semantic completion should be called for
     completion request."""
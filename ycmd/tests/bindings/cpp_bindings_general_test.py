@@ -54,6 +54,28 @@ def CppBindings_FilterAndSortCandidates_test():
   assert_that( result_2, contains_exactly( 'foo1', 'foo2' ) )
 
 
+def CppBindings_FilterAndSortCandidates_ManyCandidates_test():
+  # Large enough to be scored on several threads.
+  candidates = [ 'foo' + str( i ).zfill( 5 )
+                 for i in reversed( range( 40000 ) ) ]
+  candidates.append( 'xfxoxo' )
+  query = 'fo'
+  candidate_property = ''
+
+  result_full = ycm_core.FilterAndSortCandidates( candidates,
+                                                  candidate_property,
+                                                  query )
+  result_3 = ycm_core.FilterAndSortCandidates( candidates,
+                                               candidate_property,
+                                               query,
+                                               3 )
+
+  assert_that( result_full,
+               equal_to( sorted( candidates[ : -1 ] ) + [ 'xfxoxo' ] ) )
+  assert_that( result_3,
+               contains_exactly( 'foo00000', 'foo00001', 'foo00002' ) )
+
+
 def CppBindings_IdentifierCompleter_test():
   identifier_completer = ycm_core.IdentifierCompleter()
   identifiers = ycm_core.StringVector()
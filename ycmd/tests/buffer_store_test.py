@@ -0,0 +1,159 @@
+# Copyright (C) 2020 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+from hamcrest import ( assert_that, calling, equal_to, has_entry, has_key,
+                       instance_of, raises, same_instance )
+import json
+
+from ycmd.buffer_store import ( BufferFileData,
+                                BufferStore,
+                                BufferVersionMismatch )
+from ycmd.responses import ServerError
+
+
+def FileData( version, **kwargs ):
+  file_data = { 'filetypes': [ 'foo' ], 'version': version }
+  file_data.update( kwargs )
+  return file_data
+
+
+def Change( start_line, end_line, lines ):
+  return { 'start_line': start_line, 'end_line': end_line, 'lines': lines }
+
+
+def BufferStore_ApplyChanges_test():
+  store = BufferStore()
+  store.UpdateFileData( { '/foo': FileData( 1, contents = 'a\nb\nc\n' ) } )
+
+  file_data = { '/foo': FileData( 2, base_version = 1, changes = [
+    # Replace
+    Change( 2, 3, [ 'B' ] ),
+    # Insert
+    Change( 1, 1, [ 'first' ] ),
+    # Delete
+    Change( 4, 5, [] ),
+  ] ) }
+  store.UpdateFileData( file_data )
+
+  assert_that( file_data[ '/foo' ], instance_of( BufferFileData ) )
+  assert_that( file_data[ '/foo' ].lines,
+               equal_to( ( 'first', 'a', 'B', '' ) ) )
+  assert_that( file_data[ '/foo' ][ 'contents' ], equal_to( 'first\na\nB\n' ) )
+  assert_that( file_data[ '/foo' ][ 'filetypes' ], equal_to( [ 'foo' ] ) )
+
+  # Changes against the new version
+  file_data = { '/foo': FileData( 3, base_version = 2, changes = [
+    Change( 4, 4, [ 'last' ] ) ] ) }
+  store.UpdateFileData( file_data )
+  assert_that( file_data[ '/foo' ][ 'contents' ],
+               equal_to( 'first\na\nB\nlast\n' ) )
+
+  # The same changes sent again
+  file_data = { '/foo': FileData( 3, base_version = 2, changes = [
+    Change( 4, 4, [ 'last' ] ) ] ) }
+  store.UpdateFileData( file_data )
+  assert_that( file_data[ '/foo' ][ 'contents' ],
+               equal_to( 'first\na\nB\nlast\n' ) )
+
+
+def BufferStore_FileDataContents_test():
+  store = BufferStore()
+  store.UpdateFileData( { '/foo': FileData( 1, contents = 'a\nb' ) } )
+
+  def Rebuilt():
+    file_data = { '/foo': FileData( 2, base_version = 1, changes = [
+      Change( 2, 3, [ 'B' ] ) ] ) }
+    store.UpdateFileData( file_data )
+    data = file_data[ '/foo' ]
+    # The contents are only joined when needed.
+    assert_that( dict.__contains__( data, 'contents' ), equal_to( False ) )
+    return data
+
+  # Yet the rebuilt contents behave as a regular entry of the file data.
+  assert_that( Rebuilt().get( 'contents' ), equal_to( 'a\nB' ) )
+  assert_that( Rebuilt(), has_key( 'contents' ) )
+  assert_that( len( Rebuilt() ), equal_to( 5 ) )
+  assert_that( dict( Rebuilt() ), has_entry( 'contents', 'a\nB' ) )
+  assert_that( Rebuilt().copy(), has_entry( 'contents', 'a\nB' ) )
+  assert_that( json.loads( json.dumps( Rebuilt() ) ),
+               has_entry( 'contents', 'a\nB' ) )
+
+
+def BufferStore_LinesAreShared_test():
+  store = BufferStore()
+  store.UpdateFileData( { '/foo': FileData( 1, contents = 'a\nb' ) } )
+
+  first = { '/foo': FileData( 2, base_version = 1, changes = [
+    Change( 2, 3, [ 'B' ] ) ] ) }
+  store.UpdateFileData( first )
+  same = { '/foo': FileData( 2, base_version = 1, changes = [
+    Change( 2, 3, [ 'B' ] ) ] ) }
+  store.UpdateFileData( same )
+
+  # Requests for the same version share the lines of the stored buffer, which
+  # they can't alter.
+  assert_that( same[ '/foo' ].lines, equal_to( ( 'a', 'B' ) ) )
+  assert_that( same[ '/foo' ].lines, same_instance( first[ '/foo' ].lines ) )
+
+  later = { '/foo': FileData( 3, base_version = 2, changes = [
+    Change( 1, 2, [ 'A' ] ) ] ) }
+  store.UpdateFileData( later )
+  assert_that( later[ '/foo' ].lines, equal_to( ( 'A', 'B' ) ) )
+  assert_that( first[ '/foo' ].lines, equal_to( ( 'a', 'B' ) ) )
+
+
+def BufferStore_VersionMismatch_test():
+  store = BufferStore()
+  changes = FileData( 3, base_version = 2, changes = [] )
+  assert_that( calling( store.UpdateFileData ).with_args(
+                 { '/foo': changes } ),
+               raises( BufferVersionMismatch ) )
+
+  store.UpdateFileData( { '/foo': FileData( 1, contents = '' ) } )
+  assert_that( calling( store.UpdateFileData ).with_args(
+                 { '/foo': changes } ),
+               raises( BufferVersionMismatch ) )
+
+  store.UpdateFileData( { '/foo': FileData( 2, contents = '' ) } )
+  store.Remove( '/foo' )
+  assert_that( calling( store.UpdateFileData ).with_args(
+                 { '/foo': changes } ),
+               raises( BufferVersionMismatch ) )
+
+
+def BufferStore_InvalidChange_test():
+  store = BufferStore()
+  store.UpdateFileData( { '/foo': FileData( 1, contents = 'a\nb' ) } )
+  assert_that(
+    calling( store.UpdateFileData ).with_args( {
+      '/foo': FileData( 2, base_version = 1, changes = [
+        Change( 2, 4, [] ) ] ) } ),
+    raises( ServerError, 'Invalid change to /foo: lines 2 to 4 out of range' ) )
+
+
+def BufferStore_UnversionedFileDataIsNotStored_test():
+  store = BufferStore()
+  store.UpdateFileData( { '/foo': { 'filetypes': [ 'foo' ],
+                                    'contents': 'a' } } )
+  assert_that( calling( store.UpdateFileData ).with_args( {
+                 '/foo': FileData( 1, base_version = 0, changes = [] ) } ),
+               raises( BufferVersionMismatch ) )
+
+
+def Dummy_test():
+  # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
+  assert True
@@ -15,10 +15,13 @@
 # You should have received a copy of the GNU General Public License
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
-from ycmd.tests.test_utils import DummyCompleter
+from ycmd.completers.completer import CompletionsCache, RequestSuperseded
+from ycmd.request_wrap import RequestWrap
+from ycmd.tests.test_utils import BuildRequest, DummyCompleter
 from ycmd.user_options_store import DefaultOptions
 from unittest.mock import patch
-from hamcrest import assert_that, contains_exactly, equal_to
+from hamcrest import ( assert_that, calling, contains_exactly, empty, equal_to,
+                       has_entries, has_entry, is_not, none, raises )
 
 
 def _FilterAndSortCandidates_Match( candidates, query, expected_matches ):
@@ -76,6 +79,200 @@ def DefinedSubcommands_RemoveStopServerSubcommand_test( subcommands_map ):
   assert_that( completer.DefinedSubcommands(), contains_exactly( 'Foo' ) )
 
 
+def ComputeCandidates_Superseded_test():
+  completer = DummyCompleter( DefaultOptions() )
+  request = RequestWrap( BuildRequest( force_semantic = True ) )
+
+  def CandidatesList():
+    # A newer request arrives while this one is being computed.
+    completer._StartCompletionRequest()
+    return [ 'foo' ]
+
+  with patch.object( completer,
+                     'CandidatesList',
+                     side_effect = CandidatesList ):
+    with patch.object( completer,
+                       'OnCompletionRequestsSuperseded' ) as superseded:
+      assert_that( calling( completer.ComputeCandidates ).with_args( request ),
+                   raises( RequestSuperseded ) )
+      superseded.assert_called()
+
+
+def ComputeCandidates_NotSuperseded_test():
+  completer = DummyCompleter( DefaultOptions() )
+  request = RequestWrap( BuildRequest( force_semantic = True ) )
+
+  with patch.object( completer, 'CandidatesList', return_value = [ 'foo' ] ):
+    assert_that( completer.ComputeCandidates( request ),
+                 contains_exactly( has_entry( 'insertion_text', 'foo' ) ) )
+
+
+def ComputeCandidates_CachedDoesNotSupersede_test():
+  completer = DummyCompleter( DefaultOptions() )
+  request = RequestWrap( BuildRequest( force_semantic = True ) )
+
+  with patch.object( completer, 'CandidatesList', return_value = [ 'foo' ] ):
+    completer.ComputeCandidates( request )
+
+  with patch.object( completer,
+                     'OnCompletionRequestsSuperseded' ) as superseded:
+    assert_that( completer.ComputeCandidates( request ),
+                 contains_exactly( has_entry( 'insertion_text', 'foo' ) ) )
+    superseded.assert_not_called()
+
+
+def ComputeCandidates_CachedNotSuperseded_test():
+  completer = DummyCompleter( DefaultOptions() )
+  request = RequestWrap( BuildRequest( force_semantic = True ) )
+
+  with patch.object( completer, 'CandidatesList', return_value = [ 'foo' ] ):
+    completer.ComputeCandidates( request )
+
+  filter_and_sort = completer.FilterAndSortCandidates
+
+  def FilterAndSortCandidates( candidates, query ):
+    # A newer request arrives while the cached candidates are being filtered.
+    completer._StartCompletionRequest()
+    return filter_and_sort( candidates, query )
+
+  with patch.object( completer,
+                     'FilterAndSortCandidates',
+                     side_effect = FilterAndSortCandidates ):
+    assert_that( completer.ComputeCandidates( request ),
+                 contains_exactly( has_entry( 'insertion_text', 'foo' ) ) )
+
+
+def ComputeCandidates_NotUsedDoesNotSupersede_test():
+  completer = DummyCompleter( DefaultOptions() )
+  request = RequestWrap( BuildRequest() )
+
+  with patch.object( completer, 'ShouldUseNow', return_value = False ):
+    with patch.object( completer,
+                       'OnCompletionRequestsSuperseded' ) as superseded:
+      assert_that( completer.ComputeCandidates( request ), empty() )
+      superseded.assert_not_called()
+
+
+def _CacheRequest( contents, line_num = 1, column_num = 1 ):
+  return RequestWrap( BuildRequest( contents = contents,
+                                    line_num = line_num,
+                                    column_num = column_num ) )
+
+
+def CompletionsCache_MultipleEntries_test():
+  cache = CompletionsCache()
+  contents = 'foo.\nbar.\n'
+  foo = _CacheRequest( contents, line_num = 1, column_num = 5 )
+  bar = _CacheRequest( contents, line_num = 2, column_num = 5 )
+  cache.Update( foo, [ 'foo_member' ] )
+  cache.Update( bar, [ 'bar_member' ] )
+
+  assert_that( cache.GetCompletionsIfCacheValid( foo ),
+               contains_exactly( 'foo_member' ) )
+  assert_that( cache.GetCompletionsIfCacheValid( bar ),
+               contains_exactly( 'bar_member' ) )
+
+  # Typing the query does not invalidate the entry.
+  foo_query = _CacheRequest( 'foo.a\nbar.\n', line_num = 1, column_num = 6 )
+  assert_that( cache.GetCompletionsIfCacheValid( foo_query ),
+               contains_exactly( 'foo_member' ) )
+
+  assert_that( cache.Statistics(), has_entries( {
+    'entries': 2,
+    'hits': 3,
+    'misses': 0,
+    'evictions': 0
+  } ) )
+
+
+def CompletionsCache_KeyedOnCompleter_test():
+  foo_cache = CompletionsCache( 'FooCompleter' )
+  bar_cache = CompletionsCache( 'BarCompleter' )
+  request = _CacheRequest( 'foo.\n', line_num = 1, column_num = 5 )
+  foo_cache.Update( request, [ 'foo_member' ] )
+
+  assert_that( foo_cache._KeyNoLock( request ),
+               is_not( equal_to( bar_cache._KeyNoLock( request ) ) ) )
+  assert_that( bar_cache.GetCompletionsIfCacheValid( request ), none() )
+  assert_that( foo_cache.GetCompletionsIfCacheValid( request ),
+               contains_exactly( 'foo_member' ) )
+
+
+def CompletionsCache_InvalidatedOnBufferChange_test():
+  cache = CompletionsCache()
+  foo = _CacheRequest( 'foo.\nbar.\n', line_num = 1, column_num = 5 )
+  cache.Update( foo, [ 'foo_member' ] )
+
+  changed = _CacheRequest( 'foo.\nbaz.\n', line_num = 1, column_num = 5 )
+  assert_that( cache.GetCompletionsIfCacheValid( changed ), none() )
+  # The stale entry is dropped.
+  assert_that( cache.GetCompletionsIfCacheValid( foo ), none() )
+  assert_that( cache.Statistics(), has_entries( {
+    'entries': 0,
+    'size_bytes': 0,
+    'hits': 0,
+    'misses': 2
+  } ) )
+
+
+def CompletionsCache_EvictsLeastRecentlyUsed_test():
+  cache = CompletionsCache( max_entries = 2 )
+  contents = 'a.\nb.\nc.\n'
+  requests = [ _CacheRequest( contents, line_num = line_num, column_num = 3 )
+               for line_num in range( 1, 4 ) ]
+  cache.Update( requests[ 0 ], [ 'a' ] )
+  cache.Update( requests[ 1 ], [ 'b' ] )
+  cache.GetCompletionsIfCacheValid( requests[ 0 ] )
+  cache.Update( requests[ 2 ], [ 'c' ] )
+
+  assert_that( cache.GetCompletionsIfCacheValid( requests[ 0 ] ),
+               contains_exactly( 'a' ) )
+  assert_that( cache.GetCompletionsIfCacheValid( requests[ 1 ] ), none() )
+  assert_that( cache.GetCompletionsIfCacheValid( requests[ 2 ] ),
+               contains_exactly( 'c' ) )
+  assert_that( cache.Statistics(), has_entries( { 'entries': 2,
+                                                  'evictions': 1 } ) )
+
+
+def CompletionsCache_EvictsOverMemoryBudget_test():
+  cache = CompletionsCache( max_bytes = 1000 )
+  contents = 'a.\nb.\n'
+  a = _CacheRequest( contents, line_num = 1, column_num = 3 )
+  b = _CacheRequest( contents, line_num = 2, column_num = 3 )
+  cache.Update( a, [ 'a' * 600 ] )
+  cache.Update( b, [ 'b' * 600 ] )
+
+  assert_that( cache.GetCompletionsIfCacheValid( a ), none() )
+  assert_that( cache.GetCompletionsIfCacheValid( b ),
+               contains_exactly( 'b' * 600 ) )
+
+  # The most recent entry is kept even if it is over the budget on its own.
+  cache.Update( a, [ 'a' * 2000 ] )
+  assert_that( cache.GetCompletionsIfCacheValid( a ),
+               contains_exactly( 'a' * 2000 ) )
+  assert_that( cache.Statistics(), has_entries( { 'entries': 1,
+                                                  'evictions': 2 } ) )
+
+
+def CompletionsCache_Invalidate_test():
+  cache = CompletionsCache()
+  contents = 'a.\nb.\n'
+  a = _CacheRequest( contents, line_num = 1, column_num = 3 )
+  b = _CacheRequest( contents, line_num = 2, column_num = 3 )
+  cache.Update( a, [ 'a' ] )
+  cache.Update( b, [ 'b' ] )
+
+  cache.Invalidate( a )
+  assert_that( cache.GetCompletionsIfCacheValid( a ), none() )
+  assert_that( cache.GetCompletionsIfCacheValid( b ),
+               contains_exactly( 'b' ) )
+
+  cache.Invalidate()
+  assert_that( cache.GetCompletionsIfCacheValid( b ), none() )
+  assert_that( cache.Statistics(), has_entries( { 'entries': 0,
+                                                  'size_bytes': 0 } ) )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
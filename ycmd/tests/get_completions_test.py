@@ -21,8 +21,10 @@ from hamcrest import ( assert_that,
                        empty,
                        equal_to,
                        has_entries,
-                       has_items )
+                       has_items,
+                       is_not )
 from unittest.mock import patch
+import threading
 from ycmd.tests import IsolatedYcmd, SharedYcmd, PathToTestFile
 from ycmd.tests.test_utils import ( BuildRequest, CompletionEntryMatcher,
                                     DummyCompleter, PatchCompleter )
@@ -312,6 +314,21 @@ def GetCompletions_IdentifierCompleter_IdentifierUnderCursor_test( app ):
                has_items( CompletionEntryMatcher( 'foo' ) ) )
 
 
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+def GetCompletions_IdentifierCompleter_IdentifierUnderCursor_Async_test( app ):
+  # InsertLeave is not queued behind the parses.
+  event_data = BuildRequest( event_name = 'InsertLeave',
+                             column_num = 2,
+                             contents = 'foo' )
+  app.post_json( '/event_notification', event_data )
+
+  completion_data = BuildRequest( contents = 'oo', column_num = 3 )
+  results = app.post_json( '/completions',
+                           completion_data ).json[ 'completions' ]
+  assert_that( results,
+               has_items( CompletionEntryMatcher( 'foo' ) ) )
+
+
 @IsolatedYcmd()
 def GetCompletions_IdentifierCompleter_IgnoreCursorIdentifierInString_test(
   app ):
@@ -788,6 +805,77 @@ def GetCompletions_FilterThenReturnFromCache_test( candidates_list,
     assert_that( candidates_list.call_count, equal_to( 1 ) )
 
 
+@IsolatedYcmd( { 'semantic_completion_deadline_ms': 5000 } )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.ShouldUseNowInner',
+        return_value = True )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.CandidatesList',
+        return_value = [ 'attribute' ] )
+def GetCompletions_SemanticCompletionDeadline_Met_test(
+  candidates_list, should_use, app ):
+  with PatchCompleter( DummyCompleter, 'dummy_filetype' ):
+    completion_data = BuildRequest( filetype = 'dummy_filetype',
+                                    contents = 'object.attr',
+                                    line_num = 1,
+                                    column_num = 12 )
+
+    assert_that(
+      app.post_json( '/completions', completion_data ).json,
+      has_entries( {
+        'completions': contains_exactly(
+          CompletionEntryMatcher( 'attribute' ) ),
+        'completion_start_column': 8,
+        'errors': empty()
+      } )
+    )
+
+
+@IsolatedYcmd( { 'semantic_completion_deadline_ms': 100 } )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.ShouldUseNowInner',
+        return_value = True )
+def GetCompletions_SemanticCompletionDeadline_Missed_test( should_use, app ):
+  computing = threading.Event()
+  release = threading.Event()
+
+  def CandidatesList():
+    computing.set()
+    release.wait( 10 )
+    return [ 'attribute' ]
+
+  with PatchCompleter( DummyCompleter, 'dummy_filetype' ):
+    with patch( 'ycmd.tests.test_utils.DummyCompleter.CandidatesList',
+                side_effect = CandidatesList ) as candidates_list:
+      event_data = BuildRequest( filetype = 'dummy_filetype',
+                                 contents = 'attrib\nobject.attr',
+                                 event_name = 'FileReadyToParse' )
+      app.post_json( '/event_notification', event_data )
+
+      # The identifier completions are returned while the semantic completer
+      # is busy.
+      completion_data = BuildRequest( filetype = 'dummy_filetype',
+                                      contents = 'attrib\nobject.attr',
+                                      line_num = 2,
+                                      column_num = 12 )
+      results = app.post_json( '/completions',
+                               completion_data ).json[ 'completions' ]
+      assert_that( results, has_items( CompletionEntryMatcher( 'attrib' ) ) )
+      assert_that(
+        results,
+        is_not( has_items( CompletionEntryMatcher( 'attribute' ) ) ) )
+      assert_that( computing.is_set(), equal_to( True ) )
+
+      # The next request at the same position waits for the same computation.
+      release.set()
+      completion_data = BuildRequest( filetype = 'dummy_filetype',
+                                      contents = 'attrib\nobject.attri',
+                                      line_num = 2,
+                                      column_num = 13 )
+      results = app.post_json( '/completions',
+                               completion_data ).json[ 'completions' ]
+      assert_that( results,
+                   contains_exactly( CompletionEntryMatcher( 'attribute' ) ) )
+      assert_that( candidates_list.call_count, equal_to( 1 ) )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
@@ -28,10 +28,13 @@ from hamcrest import ( all_of,
                        has_entry,
                        has_items,
                        has_key,
+                       has_length,
                        is_not,
+                       none,
                        raises )
 
 from ycmd.completers import completer
+from ycmd.completers.completer import RequestSuperseded
 from ycmd.completers.language_server import language_server_completer as lsc
 from ycmd.completers.language_server.language_server_completer import (
     NoHoverInfoException,
@@ -43,10 +46,12 @@ from ycmd.tests.test_utils import ( BuildRequest,
                                     ChunkMatcher,
                                     DummyCompleter,
                                     LocationMatcher,
-                                    RangeMatcher )
+                                    RangeMatcher,
+                                    TemporaryTestDir )
 from ycmd.tests.language_server import IsolatedYcmd, PathToTestFile
 from ycmd import handlers, utils, responses
 import os
+import threading
 
 
 class MockCompleter( lsc.LanguageServerCompleter, DummyCompleter ):
@@ -283,6 +288,25 @@ def LanguageServerCompleter_Initialise_Shutdown_test( app ):
     assert_that( completer.ServerIsReady(), equal_to( False ) )
 
 
+def _ReceivedResponses( messages ):
+  """Returns a side effect for LanguageServerConnection.GetResponseAsync which
+  answers the requests with |messages|, in order. Further requests are never
+  answered."""
+  messages = iter( messages )
+
+  def GetResponseAsync( request_id,
+                        message,
+                        response_callback = None,
+                        timeout = None ):
+    response = lsc.Response( response_callback )
+    received = next( messages, None )
+    if received is not None:
+      response.ResponseReceived( received )
+    return response
+
+  return GetResponseAsync
+
+
 @IsolatedYcmd()
 def LanguageServerCompleter_GoTo_test( app ):
   if utils.OnWindows():
@@ -314,8 +338,8 @@ def LanguageServerCompleter_GoTo_test( app ):
   @patch.object( completer, '_ServerIsInitialized', return_value = True )
   def Test( responses, command, exception, throws, *args ):
     with patch.object( completer.GetConnection(),
-                       'GetResponse',
-                       side_effect = responses ):
+                       'GetResponseAsync',
+                       side_effect = _ReceivedResponses( responses ) ):
       if throws:
         assert_that(
           calling( completer.OnUserCommand ).with_args( [ command ],
@@ -467,6 +491,74 @@ def LanguageServerCompleter_GoTo_test( app ):
   } ], 'GoTo', LocationMatcher( filepath, 2, 4 ), False )
 
 
+@IsolatedYcmd()
+def LanguageServerCompleter_GoTo_Pipelined_test( app ):
+  filepath = PathToTestFile( 'test.test' )
+  completer = MockCompleter()
+  completer._server_capabilities = {
+    'definitionProvider':  True,
+    'declarationProvider': True
+  }
+  request_data = RequestWrap( BuildRequest( filetype = 'ycmtest',
+                                            filepath = filepath,
+                                            contents = 'line1\nline2',
+                                            line_num = 2,
+                                            column_num = 3 ) )
+  sent = []
+  received = _ReceivedResponses( [ {
+    'result': {
+      'uri': lsp.FilePathToUri( filepath ),
+      'range': {
+        'start': { 'line': 0, 'character': 0 },
+        'end': { 'line': 0, 'character': 4 } }
+    }
+  } ] )
+
+  def GetResponseAsync( request_id, message, timeout = None ):
+    sent.append( request_id )
+    return received( request_id, message )
+
+  with patch.object( completer, '_ServerIsInitialized', return_value = True ):
+    with patch.object( completer.GetConnection(),
+                       'GetResponseAsync',
+                       side_effect = GetResponseAsync ):
+      with patch.object( completer.GetConnection(),
+                         'CancelRequest' ) as cancel_request:
+        assert_that( completer.OnUserCommand( [ 'GoTo' ], request_data ),
+                     LocationMatcher( filepath, 1, 1 ) )
+
+  # Both requests are sent upfront. The definition is not under the cursor, so
+  # the declaration is not needed.
+  assert_that( sent, has_length( 2 ) )
+  cancel_request.assert_called_once_with( sent[ 1 ] )
+
+
+def LocationListToGoTo_ReadsEachFileOnce_test():
+  if utils.OnWindows():
+    filepaths = [ 'C:\\a.test', 'C:\\b.test' ]
+  else:
+    filepaths = [ '/a.test', '/b.test' ]
+
+  request_data = RequestWrap( BuildRequest( filepath = filepaths[ 0 ] ) )
+  positions = [ {
+    'uri': lsp.FilePathToUri( filepath ),
+    'range': {
+      'start': { 'line': line, 'character': 3 },
+      'end': { 'line': line, 'character': 3 },
+    }
+  } for line in range( 2 ) for filepath in filepaths for _ in range( 50 ) ]
+
+  with patch.object( lsc,
+                     'GetFileLines',
+                     return_value = [ 'a😉bcd', 'abcd' ] ) as get_file_lines:
+    result = lsc._LocationListToGoTo( request_data, positions )
+
+  assert_that( get_file_lines.call_count, equal_to( 2 ) )
+  assert_that( result, has_length( 200 ) )
+  assert_that( result[ 0 ], LocationMatcher( filepaths[ 0 ], 1, 6 ) )
+  assert_that( result[ -1 ], LocationMatcher( filepaths[ 1 ], 2, 4 ) )
+
+
 def GetCompletions_RejectInvalid_test():
   if utils.OnWindows():
     filepath = 'C:\\test.test'
@@ -734,6 +826,161 @@ def LanguageServerCompleter_GetCompletions_UnsupportedKinds_test( app ):
       )
 
 
+@IsolatedYcmd()
+def LanguageServerCompleter_GetCompletions_Superseded_test( app ):
+  completer = MockCompleter()
+  request_data = RequestWrap( BuildRequest( force_semantic = True ) )
+
+  def GetResponse( request_id, message, timeout ):
+    # A newer completion request arrives while the server is busy with this one.
+    completer._StartCompletionRequest()
+    raise lsc.ResponseCancelledException( 'Response Cancelled' )
+
+  with patch.object( completer, '_is_completion_provider', True ):
+    with patch.object( completer.GetConnection(),
+                       'GetResponse',
+                       side_effect = GetResponse ):
+      with patch.object( completer.GetConnection(),
+                         'CancelRequest' ) as cancel_request:
+        assert_that(
+          calling( completer.ComputeCandidates ).with_args( request_data ),
+          raises( RequestSuperseded ) )
+        cancel_request.assert_called_once()
+
+  assert_that( completer._pending_completion_requests, empty() )
+
+
+@IsolatedYcmd()
+def LanguageServerCompleter_DetailCandidates_ResolvesInParallel_test( app ):
+  completer = MockCompleter()
+  completer._resolve_completion_items = True
+  request_data = RequestWrap( BuildRequest() )
+  items = [ { 'label': 'resolved' },
+            { 'label': 'failed' },
+            { 'label': 'timed_out' } ]
+  sent = []
+
+  def GetResponseAsync( request_id, message, timeout = None ):
+    response = lsc.Response()
+    sent.append( request_id )
+    label = items[ len( sent ) - 1 ][ 'label' ]
+    if label == 'resolved':
+      response.ResponseReceived( { 'result': { 'label': 'resolved',
+                                               'detail': 'detail' } } )
+    elif label == 'failed':
+      response.ResponseReceived( { 'error': { 'code': 1 } } )
+    return response
+
+  with patch.object( lsc, 'REQUEST_TIMEOUT_COMPLETION', 0.1 ):
+    with patch.object( completer.GetConnection(),
+                       'GetResponseAsync',
+                       side_effect = GetResponseAsync ):
+      with patch.object( completer.GetConnection(),
+                         'CancelRequest' ) as cancel_request:
+        assert_that(
+          completer._CandidatesFromCompletionItems(
+            items,
+            lsc.LanguageServerCompleter.RESOLVE_ALL,
+            request_data ),
+          contains_exactly(
+            has_entries( { 'insertion_text': 'resolved',
+                           'extra_menu_info': 'detail' } ),
+            has_entries( { 'insertion_text': 'failed' } ),
+            has_entries( { 'insertion_text': 'timed_out' } )
+          )
+        )
+        # The request which timed out is cancelled, and its item may be
+        # resolved again later.
+        cancel_request.assert_called_once_with( sent[ 2 ] )
+
+  assert_that( items, contains_exactly(
+    has_entry( '_resolved', True ),
+    has_entry( '_resolved', True ),
+    is_not( has_key( '_resolved' ) )
+  ) )
+  assert_that( completer._pending_completion_requests, empty() )
+
+
+def LanguageServerCompletionsCache_IncompletePerEntry_test():
+  cache = lsc.LanguageServerCompletionsCache()
+  contents = 'foo.\nbar.a\n'
+  foo = RequestWrap( BuildRequest( contents = contents,
+                                   line_num = 1,
+                                   column_num = 5 ) )
+  bar = RequestWrap( BuildRequest( contents = contents,
+                                   line_num = 2,
+                                   column_num = 6 ) )
+
+  cache.Update( foo, [ 'foo_member' ], False )
+  cache.Update( bar, [ 'bar_member' ], True )
+
+  # Only the position whose completions were incomplete is requested again at
+  # the current column.
+  assert_that( cache.GetCodepointForCompletionRequest( foo ), equal_to( 5 ) )
+  assert_that( cache.GetCodepointForCompletionRequest( bar ), equal_to( 6 ) )
+  assert_that( cache.GetCompletionsIfCacheValid( foo ),
+               contains_exactly( 'foo_member' ) )
+  assert_that( cache.GetCompletionsIfCacheValid( bar ), none() )
+
+  # The complete list requested at the current column stays valid while the
+  # query is extended, but not once it is shortened.
+  cache.Update( bar, [ 'bar_member' ], False )
+  assert_that( cache.GetCodepointForCompletionRequest( bar ), equal_to( 6 ) )
+  extended = RequestWrap( BuildRequest( contents = 'foo.\nbar.ab\n',
+                                        line_num = 2,
+                                        column_num = 7 ) )
+  shortened = RequestWrap( BuildRequest( contents = 'foo.\nbar.\n',
+                                         line_num = 2,
+                                         column_num = 5 ) )
+  assert_that( cache.GetCompletionsIfCacheValid( extended ),
+               contains_exactly( 'bar_member' ) )
+  assert_that( cache.GetCompletionsIfCacheValid( shortened ), none() )
+
+  # Invalidating a position resets it.
+  cache.Invalidate( bar )
+  assert_that( cache.GetCodepointForCompletionRequest( bar ), equal_to( 5 ) )
+  assert_that( cache.GetCompletionsIfCacheValid( foo ),
+               contains_exactly( 'foo_member' ) )
+
+
+@IsolatedYcmd()
+def LanguageServerCompleter_Superseded_NoConnection_test( app ):
+  completer = MockCompleter()
+  completer._pending_completion_requests = { 1, 2 }
+
+  with patch.object( completer, 'GetConnection', return_value = None ):
+    completer.OnCompletionRequestsSuperseded()
+
+  assert_that( completer._pending_completion_requests, empty() )
+
+
+@IsolatedYcmd()
+def LanguageServerCompleter_DetailSingleCandidate_NotSuperseded_test( app ):
+  completer = MockCompleter()
+  completer._resolve_completion_items = True
+  request_data = RequestWrap( BuildRequest() )
+  completions = [ { 'extra_data': { 'item': { 'label': 'test' } } } ]
+
+  def GetResponseAsync( request_id, message, timeout = None ):
+    # The client requests completions again while the item is being resolved.
+    completer.OnCompletionRequestsSuperseded()
+    response = lsc.Response()
+    response.ResponseReceived( { 'result': { 'label': 'test',
+                                             'detail': 'detail' } } )
+    return response
+
+  with patch.object( completer.GetConnection(),
+                     'GetResponseAsync',
+                     side_effect = GetResponseAsync ):
+    with patch.object( completer.GetConnection(),
+                       'CancelRequest' ) as cancel_request:
+      assert_that(
+        completer.DetailSingleCandidate( request_data, completions, 0 ),
+        has_entries( { 'insertion_text': 'test',
+                       'extra_menu_info': 'detail' } ) )
+      cancel_request.assert_not_called()
+
+
 @IsolatedYcmd()
 def LanguageServerCompleter_GetCompletions_NullNoError_test( app ):
   completer = MockCompleter()
@@ -1087,7 +1334,7 @@ def LanguageServerCompleter_Diagnostics_MaxDiagnosticsNumberExceeded_test(
       } ]
     }
   }
-  completer.GetConnection()._notifications.put( notification )
+  completer.GetConnection()._notifications.Put( notification )
   completer.HandleNotificationInPollThread( notification )
 
   with patch.object( completer, '_ServerIsInitialized', return_value = True ):
@@ -1164,7 +1411,7 @@ def LanguageServerCompleter_Diagnostics_NoLimitToNumberOfDiagnostics_test(
       } ]
     }
   }
-  completer.GetConnection()._notifications.put( notification )
+  completer.GetConnection()._notifications.Put( notification )
   completer.HandleNotificationInPollThread( notification )
 
   with patch.object( completer, '_ServerIsInitialized', return_value = True ):
@@ -1272,7 +1519,7 @@ def LanguageServerCompleter_Diagnostics_Code_test( app ):
       } ]
     }
   }
-  completer.GetConnection()._notifications.put( notification )
+  completer.GetConnection()._notifications.Put( notification )
   completer.HandleNotificationInPollThread( notification )
 
   with patch.object( completer, 'ServerIsReady', return_value = True ):
@@ -1351,7 +1598,7 @@ def LanguageServerCompleter_Diagnostics_PercentEncodeCannonical_test( app ):
       } ]
     }
   }
-  completer.GetConnection()._notifications.put( notification )
+  completer.GetConnection()._notifications.Put( notification )
   completer.HandleNotificationInPollThread( notification )
 
   with patch.object( completer, '_ServerIsInitialized', return_value = True ):
@@ -1395,6 +1642,34 @@ def LanguageServerCompleter_PollForMessages_ServerNotStarted_test( app ):
   assert_that( server.PollForMessages( request_data ), equal_to( True ) )
 
 
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+def LanguageServerCompleter_PollForMessages_AsyncFileReadyToParse_test( app ):
+  completer = MockCompleter( { 'async_file_ready_to_parse': 1 } )
+  filepath = os.path.realpath( '/foo' )
+  request_data = RequestWrap( BuildRequest( filepath = filepath,
+                                            contents = '' ) )
+  initialize_response = { 'result': { 'capabilities': {} } }
+  completer._HandleInitializeInPollThread( initialize_response )
+
+  # The parse result wakes up a poll waiting for notifications from the server.
+  messages = []
+  thread = threading.Thread( target = lambda: messages.append(
+    completer.PollForMessages( request_data, timeout = 30 ) ) )
+  thread.start()
+  thread.join( 0.1 )
+  assert_that( messages, empty() )
+
+  with patch.object( completer, 'OnFileReadyToParse',
+                     side_effect = RuntimeError( 'Parse failed' ) ):
+    completer.PublishFileReadyToParse( request_data )
+  thread.join( 5 )
+  assert_that( thread.is_alive(), equal_to( False ) )
+  assert_that( messages, contains_exactly( contains_exactly( has_entries( {
+    'error': has_entry( 'message', 'Parse failed' ),
+    'filepath': filepath
+  } ) ) ) )
+
+
 @IsolatedYcmd()
 def LanguageServerCompleter_OnFileSave_BeforeServerReady_test( app ):
   completer = MockCompleter()
@@ -1430,7 +1705,7 @@ def LanguageServerCompleter_OnFileReadyToParse_InvalidURI_test( app ):
       } ]
     }
   }
-  completer.GetConnection()._notifications.put( notification )
+  completer.GetConnection()._notifications.Put( notification )
   completer.HandleNotificationInPollThread( notification )
 
   with patch.object( completer, '_ServerIsInitialized', return_value = True ):
@@ -1462,6 +1737,97 @@ def LanguageServerCompleter_OnFileReadyToParse_InvalidURI_test( app ):
       uri_to_filepath.assert_called()
 
 
+@pytest.mark.parametrize( 'sync_type,expected_change', [
+  ( 'Full', { 'text': 'a\nB\nc\n' } ),
+  ( 'Incremental', { 'range': { 'start': { 'line': 1, 'character': 0 },
+                                'end': { 'line': 2, 'character': 0 } },
+                     'text': 'B\n' } )
+] )
+@IsolatedYcmd()
+def LanguageServerCompleter_UpdateServerWithFileContents_SyncType_test(
+    app, sync_type, expected_change ):
+  completer = MockCompleter()
+  completer._sync_type = sync_type
+  filepath = os.path.realpath( '/foo' )
+
+  with patch.object( completer,
+                     'SupportedFiletypes',
+                     return_value = [ 'foo' ] ), \
+       patch.object( completer.GetConnection(),
+                     'SendNotification' ) as send_notification:
+    completer._UpdateServerWithFileContents( RequestWrap(
+      BuildRequest( filepath = filepath, contents = 'a\nb\nc\n' ) ) )
+    completer._UpdateServerWithFileContents( RequestWrap(
+      BuildRequest( filepath = filepath, contents = 'a\nB\nc\n' ) ) )
+
+    assert_that( send_notification.call_count, equal_to( 2 ) )
+    did_change = lsp.Parse(
+      send_notification.call_args[ 0 ][ 0 ].split( b'\r\n\r\n' )[ 1 ] )
+    assert_that( did_change, has_entries( {
+      'method': 'textDocument/didChange',
+      'params': has_entries( {
+        'textDocument': has_entries( { 'version': 2 } ),
+        'contentChanges': contains_exactly( expected_change )
+      } )
+    } ) )
+
+
+@IsolatedYcmd()
+def LanguageServerCompleter_UpdateSavedFiles_ReadOnlyWhenStatChanges_test(
+    app ):
+  completer = MockCompleter()
+
+  with TemporaryTestDir() as tmp_dir:
+    filepath = os.path.join( tmp_dir, 'saved.foo' )
+    with open( filepath, 'w' ) as f:
+      f.write( 'on disk' )
+
+    dirty_request = RequestWrap( BuildRequest( filepath = filepath,
+                                               contents = 'dirty' ) )
+    # Any request in which the file isn't dirty.
+    other_request = RequestWrap( BuildRequest( filepath = '/other',
+                                               filetype = 'bar' ) )
+
+    with patch.object( completer,
+                       'SupportedFiletypes',
+                       return_value = [ 'foo' ] ), \
+         patch.object( completer.GetConnection(),
+                       'SendNotification' ) as send_notification, \
+         patch( 'ycmd.completers.language_server.language_server_completer.'
+                'GetFileContents',
+                wraps = lsc.GetFileContents ) as get_file_contents:
+      completer._UpdateServerWithFileContents( dirty_request )
+      get_file_contents.assert_not_called()
+      assert_that( send_notification.call_count, equal_to( 1 ) )
+
+      # The buffer is no longer dirty, so the file is read from disk.
+      completer._UpdateServerWithFileContents( other_request )
+      assert_that( get_file_contents.call_count, equal_to( 1 ) )
+      assert_that( send_notification.call_count, equal_to( 2 ) )
+
+      # The file hasn't changed on disk, so it isn't read again.
+      completer._UpdateServerWithFileContents( other_request )
+      completer._UpdateServerWithFileContents( other_request )
+      assert_that( get_file_contents.call_count, equal_to( 1 ) )
+      assert_that( send_notification.call_count, equal_to( 2 ) )
+
+      with open( filepath, 'w' ) as f:
+        f.write( 'modified on disk' )
+
+      completer._UpdateServerWithFileContents( other_request )
+      assert_that( get_file_contents.call_count, equal_to( 2 ) )
+      assert_that( send_notification.call_count, equal_to( 3 ) )
+      assert_that( completer._server_file_state[ filepath ].contents,
+                   equal_to( 'modified on disk' ) )
+
+      # Once the buffer is dirty again, its contents are sent and the file is
+      # read from disk the next time it's no longer dirty.
+      completer._UpdateServerWithFileContents( dirty_request )
+      completer._UpdateServerWithFileContents( other_request )
+      assert_that( get_file_contents.call_count, equal_to( 3 ) )
+      assert_that( send_notification.call_count, equal_to( 5 ) )
+
+
 def _TupleToLSPRange( tuple ):
   return { 'line': tuple[ 0 ], 'character': tuple[ 1 ] }
 
@@ -15,12 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch, MagicMock
 from ycmd.completers.language_server import language_server_completer as lsc
-from hamcrest import assert_that, calling, equal_to, raises
+from hamcrest import ( assert_that, calling, contains_exactly, empty, equal_to,
+                       has_entry, has_length, less_than, raises )
 from ycmd.tests.language_server import MockConnection
 
-import queue
+import threading
+import time
 
 
 def LanguageServerConnection_ReadPartialMessage_test():
@@ -38,6 +40,45 @@ def LanguageServerConnection_ReadPartialMessage_test():
       dispatch_message.assert_called_with( { 'abc': '' } )
 
 
+def LanguageServerConnection_ReadMultipleMessagesInOneChunk_test():
+  connection = MockConnection()
+
+  return_values = [
+    bytes( b'Content-Length: 9\r\n\r\n{"a":"1"}'
+           b'Content-Length: 9\r\n'
+           b'Content-Type: application/vscode-jsonrpc; charset=utf-8\r\n\r\n'
+           b'{"b":"2"}Content-Length: 9\r\n\r\n{"c":' ),
+    bytes( b'"3"}' ),
+    lsc.LanguageServerConnectionStopped
+  ]
+
+  with patch.object( connection, 'ReadData', side_effect = return_values ):
+    with patch.object( connection, '_DispatchMessage' ) as dispatch_message:
+      connection.run()
+      assert_that( dispatch_message.call_args_list, equal_to( [
+        call( { 'a': '1' } ),
+        call( { 'b': '2' } ),
+        call( { 'c': '3' } )
+      ] ) )
+
+
+def LanguageServerConnection_ReadHeaderSplitAcrossChunks_test():
+  connection = MockConnection()
+
+  return_values = [
+    bytes( b'Content-Len' ),
+    bytes( b'gth: 12\r' ),
+    bytes( b'\n\r' ),
+    bytes( b'\n{"abc":"\xc3\xa9"}' ),
+    lsc.LanguageServerConnectionStopped
+  ]
+
+  with patch.object( connection, 'ReadData', side_effect = return_values ):
+    with patch.object( connection, '_DispatchMessage' ) as dispatch_message:
+      connection.run()
+      dispatch_message.assert_called_with( { 'abc': 'é' } )
+
+
 def LanguageServerConnection_MissingHeader_test():
   connection = MockConnection()
 
@@ -82,6 +123,135 @@ def LanguageServerConnection_RequestAbortAwait_test():
                  raises( lsc.ResponseAbortedException ) )
 
 
+def LanguageServerConnection_CancelRequest_test():
+  connection = MockConnection()
+
+  return_values = [
+    bytes( b'Content-Length: 32\r\n\r\n{"id":1,"error":{"code":-32800}}' ),
+    lsc.LanguageServerConnectionStopped
+  ]
+
+  with patch.object( connection, 'WriteData' ) as write_data:
+    response = connection.GetResponseAsync( 1, bytes( b'{"test":"test"}' ) )
+    connection.CancelRequest( 1 )
+    write_data.assert_called_with( bytes( b'Content-Length: 62\r\n\r\n'
+                                          b'{"jsonrpc":"2.0",'
+                                          b'"method":"$/cancelRequest",'
+                                          b'"params":{"id":1}}' ) )
+    assert_that( calling( response.AwaitResponse ).with_args( 10 ),
+                 raises( lsc.ResponseCancelledException ) )
+
+    # Cancelling a request that has already been answered does nothing.
+    write_data.reset_mock()
+    connection.CancelRequest( 2 )
+    write_data.assert_not_called()
+
+  # The server's eventual response to the cancelled request is ignored.
+  with patch.object( connection, 'ReadData', side_effect = return_values ):
+    connection.run()
+  assert_that( connection._responses, equal_to( {} ) )
+
+
+def LanguageServerConnection_GetResponse_CancelledOnTimeout_test():
+  connection = MockConnection()
+
+  with patch.object( connection, 'WriteData' ) as write_data:
+    assert_that(
+      calling( connection.GetResponse ).with_args( 1,
+                                                   bytes( b'{"test":"test"}' ),
+                                                   0 ),
+      raises( lsc.ResponseTimeoutException ) )
+    write_data.assert_called_with( bytes( b'Content-Length: 62\r\n\r\n'
+                                          b'{"jsonrpc":"2.0",'
+                                          b'"method":"$/cancelRequest",'
+                                          b'"params":{"id":1}}' ) )
+
+
+@patch.object( lsc, 'MAX_OUTSTANDING_REQUESTS', 2 )
+@patch.object( lsc, 'REQUEST_QUEUE_TIMEOUT', 0.1 )
+def LanguageServerConnection_MaxOutstandingRequests_test():
+  connection = MockConnection()
+
+  with patch.object( connection, 'WriteData' ) as write_data:
+    first = connection.GetResponseAsync( 1, bytes( b'{"test":"1"}' ) )
+    connection.GetResponseAsync( 2, bytes( b'{"test":"2"}' ) )
+    assert_that(
+      calling( connection.GetResponseAsync ).with_args(
+        3, bytes( b'{"test":"3"}' ) ),
+      raises( lsc.ResponseTimeoutException ) )
+    assert_that( write_data.call_count, equal_to( 2 ) )
+
+    # Responses may be received in any order. Each one frees a slot.
+    connection._DispatchMessage( { 'id': 2, 'result': 'two' } )
+    third = connection.GetResponseAsync( 3, bytes( b'{"test":"3"}' ) )
+    connection._DispatchMessage( { 'id': 3, 'result': 'three' } )
+    connection._DispatchMessage( { 'id': 1, 'result': 'one' } )
+
+  assert_that( third.AwaitResponse( 0 ), has_entry( 'result', 'three' ) )
+  assert_that( first.AwaitResponse( 0 ), has_entry( 'result', 'one' ) )
+  assert_that( connection.PendingRequestCount(), equal_to( 0 ) )
+
+
+@patch.object( lsc, 'MAX_OUTSTANDING_REQUESTS', 1 )
+def LanguageServerConnection_MaxOutstandingRequests_Wait_test():
+  connection = MockConnection()
+
+  with patch.object( connection, 'WriteData' ):
+    connection.GetResponseAsync( 1, bytes( b'{"test":"1"}' ) )
+    responses = []
+    thread = threading.Thread( target = lambda: responses.append(
+      connection.GetResponseAsync( 2, bytes( b'{"test":"2"}' ) ) ) )
+    thread.start()
+    thread.join( 0.1 )
+    assert_that( responses, empty() )
+
+    connection._DispatchMessage( { 'id': 1, 'result': 'one' } )
+    thread.join()
+    assert_that( responses, has_length( 1 ) )
+
+
+@patch.object( lsc, 'MAX_OUTSTANDING_REQUESTS', 1 )
+@patch.object( lsc, 'REQUEST_QUEUE_TIMEOUT', 30 )
+def LanguageServerConnection_MaxOutstandingRequests_CallerTimeout_test():
+  connection = MockConnection()
+
+  with patch.object( connection, 'WriteData' ) as write_data:
+    connection.GetResponseAsync( 1, bytes( b'{"test":"1"}' ) )
+
+    # Waiting for a slot counts towards the timeout of the request.
+    start = time.monotonic()
+    assert_that(
+      calling( connection.GetResponse ).with_args(
+        2, bytes( b'{"test":"2"}' ), 0.1 ),
+      raises( lsc.ResponseTimeoutException ) )
+    assert_that( time.monotonic() - start, less_than( 5 ) )
+    assert_that( write_data.call_count, equal_to( 1 ) )
+
+
+@patch.object( lsc, 'MAX_OUTSTANDING_REQUESTS', 64 )
+@patch.object( lsc, 'REQUEST_QUEUE_TIMEOUT', 0.1 )
+def LanguageServerConnection_MaxOutstandingRequests_CancelledFreeSlot_test():
+  connection = MockConnection()
+
+  with patch.object( connection, 'WriteData' ):
+    # The server never answers any of these requests, not even with an error.
+    for request_id in range( 1, 101 ):
+      assert_that(
+        calling( connection.GetResponse ).with_args(
+          request_id, bytes( b'{"test":"test"}' ), 0 ),
+        raises( lsc.ResponseTimeoutException ) )
+    assert_that( connection.PendingRequestCount(), equal_to( 0 ) )
+
+    response = connection.GetResponseAsync( 101, bytes( b'{"test":"test"}' ) )
+
+    # Late responses to cancelled requests are dropped.
+    connection._DispatchMessage( { 'id': 1, 'result': 'one' } )
+    connection._DispatchMessage( { 'id': 101, 'result': 'last' } )
+
+  assert_that( response.AwaitResponse( 0 ), has_entry( 'result', 'last' ) )
+  assert_that( connection.PendingRequestCount(), equal_to( 0 ) )
+
+
 def LanguageServerConnection_ServerConnectionDies_test():
   connection = MockConnection()
 
@@ -118,40 +288,98 @@ def LanguageServerConnection_CloseTwice_test():
     connection.Close()
 
 
+def _Diagnostics( uri, version ):
+  return {
+    'method': 'textDocument/publishDiagnostics',
+    'params': { 'uri': uri, 'version': version, 'diagnostics': [] }
+  }
+
+
+def _LogMessage( message ):
+  return { 'method': 'window/logMessage', 'params': { 'message': message } }
+
+
 @patch.object( lsc, 'MAX_QUEUED_MESSAGES', 2 )
-def LanguageServerConnection_AddNotificationToQueue_RingBuffer_test():
+def LanguageServerConnection_NotificationStore_Unkeyed_test():
   connection = MockConnection()
   notifications = connection._notifications
 
-  # Queue empty
+  # Store empty
 
-  assert_that( calling( notifications.get_nowait ), raises( queue.Empty ) )
+  assert_that( notifications.Take(), empty() )
 
-  # Queue partially full, then drained
+  # Store partially full, then drained
 
-  connection._AddNotificationToQueue( 'one' )
+  connection._DispatchMessage( _LogMessage( 'one' ) )
 
-  assert_that( notifications.get_nowait(), equal_to( 'one' ) )
-  assert_that( calling( notifications.get_nowait ), raises( queue.Empty ) )
+  assert_that( notifications.Take(), contains_exactly( _LogMessage( 'one' ) ) )
+  assert_that( notifications.Take(), empty() )
 
-  # Queue full, then drained
+  # Store full, then new notification, then drained
 
-  connection._AddNotificationToQueue( 'one' )
-  connection._AddNotificationToQueue( 'two' )
+  connection._DispatchMessage( _LogMessage( 'one' ) )
+  connection._DispatchMessage( _LogMessage( 'two' ) )
+  connection._DispatchMessage( _LogMessage( 'three' ) )
 
-  assert_that( notifications.get_nowait(), equal_to( 'one' ) )
-  assert_that( notifications.get_nowait(), equal_to( 'two' ) )
-  assert_that( calling( notifications.get_nowait ), raises( queue.Empty ) )
+  assert_that( connection.QueuedNotificationCount(), equal_to( 2 ) )
+  assert_that( notifications.Take(),
+               contains_exactly( _LogMessage( 'two' ),
+                                 _LogMessage( 'three' ) ) )
+  assert_that( notifications.Take(), empty() )
 
-  # Queue full, then new notification, then drained
 
-  connection._AddNotificationToQueue( 'one' )
-  connection._AddNotificationToQueue( 'two' )
-  connection._AddNotificationToQueue( 'three' )
+@patch.object( lsc, 'MAX_QUEUED_MESSAGES', 2 )
+def LanguageServerConnection_NotificationStore_CoalesceDiagnostics_test():
+  connection = MockConnection()
+  notifications = connection._notifications
+
+  connection._DispatchMessage( _Diagnostics( 'file:///a', 1 ) )
+  connection._DispatchMessage( _Diagnostics( 'file:///b', 1 ) )
+  connection._DispatchMessage( _LogMessage( 'one' ) )
+  connection._DispatchMessage( _Diagnostics( 'file:///a', 2 ) )
+  connection._DispatchMessage( _Diagnostics( 'file:///c', 1 ) )
+  connection._DispatchMessage( _Diagnostics( 'file:///a', 3 ) )
+
+  # Only the latest diagnostics for each file are kept, and the bound on the
+  # other notifications does not apply to them.
+  assert_that( connection.QueuedNotificationCount(), equal_to( 4 ) )
+  assert_that( notifications.Take(), contains_exactly(
+    _Diagnostics( 'file:///b', 1 ),
+    _LogMessage( 'one' ),
+    _Diagnostics( 'file:///c', 1 ),
+    _Diagnostics( 'file:///a', 3 ) ) )
+  assert_that( notifications.Take(), empty() )
+
+
+def LanguageServerConnection_NotificationStore_TakeWaits_test():
+  connection = MockConnection()
+  notifications = connection._notifications
+
+  assert_that( notifications.Take( timeout = 0.01 ), empty() )
+
+  timer = threading.Timer(
+    0.05,
+    lambda: connection._DispatchMessage( _Diagnostics( 'file:///a', 1 ) ) )
+  timer.start()
+  try:
+    assert_that( notifications.Take( timeout = 10 ),
+                 contains_exactly( _Diagnostics( 'file:///a', 1 ) ) )
+  finally:
+    timer.join()
+
+
+def LanguageServerConnection_NotificationStore_Wake_test():
+  connection = MockConnection()
+  notifications = connection._notifications
 
-  assert_that( notifications.get_nowait(), equal_to( 'two' ) )
-  assert_that( notifications.get_nowait(), equal_to( 'three' ) )
-  assert_that( calling( notifications.get_nowait ), raises( queue.Empty ) )
+  timer = threading.Timer( 0.05, notifications.Wake )
+  timer.start()
+  try:
+    start = time.monotonic()
+    assert_that( notifications.Take( timeout = 10 ), empty() )
+    assert_that( time.monotonic() - start, less_than( 5 ) )
+  finally:
+    timer.join()
 
 
 def LanguageServerConnection_RejectUnsupportedRequest_test():
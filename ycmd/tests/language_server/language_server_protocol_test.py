@@ -16,9 +16,11 @@
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
 import pytest
+from unittest.mock import patch
 from ycmd.completers.language_server import language_server_protocol as lsp
 from hamcrest import assert_that, equal_to, calling, is_not, raises
 from ycmd.tests.test_utils import UnixOnly, WindowsOnly
+from ycmd.utils import CodepointOffsetToByteOffset
 
 
 def ServerFileStateStore_RetrieveDelete_test():
@@ -142,6 +144,56 @@ def ServerFileStateStore_RetrieveDelete_test():
   assert_that( file2_state.state, equal_to( lsp.ServerFileState.CLOSED ) )
 
 
+@pytest.mark.parametrize( 'fingerprint', [ lsp.Sha1Fingerprint,
+                                            lsp.HashFingerprint,
+                                            None ] )
+def ServerFileState_ContentFingerprint_test( fingerprint ):
+  with patch.object( lsp, 'CONTENT_FINGERPRINT', fingerprint ):
+    file_state = lsp.ServerFileState( 'file' )
+
+    assert_that( file_state.GetDirtyFileAction( 'contents' ),
+                 equal_to( lsp.ServerFileState.OPEN_FILE ) )
+    assert_that( file_state.GetDirtyFileAction( 'contents' ),
+                 equal_to( lsp.ServerFileState.NO_ACTION ) )
+
+    # Same length, different contents
+    assert_that( file_state.GetDirtyFileAction( 'CONTENTS' ),
+                 equal_to( lsp.ServerFileState.CHANGE_FILE ) )
+    assert_that( file_state.GetSavedFileAction( 'CONTENTS' ),
+                 equal_to( lsp.ServerFileState.NO_ACTION ) )
+
+    # Different length
+    assert_that( file_state.GetSavedFileAction( 'CONTENTS changed' ),
+                 equal_to( lsp.ServerFileState.CHANGE_FILE ) )
+    assert_that( file_state.GetDirtyFileAction( 'CONTENTS changed' ),
+                 equal_to( lsp.ServerFileState.NO_ACTION ) )
+    assert_that( file_state.version, equal_to( 3 ) )
+    assert_that( file_state.contents, equal_to( 'CONTENTS changed' ) )
+
+
+@pytest.mark.parametrize( 'fingerprint', [ lsp.Sha1Fingerprint,
+                                            lsp.HashFingerprint,
+                                            None ] )
+def ServerFileState_ReopenWithOtherContents_test( fingerprint ):
+  with patch.object( lsp, 'CONTENT_FINGERPRINT', fingerprint ):
+    file_state = lsp.ServerFileState( 'file' )
+
+    assert_that( file_state.GetDirtyFileAction( 'aaaa' ),
+                 equal_to( lsp.ServerFileState.OPEN_FILE ) )
+    assert_that( file_state.GetDirtyFileAction( 'aaaa' ),
+                 equal_to( lsp.ServerFileState.NO_ACTION ) )
+    assert_that( file_state.GetFileCloseAction(),
+                 equal_to( lsp.ServerFileState.CLOSE_FILE ) )
+    assert_that( file_state.GetDirtyFileAction( 'bbbb' ),
+                 equal_to( lsp.ServerFileState.OPEN_FILE ) )
+    assert_that( file_state.contents, equal_to( 'bbbb' ) )
+
+    # The server has 'bbbb', so going back to 'aaaa' is a change.
+    assert_that( file_state.GetDirtyFileAction( 'aaaa' ),
+                 equal_to( lsp.ServerFileState.CHANGE_FILE ) )
+    assert_that( file_state.contents, equal_to( 'aaaa' ) )
+
+
 @UnixOnly
 def UriToFilePath_Unix_test():
   assert_that( calling( lsp.UriToFilePath ).with_args( 'test' ),
@@ -203,6 +255,96 @@ def CodepointsToUTF16CodeUnitsAndReverse_test( line_value,
                equal_to( codepoints ) )
 
 
+def LineOffsetIndex_test():
+  lines = [ '', 'abcdef', '😉test', 'te😉st', 'née', 'a€😉bc' ]
+  index = lsp.LineOffsetIndex( lines )
+  assert_that( len( index ), equal_to( len( lines ) ) )
+
+  for line_index, line_value in enumerate( lines ):
+    assert_that( index[ line_index ], equal_to( line_value ) )
+    # Offsets splitting a surrogate pair are not valid.
+    code_unit_offsets = [
+      len( line_value[ : codepoint ].encode( 'utf-16-le' ) ) // 2
+      for codepoint in range( 1, len( line_value ) + 1 ) ]
+    code_units = len( line_value.encode( 'utf-16-le' ) ) // 2
+    for offset in code_unit_offsets + [ code_units + 1, code_units + 2 ]:
+      codepoints = lsp.UTF16CodeUnitsToCodepoints( line_value, offset )
+      assert_that( index.UTF16CodeUnitsToCodepoints( line_index, offset ),
+                   equal_to( codepoints ) )
+      assert_that( index.UTF16CodeUnitsToBytes( line_index, offset ),
+                   equal_to( CodepointOffsetToByteOffset( line_value,
+                                                          codepoints ) ) )
+    for offset in range( 1, len( line_value ) + 3 ):
+      assert_that( index.CodepointsToUTF16CodeUnits( line_index, offset ),
+                   equal_to( lsp.CodepointsToUTF16CodeUnits( line_value,
+                                                             offset ) ) )
+
+
+@pytest.mark.parametrize( 'code_unit_offset,codepoints,byte_offset', [
+    # Start of the line, before the astral character.
+    ( 1, 1, 1 ),
+    # Inside the surrogate pair.
+    ( 2, 1, 1 ),
+    ( 3, 2, 5 ),
+  ] )
+def LineOffsetIndex_LeadingAstralCharacter_test( code_unit_offset,
+                                                 codepoints,
+                                                 byte_offset ):
+  index = lsp.LineOffsetIndex( [ '😀a' ] )
+  assert_that( index.UTF16CodeUnitsToCodepoints( 0, code_unit_offset ),
+               equal_to( codepoints ) )
+  assert_that( index.UTF16CodeUnitsToBytes( 0, code_unit_offset ),
+               equal_to( byte_offset ) )
+
+
+def _ApplyContentChange( contents, change ):
+  lines = contents.split( '\n' )
+  start = change[ 'range' ][ 'start' ]
+  end = change[ 'range' ][ 'end' ]
+
+  def Offset( position ):
+    line_num = position[ 'line' ]
+    line_start = sum( len( line ) + 1 for line in lines[ : line_num ] )
+    return line_start + lsp.UTF16CodeUnitsToCodepoints(
+      lines[ line_num ], position[ 'character' ] )
+
+  return ( contents[ : Offset( start ) ] +
+           change[ 'text' ] +
+           contents[ Offset( end ) : ] )
+
+
+@pytest.mark.parametrize( 'old,new,start,end,text', [
+    # Change in the middle of the document.
+    ( 'a\nb\nc\n', 'a\nxy\nc\n', ( 1, 0 ), ( 2, 0 ), 'xy\n' ),
+    # Line inserted.
+    ( 'a\nb\nc', 'a\nb\nnew\nc', ( 2, 0 ), ( 2, 0 ), 'new\n' ),
+    # Line deleted.
+    ( 'a\nb\nc', 'a\nc', ( 1, 0 ), ( 2, 0 ), '' ),
+    # Change on the last line, which has no newline.
+    ( 'a\nb\ncd', 'a\nb\ncde', ( 2, 0 ), ( 2, 2 ), 'cde' ),
+    # Text appended after a trailing newline.
+    ( 'a\n', 'a\nb', ( 1, 0 ), ( 1, 0 ), 'b' ),
+    # Newline appended to a document without one.
+    ( 'a', 'a\nb', ( 0, 0 ), ( 0, 1 ), 'a\nb' ),
+    # Everything removed.
+    ( 'a\nb', '', ( 0, 0 ), ( 1, 1 ), '' ),
+    # End position is in UTF-16 code units.
+    ( 'a\n😉', 'a\n😉b', ( 1, 0 ), ( 1, 2 ), '😉b' ),
+    # Windows line endings.
+    ( 'a\r\nb\r\nc\r\n', 'a\r\nB\r\nc\r\n', ( 1, 0 ), ( 2, 0 ), 'B\r\n' ),
+  ] )
+def IncrementalContentChange_test( old, new, start, end, text ):
+  change = lsp.IncrementalContentChange( old, new )
+  assert_that( change, equal_to( {
+    'range': {
+      'start': { 'line': start[ 0 ], 'character': start[ 1 ] },
+      'end': { 'line': end[ 0 ], 'character': end[ 1 ] },
+    },
+    'text': text
+  } ) )
+  assert_that( _ApplyContentChange( old, change ), equal_to( new ) )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
@@ -0,0 +1,127 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+import bottle
+from hamcrest import ( assert_that, contains_inanyorder, equal_to, has_entries,
+                       has_entry, has_key, is_not )
+from unittest.mock import patch
+from webtest import TestApp
+
+from ycmd import metrics
+from ycmd.metrics import LatencyHistogram, Metrics, MetricsPlugin, Phase
+
+
+def LatencyHistogram_Empty_test():
+  assert_that( LatencyHistogram().Snapshot(), has_entries( {
+    'count': 0,
+    'total_ms': 0,
+    'max_ms': 0,
+    'p50_ms': None,
+    'p99_ms': None,
+  } ) )
+
+
+def LatencyHistogram_Record_test():
+  histogram = LatencyHistogram()
+  for elapsed_ms in [ 0.5, 1, 3, 3, 4, 40, 7000 ]:
+    histogram.Record( elapsed_ms )
+
+  assert_that( histogram.Snapshot(), has_entries( {
+    'count': 7,
+    'total_ms': 7051.5,
+    'max_ms': 7000,
+    'p50_ms': 5,
+    'p90_ms': 7000,
+    'buckets': has_entries( {
+      '1': 2,
+      '2': 0,
+      '5': 3,
+      '50': 1,
+      '+Inf': 1
+    } )
+  } ) )
+
+
+def LatencyHistogram_PercentileCappedByMax_test():
+  histogram = LatencyHistogram()
+  histogram.Record( 120 )
+  assert_that( histogram.Percentile( 50 ), equal_to( 120 ) )
+
+
+def Metrics_RecordAndClear_test():
+  registry = Metrics()
+  registry.Record( 'route', '/a', 0.001 )
+  registry.Record( 'route', '/a', 0.003 )
+  with registry.Timer( 'completer', 'Foo' ):
+    pass
+
+  snapshot = registry.Snapshot()
+  assert_that( snapshot, has_entries( {
+    'route': has_entry( '/a', has_entries( { 'count': 2, 'total_ms': 4 } ) ),
+    'completer': has_entry( 'Foo', has_entry( 'count', 1 ) )
+  } ) )
+
+  registry.Clear()
+  assert_that( registry.Snapshot(), equal_to( {} ) )
+
+
+@patch.object( metrics, 'METRICS', Metrics() )
+def MetricsPlugin_RecordsRoutesAndPhases_test():
+  app = bottle.Bottle()
+
+  @app.post( '/echo' )
+  def Echo():
+    with Phase( 'serialise' ):
+      return bottle.request.json[ 'value' ]
+
+  app.install( MetricsPlugin() )
+  assert_that( TestApp( app ).post_json( '/echo', { 'value': 'abc' } ).text,
+               equal_to( 'abc' ) )
+
+  snapshot = metrics.METRICS.Snapshot()
+  assert_that( snapshot, has_entries( {
+    'route': has_entry( '/echo', has_entry( 'count', 1 ) ),
+    'phase': has_entries( {
+      'json_parse': has_entry( 'count', 1 ),
+      'serialise': has_entry( 'count', 1 ),
+      'compute': has_entry( 'count', 1 )
+    } )
+  } ) )
+  assert_that( snapshot[ 'phase' ].keys(),
+               contains_inanyorder( 'json_parse', 'serialise', 'compute' ) )
+
+
+@patch.object( metrics, 'METRICS', Metrics() )
+def MetricsPlugin_GetRequestNotParsed_test():
+  app = bottle.Bottle()
+
+  @app.get( '/value' )
+  def Value():
+    return 'abc'
+
+  app.install( MetricsPlugin() )
+  TestApp( app ).get( '/value' )
+
+  assert_that( metrics.METRICS.Snapshot(), has_entries( {
+    'route': has_key( '/value' ),
+    'phase': is_not( has_key( 'json_parse' ) )
+  } ) )
+
+
+def Dummy_test():
+  # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
+  assert True
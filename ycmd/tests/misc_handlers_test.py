@@ -16,12 +16,21 @@
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
 from hamcrest import ( any_of, assert_that, contains_exactly, empty, equal_to,
-                       has_entries, instance_of )
+                       greater_than, has_entries, has_entry, has_items,
+                       instance_of, less_than )
 from unittest.mock import patch
 import requests
-
+import threading
+import time
+
+from ycmd import handlers
+from ycmd.buffer_store import BufferVersionMismatch
+from ycmd.completers.completer import MESSAGE_POLL_TIMEOUT
+from ycmd.request_scheduler import BACKGROUND, DEFAULT_MAX_CONCURRENCY
+from ycmd.request_validation import ServerError
 from ycmd.tests import IsolatedYcmd, PathToTestFile, SharedYcmd
 from ycmd.tests.test_utils import ( BuildRequest,
+                                    CompletionEntryMatcher,
                                     DummyCompleter,
                                     PatchCompleter,
                                     SignatureAvailableMatcher,
@@ -40,6 +49,19 @@ def MiscHandlers_Healthy_Subserver_test( app ):
                  equal_to( True ) )
 
 
+@SharedYcmd
+def MiscHandlers_Metrics_test( app ):
+  app.post_json( '/completions', BuildRequest( contents = 'foo fo',
+                                               column_num = 7 ) )
+  with patch( 'ycmd.handlers.wsgi_server' ) as wsgi_server:
+    wsgi_server.QueueDepth.return_value = 3
+    assert_that( app.get( '/metrics' ).json, has_entries( {
+      'latency': has_entry( 'completer', has_entry(
+        'GeneralCompleterStore', has_entry( 'count', instance_of( int ) ) ) ),
+      'queue_depths': has_entries( { 'wsgi_server': 3 } )
+    } ) )
+
+
 @SharedYcmd
 def MiscHandlers_SignatureHelpAvailable_test( app ):
   response = app.get( '/signature_help_available', expect_errors = True ).json
@@ -166,7 +188,23 @@ def MiscHandlers_DebugInfo_ExtraConfLoaded_test( app ):
         'path': instance_of( str ),
         'is_loaded': True
       } ),
-      'completer': None
+      'completer': None,
+      'completions_cache': None,
+      'repositories': has_entries( {
+        'candidates': has_entries( {
+          'elements': instance_of( int ),
+          'memory_bytes': instance_of( int ),
+          'max_memory_bytes': greater_than( 0 ),
+          'evicted_elements': instance_of( int )
+        } ),
+        'characters': has_entries( { 'max_memory_bytes': 0 } ),
+        'code_points': has_entries( { 'max_memory_bytes': 0 } )
+      } ),
+      'scheduler': has_entries( {
+        'interactive': has_entries( { 'running': 0, 'waiting': 0 } ),
+        'command': has_entries( { 'running': 0, 'waiting': 0 } ),
+        'background': has_entries( { 'running': 0, 'waiting': 0 } )
+      } )
     } )
   )
 
@@ -233,6 +271,73 @@ def MiscHandlers_ReceiveMessages_NotSupportedByCompleter_test( app ):
                  equal_to( False ) )
 
 
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.OnFileReadyToParse',
+        return_value = [ 'diagnostic' ] )
+def MiscHandlers_ReceiveMessages_AsyncFileReadyToParse_test( parse, app ):
+  with PatchCompleter( DummyCompleter, filetype = 'dummy_filetype' ):
+    request_data = BuildRequest( filetype = 'dummy_filetype',
+                                 filepath = '/foo',
+                                 event_name = 'FileReadyToParse' )
+    assert_that( app.post_json( '/event_notification', request_data ).json,
+                 equal_to( {} ) )
+    assert_that( app.post_json( '/receive_messages', request_data ).json,
+                 contains_exactly( {
+                   'diagnostics': [ 'diagnostic' ],
+                   'filepath': '/foo'
+                 } ) )
+    parse.assert_called_once()
+
+
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1,
+                 'event_debounce_ms': { 'dummy_filetype': 100 } } )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.OnFileReadyToParse',
+        return_value = [] )
+def MiscHandlers_ReceiveMessages_AsyncFileReadyToParse_Coalesced_test( parse,
+                                                                       app ):
+  with PatchCompleter( DummyCompleter, filetype = 'dummy_filetype' ):
+    for contents in [ 'a', 'ab', 'abc' ]:
+      app.post_json( '/event_notification',
+                     BuildRequest( filetype = 'dummy_filetype',
+                                   filepath = '/foo',
+                                   contents = contents,
+                                   event_name = 'FileReadyToParse' ) )
+    request_data = BuildRequest( filetype = 'dummy_filetype' )
+    assert_that( app.post_json( '/receive_messages', request_data ).json,
+                 contains_exactly( {
+                   'diagnostics': [],
+                   'filepath': '/foo'
+                 } ) )
+    parse.assert_called_once()
+    assert_that( parse.call_args[ 0 ][ 0 ][ 'lines' ], equal_to( [ 'abc' ] ) )
+
+
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+@patch( 'ycmd.tests.test_utils.DummyCompleter.OnFileReadyToParse',
+        side_effect = RuntimeError( 'Parse failed' ) )
+def MiscHandlers_ReceiveMessages_AsyncFileReadyToParse_Error_test( parse,
+                                                                   app ):
+  with PatchCompleter( DummyCompleter, filetype = 'dummy_filetype' ):
+    request_data = BuildRequest( filetype = 'dummy_filetype',
+                                 filepath = '/foo',
+                                 event_name = 'FileReadyToParse' )
+    app.post_json( '/event_notification', request_data )
+    assert_that( app.post_json( '/receive_messages', request_data ).json,
+                 contains_exactly( has_entries( {
+                   'error': ErrorMatcher( RuntimeError, 'Parse failed' ),
+                   'filepath': '/foo'
+                 } ) ) )
+
+
+@patch( 'ycmd.completers.completer.MESSAGE_POLL_TIMEOUT', 0.01 )
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+def MiscHandlers_ReceiveMessages_AsyncFileReadyToParse_Timeout_test( app ):
+  with PatchCompleter( DummyCompleter, filetype = 'dummy_filetype' ):
+    request_data = BuildRequest( filetype = 'dummy_filetype' )
+    assert_that( app.post_json( '/receive_messages', request_data ).json,
+                 equal_to( True ) )
+
+
 @SharedYcmd
 @patch( 'ycmd.completers.completer.Completer.ShouldUseSignatureHelpNow',
         return_value = True )
@@ -270,6 +375,136 @@ def MiscHandlers_SignatureHelp_ComputeSignatureThrows_test( compute_sig, app ):
     } ) )
 
 
+@SharedYcmd
+def MiscHandlers_Batch_test( app ):
+  request_data = BuildRequest( filepath = '/foo',
+                               contents = 'foo foogoo ba\nfo',
+                               line_num = 2,
+                               column_num = 3 )
+  file_data = request_data.pop( 'file_data' )
+
+  batch = {
+    'file_data': file_data,
+    'requests': [
+      { 'handler': 'event_notification',
+        'request': dict( request_data, event_name = 'FileReadyToParse' ) },
+      { 'handler': 'completions', 'request': request_data },
+      { 'handler': 'unknown', 'request': request_data },
+      { 'handler': 'receive_messages',
+        'request': { 'column_num': 3, 'filepath': '/foo' } },
+      { 'handler': 'receive_messages', 'request': request_data },
+    ]
+  }
+
+  assert_that( app.post_json( '/batch', batch ).json, contains_exactly(
+    has_entries( { 'response': empty() } ),
+    has_entries( { 'response': has_entries( {
+      'completions': has_items( CompletionEntryMatcher( 'foo' ),
+                                CompletionEntryMatcher( 'foogoo' ) ),
+      'completion_start_column': 1,
+      'errors': empty()
+    } ) } ),
+    has_entries( {
+      'error': ErrorMatcher( ValueError, 'Unknown batch handler: unknown' )
+    } ),
+    has_entries( {
+      'error': ErrorMatcher( ServerError,
+                             'Request missing required field: line_num' )
+    } ),
+    has_entries( { 'response': equal_to( False ) } )
+  ) )
+
+
+@IsolatedYcmd( { 'async_file_ready_to_parse': 1 } )
+def MiscHandlers_Batch_ReceiveMessages_DoesNotWait_test( app ):
+  with PatchCompleter( DummyCompleter, filetype = 'dummy_filetype' ):
+    request_data = BuildRequest( filetype = 'dummy_filetype' )
+    batch = {
+      'requests': [
+        { 'handler': 'completions', 'request': request_data },
+        { 'handler': 'receive_messages', 'request': request_data },
+      ]
+    }
+
+    start = time.perf_counter()
+    response = app.post_json( '/batch', batch ).json
+    assert_that( time.perf_counter() - start,
+                 less_than( MESSAGE_POLL_TIMEOUT / 2 ) )
+    assert_that( response, contains_exactly(
+      has_entries( { 'response': has_entries( { 'errors': empty() } ) } ),
+      has_entries( { 'response': equal_to( True ) } )
+    ) )
+
+
+@IsolatedYcmd()
+def MiscHandlers_EventNotification_LightweightEventNotScheduled_test( app ):
+  scheduler = handlers._server_state.request_scheduler
+  release = threading.Event()
+
+  def Parse():
+    with scheduler.Run( BACKGROUND ):
+      release.wait()
+
+  # Fill all the BACKGROUND slots, as long parses would.
+  threads = [ threading.Thread( target = Parse )
+              for _ in range( DEFAULT_MAX_CONCURRENCY[ BACKGROUND ] ) ]
+  for thread in threads:
+    thread.start()
+  while ( scheduler.DebugInfo()[ BACKGROUND ][ 'running' ] <
+          DEFAULT_MAX_CONCURRENCY[ BACKGROUND ] ):
+    time.sleep( 0.01 )
+
+  try:
+    request_data = BuildRequest( filepath = '/foo',
+                                 event_name = 'BufferUnload' )
+    assert_that( app.post_json( '/event_notification', request_data ).json,
+                 equal_to( {} ) )
+  finally:
+    release.set()
+    for thread in threads:
+      thread.join()
+
+
+@IsolatedYcmd()
+def MiscHandlers_BufferChanges_test( app ):
+  event_data = BuildRequest( filepath = '/foo',
+                             contents = 'foo foogoo ba\n',
+                             event_name = 'FileReadyToParse' )
+  event_data[ 'file_data' ][ '/foo' ][ 'version' ] = 1
+  app.post_json( '/event_notification', event_data )
+
+  completion_data = BuildRequest( filepath = '/foo',
+                                  line_num = 2,
+                                  column_num = 3 )
+  completion_data[ 'file_data' ][ '/foo' ] = {
+    'filetypes': [ 'foo' ],
+    'base_version': 1,
+    'version': 2,
+    'changes': [ { 'start_line': 2, 'end_line': 2, 'lines': [ 'fo' ] } ]
+  }
+  response = app.post_json( '/completions', completion_data ).json
+  assert_that( response, has_entries( {
+    'completions': has_items( CompletionEntryMatcher( 'foo' ),
+                              CompletionEntryMatcher( 'foogoo' ) ),
+    'completion_start_column': 1
+  } ) )
+
+  # Once the buffer is unloaded, changes can't be applied to it.
+  event_data = BuildRequest( filepath = '/foo', event_name = 'BufferUnload' )
+  app.post_json( '/event_notification', event_data )
+  completion_data[ 'file_data' ][ '/foo' ][ 'base_version' ] = 2
+  completion_data[ 'file_data' ][ '/foo' ][ 'version' ] = 3
+  response = app.post_json( '/completions',
+                            completion_data,
+                            expect_errors = True )
+  assert_that( response.status_code,
+               equal_to( requests.codes.internal_server_error ) )
+  assert_that( response.json,
+               ErrorMatcher( BufferVersionMismatch,
+                             'Changes to /foo are against version 2 but the '
+                             'server has version None' ) )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
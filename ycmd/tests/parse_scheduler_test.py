@@ -0,0 +1,107 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+from hamcrest import ( assert_that, contains_exactly, equal_to,
+                       greater_than_or_equal_to, has_length, less_than )
+import threading
+import time
+
+from ycmd.parse_scheduler import ParseScheduler
+
+
+def ParseScheduler_RunsJobsInOrder_test():
+  scheduler = ParseScheduler()
+  parsed = []
+  done = threading.Event()
+
+  def Fail( request_data ):
+    raise RuntimeError( 'Parse failed' )
+
+  scheduler.Schedule( parsed.append, { 'filepath': '/a' } )
+  # An error doesn't stop the following jobs.
+  scheduler.Schedule( Fail, { 'filepath': '/b' } )
+  scheduler.Schedule( parsed.append, { 'filepath': '/c' } )
+  scheduler.Schedule( lambda request_data: done.set(), { 'filepath': '/d' } )
+
+  assert_that( done.wait( 10 ), equal_to( True ) )
+  assert_that( parsed, equal_to( [ { 'filepath': '/a' },
+                                   { 'filepath': '/c' } ] ) )
+  scheduler.Shutdown()
+
+
+def ParseScheduler_CoalescesAndDebounces_test():
+  scheduler = ParseScheduler()
+  parsed = []
+  done = threading.Event()
+
+  def Parse( request_data ):
+    parsed.append( ( request_data[ 'filepath' ], request_data[ 'version' ] ) )
+
+  start = time.monotonic()
+  for version in range( 3 ):
+    scheduler.Schedule( Parse,
+                        { 'filepath': '/a', 'version': version },
+                        key = ( '/a', 'FileReadyToParse' ),
+                        delay = 0.2 )
+  scheduler.Schedule( Parse,
+                      { 'filepath': '/b', 'version': 0 },
+                      key = ( '/b', 'FileReadyToParse' ),
+                      delay = 0.1 )
+  scheduler.Schedule( Parse,
+                      { 'filepath': '/c', 'version': 0 },
+                      key = ( '/c', 'FileReadyToParse' ),
+                      delay = 0.1 )
+  scheduler.Discard( '/c' )
+  assert_that( scheduler.QueueDepth(), equal_to( 2 ) )
+  scheduler.Schedule( lambda request_data: done.set(),
+                      { 'filepath': '/d' },
+                      delay = 0.3 )
+
+  assert_that( done.wait( 10 ), equal_to( True ) )
+  assert_that( time.monotonic() - start >= 0.3, equal_to( True ) )
+  # Only the latest version of /a is parsed, after /b which was due first.
+  assert_that( parsed, contains_exactly( ( '/b', 0 ), ( '/a', 2 ) ) )
+  scheduler.Shutdown()
+
+
+def ParseScheduler_ContinuousEventsStillParsed_test():
+  scheduler = ParseScheduler()
+  parsed = []
+
+  def Parse( request_data ):
+    parsed.append( ( time.monotonic(), request_data[ 'version' ] ) )
+
+  # Events keep coming faster than the debounce window.
+  start = time.monotonic()
+  version = 0
+  while time.monotonic() - start < 1:
+    scheduler.Schedule( Parse,
+                        { 'filepath': '/a', 'version': version },
+                        key = ( '/a', 'FileReadyToParse' ),
+                        delay = 0.2 )
+    version += 1
+    time.sleep( 0.02 )
+  scheduler.Shutdown()
+
+  # Each parse is postponed by at most twice the window.
+  assert_that( parsed, has_length( greater_than_or_equal_to( 2 ) ) )
+  assert_that( parsed[ 0 ][ 0 ] - start, less_than( 0.6 ) )
+
+
+def Dummy_test():
+  # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
+  assert True
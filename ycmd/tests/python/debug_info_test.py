@@ -21,8 +21,9 @@ from hamcrest import ( assert_that,
                        has_entries,
                        instance_of )
 
-from ycmd.tests.python import SharedYcmd
+from ycmd.tests.python import IsolatedYcmd, PathToTestFile, SharedYcmd
 from ycmd.tests.test_utils import BuildRequest
+from ycmd.utils import ReadFile
 
 
 @SharedYcmd
@@ -62,6 +63,29 @@ def DebugInfo_test( app ):
   )
 
 
+@IsolatedYcmd()
+def DebugInfo_CompletionsCache_test( app ):
+  filepath = PathToTestFile( 'basic.py' )
+  completion_data = BuildRequest( filepath = filepath,
+                                  filetype = 'python',
+                                  contents = ReadFile( filepath ),
+                                  line_num = 7,
+                                  column_num = 3 )
+  app.post_json( '/completions', completion_data )
+  app.post_json( '/completions', completion_data )
+
+  assert_that(
+    app.post_json( '/debug_info', completion_data ).json,
+    has_entry( 'completions_cache', has_entries( {
+      'entries': 1,
+      'size_bytes': instance_of( int ),
+      'hits': 1,
+      'misses': 1,
+      'evictions': 0
+    } ) )
+  )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
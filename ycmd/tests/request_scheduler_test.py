@@ -0,0 +1,134 @@
+# Copyright (C) 2026 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+from hamcrest import assert_that, equal_to, has_entries
+import threading
+import time
+
+from ycmd.request_scheduler import ( BACKGROUND, COMMAND, INTERACTIVE,
+                                     RequestScheduler )
+
+
+def _WaitUntil( predicate ):
+  deadline = time.monotonic() + 10
+  while not predicate():
+    assert time.monotonic() < deadline
+    time.sleep( 0.01 )
+
+
+def _StartRequest( scheduler, priority_class, started, release ):
+  def Request():
+    with scheduler.Run( priority_class ):
+      started.append( priority_class )
+      release.wait()
+
+  thread = threading.Thread( target = Request )
+  thread.start()
+  return thread
+
+
+def RequestScheduler_BoundedConcurrency_test():
+  scheduler = RequestScheduler( { INTERACTIVE: 2, COMMAND: 1, BACKGROUND: 1 } )
+  started = []
+  release = threading.Event()
+
+  threads = [ _StartRequest( scheduler, COMMAND, started, release )
+              for _ in range( 3 ) ]
+  _WaitUntil( lambda: scheduler.DebugInfo()[ COMMAND ][ 'waiting' ] == 2 )
+  assert_that( scheduler.DebugInfo(), has_entries( {
+    INTERACTIVE: { 'running': 0, 'waiting': 0, 'max_concurrency': 2 },
+    COMMAND: { 'running': 1, 'waiting': 2, 'max_concurrency': 1 },
+  } ) )
+
+  # Higher priority classes are not limited by the running commands.
+  with scheduler.Run( INTERACTIVE ):
+    pass
+
+  release.set()
+  for thread in threads:
+    thread.join()
+  assert_that( started, equal_to( [ COMMAND ] * 3 ) )
+  assert_that( scheduler.DebugInfo()[ COMMAND ],
+               has_entries( { 'running': 0, 'waiting': 0 } ) )
+
+
+def RequestScheduler_HigherPriorityStartsFirst_test():
+  scheduler = RequestScheduler( { INTERACTIVE: 1, COMMAND: 1, BACKGROUND: 1 },
+                                max_wait_seconds = 60 )
+  started = []
+  release_first = threading.Event()
+  release = threading.Event()
+
+  first = _StartRequest( scheduler, INTERACTIVE, started, release_first )
+  _WaitUntil( lambda: started )
+
+  # The interactive request waits for the running one, and the background one
+  # waits for the interactive one although it is below its own limit.
+  waiting_interactive = _StartRequest( scheduler,
+                                       INTERACTIVE,
+                                       started,
+                                       release )
+  _WaitUntil( lambda: scheduler.DebugInfo()[ INTERACTIVE ][ 'waiting' ] )
+  background = _StartRequest( scheduler, BACKGROUND, started, release )
+  _WaitUntil( lambda: scheduler.DebugInfo()[ BACKGROUND ][ 'waiting' ] )
+
+  release_first.set()
+  _WaitUntil( lambda: len( started ) == 3 )
+  assert_that( started, equal_to( [ INTERACTIVE, INTERACTIVE, BACKGROUND ] ) )
+
+  release.set()
+  for thread in [ first, waiting_interactive, background ]:
+    thread.join()
+
+
+def RequestScheduler_LowerPriorityNotStarved_test():
+  scheduler = RequestScheduler( { INTERACTIVE: 1, COMMAND: 1, BACKGROUND: 1 },
+                                max_wait_seconds = 0.1 )
+  started = []
+  release_interactive = threading.Event()
+  release = threading.Event()
+
+  # An interactive request is stuck, and another one waits for it.
+  interactive = [ _StartRequest( scheduler,
+                                 INTERACTIVE,
+                                 started,
+                                 release_interactive )
+                  for _ in range( 2 ) ]
+  _WaitUntil( lambda: scheduler.DebugInfo()[ INTERACTIVE ][ 'waiting' ] )
+
+  # The background request starts anyway once it has waited long enough.
+  background = _StartRequest( scheduler, BACKGROUND, started, release )
+  _WaitUntil( lambda: BACKGROUND in started )
+  assert_that( scheduler.DebugInfo()[ INTERACTIVE ],
+               has_entries( { 'running': 1, 'waiting': 1 } ) )
+
+  # It still respects the limit of its own class.
+  other_background = _StartRequest( scheduler, BACKGROUND, started, release )
+  _WaitUntil( lambda: scheduler.DebugInfo()[ BACKGROUND ][ 'waiting' ] )
+  time.sleep( 0.2 )
+  assert_that( started.count( BACKGROUND ), equal_to( 1 ) )
+
+  release_interactive.set()
+  release.set()
+  for thread in interactive + [ background, other_background ]:
+    thread.join()
+  assert_that( started.count( BACKGROUND ), equal_to( 2 ) )
+
+
+def Dummy_test():
+  # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
+  assert True
@@ -17,9 +17,10 @@
 
 import pytest
 from hamcrest import ( assert_that, calling, contains_exactly, empty, equal_to,
-                       has_entry, has_string, raises )
+                       has_entry, has_string, is_not, raises )
 
 from ycmd.utils import ToBytes
+from ycmd.buffer_store import BufferFileData
 from ycmd.request_wrap import RequestWrap
 
 
@@ -407,6 +408,75 @@ def ExtraConfData_test():
                has_entry( 'key', contains_exactly( 'value' ) ) )
 
 
+@pytest.mark.parametrize( 'other,equal', [
+    # Typing the query on the current line.
+    ( PrepareJson( 'foo\nabc.de\nbar', 2, 7 ), True ),
+    ( PrepareJson( 'foo\nabc.def\nbar', 2, 5 ), True ),
+    # Any other change.
+    ( PrepareJson( 'foo\nabd.def\nbar', 2, 8 ), False ),
+    ( PrepareJson( 'foo\nabc.def\nbaz', 2, 8 ), False ),
+    ( PrepareJson( 'foo\nabc.def\nbar\n', 2, 8 ), False ),
+    ( PrepareJson( 'foo\nabc.def\nbar', 2, 8, 'cpp' ), False ),
+    ( PrepareJson( 'foo\nabc.def\nbar', 2, 8, force_semantic = True ),
+      False ),
+    ( PrepareJson( 'foo\nabc.def\nbar', 2, 8, extra_conf_data = { 'a': 1 } ),
+      False ),
+  ] )
+def CacheKey_test( other, equal ):
+  wrap = RequestWrap( PrepareJson( 'foo\nabc.def\nbar', 2, 8 ) )
+  other = RequestWrap( other )
+  assert_that( wrap == other, equal_to( equal ) )
+  if equal:
+    assert_that( wrap[ 'cache_key' ], equal_to( other[ 'cache_key' ] ) )
+  else:
+    assert_that( wrap[ 'cache_key' ],
+                 is_not( equal_to( other[ 'cache_key' ] ) ) )
+
+
+def _RequestWithOtherFile( other_file_data ):
+  message = PrepareJson( 'abc.def', 1, 8 )
+  message[ 'file_data' ][ '/bar' ] = other_file_data
+  return RequestWrap( message )
+
+
+def CacheKey_OtherFiles_test():
+  wrap = _RequestWithOtherFile( { 'filetypes': [ 'cpp' ],
+                                  'contents': 'foo\nbar' } )
+  assert_that(
+    _RequestWithOtherFile( { 'filetypes': [ 'cpp' ],
+                             'contents': 'foo\nbar' } )[ 'cache_key' ],
+    equal_to( wrap[ 'cache_key' ] ) )
+  assert_that(
+    _RequestWithOtherFile( { 'filetypes': [ 'cpp' ],
+                             'contents': 'foo\nbaz' } )[ 'cache_key' ],
+    is_not( equal_to( wrap[ 'cache_key' ] ) ) )
+  assert_that(
+    _RequestWithOtherFile( { 'filetypes': [ 'c' ],
+                             'contents': 'foo\nbar' } )[ 'cache_key' ],
+    is_not( equal_to( wrap[ 'cache_key' ] ) ) )
+
+  # The lines of buffers rebuilt from changes are compared.
+  rebuilt = _RequestWithOtherFile(
+    BufferFileData( { 'filetypes': [ 'cpp' ] }, [ 'foo', 'bar' ] ) )
+  assert_that(
+    _RequestWithOtherFile(
+      BufferFileData( { 'filetypes': [ 'cpp' ] }, [ 'foo', 'bar' ] )
+    )[ 'cache_key' ],
+    equal_to( rebuilt[ 'cache_key' ] ) )
+  assert_that(
+    _RequestWithOtherFile(
+      BufferFileData( { 'filetypes': [ 'cpp' ] }, [ 'foo', 'baz' ] )
+    )[ 'cache_key' ],
+    is_not( equal_to( rebuilt[ 'cache_key' ] ) ) )
+
+
+def CacheKey_StartColumnSet_test():
+  wrap = RequestWrap( PrepareJson( 'abc.def', 1, 8 ) )
+  cache_key = wrap[ 'cache_key' ]
+  wrap[ 'start_column' ] = 1
+  assert_that( wrap[ 'cache_key' ], is_not( equal_to( cache_key ) ) )
+
+
 def Dummy_test():
   # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
   assert True
@@ -29,6 +29,7 @@ from hamcrest import ( assert_that,
                        has_length,
                        has_property,
                        instance_of,
+                       is_not,
                        raises )
 from unittest.mock import patch, call
 from types import ModuleType
@@ -131,6 +132,22 @@ def RemoveIfExists_DoesntExist_test():
   assert_that( not os.path.exists( tempfile ) )
 
 
+def GetFileStatSignature_test():
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    filepath = os.path.join( tmp_dir, 'file' )
+    assert_that( utils.GetFileStatSignature( filepath ), equal_to( None ) )
+
+    with open( filepath, 'w' ) as f:
+      f.write( 'contents' )
+    signature = utils.GetFileStatSignature( filepath )
+    assert_that( utils.GetFileStatSignature( filepath ), equal_to( signature ) )
+
+    with open( filepath, 'a' ) as f:
+      f.write( ' changed' )
+    assert_that( utils.GetFileStatSignature( filepath ),
+                 is_not( equal_to( signature ) ) )
+
+
 def PathToFirstExistingExecutable_Basic_test():
   if utils.OnWindows():
     assert_that( utils.PathToFirstExistingExecutable( [ 'notepad.exe' ] ) )
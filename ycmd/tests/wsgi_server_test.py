@@ -0,0 +1,253 @@
+# Copyright (C) 2020 ycmd contributors
+#
+# This file is part of ycmd.
+#
+# ycmd is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ycmd is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
+
+from hamcrest import ( assert_that, calling, equal_to, less_than, none,
+                       raises )
+from http.client import HTTPConnection
+from unittest.mock import patch
+import contextlib
+import os
+import pytest
+import socket
+import threading
+import time
+import types
+
+from ycmd.tests.test_utils import TemporaryTestDir
+from ycmd.utils import OnWindows
+from ycmd.wsgi_server import PooledWSGIServer, StoppableWSGIServer
+
+
+def EchoApp( environ, start_response ):
+  body = environ[ 'wsgi.input' ].read(
+    int( environ.get( 'CONTENT_LENGTH' ) or 0 ) )
+  response = environ[ 'PATH_INFO' ].encode() + b':' + body
+  start_response( '200 OK', [ ( 'Content-Type', 'text/plain' ),
+                              ( 'Content-Length', str( len( response ) ) ) ] )
+  return [ response ]
+
+
+def IgnoreBodyApp( environ, start_response ):
+  start_response( '200 OK', [ ( 'Content-Length', '2' ) ] )
+  return [ b'ok' ]
+
+
+def NoContentLengthApp( environ, start_response ):
+  start_response( '200 OK', [] )
+  return [ b'o', b'k' ]
+
+
+class UnixSocketConnection( HTTPConnection ):
+  def __init__( self, path ):
+    super().__init__( 'localhost' )
+    self._path = path
+
+
+  def connect( self ):
+    self.sock = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    self.sock.connect( self._path )
+
+
+@contextlib.contextmanager
+def RunningServer( app, server_class = PooledWSGIServer, **kwargs ):
+  server = server_class( app, '127.0.0.1', 0, **kwargs )
+  thread = threading.Thread( target = server.serve_forever )
+  thread.start()
+  try:
+    yield server
+  finally:
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def Request( connection, path, body = None ):
+  connection.request( 'POST' if body else 'GET', path, body = body )
+  response = connection.getresponse()
+  return response, response.read()
+
+
+def PooledWSGIServer_KeepAlive_test():
+  with RunningServer( EchoApp ) as server:
+    connection = HTTPConnection( '127.0.0.1', server.server_port )
+    response, body = Request( connection, '/first', b'body' )
+    assert_that( response.version, equal_to( 11 ) )
+    assert_that( response.getheader( 'Connection' ), none() )
+    assert_that( body, equal_to( b'/first:body' ) )
+
+    sock = connection.sock
+    response, body = Request( connection, '/second' )
+    assert_that( body, equal_to( b'/second:' ) )
+    assert_that( connection.sock, equal_to( sock ) )
+    connection.close()
+
+
+def PooledWSGIServer_UnreadBodyIsDiscarded_test():
+  with RunningServer( IgnoreBodyApp ) as server:
+    connection = HTTPConnection( '127.0.0.1', server.server_port )
+    for _ in range( 3 ):
+      response, body = Request( connection, '/', b'x' * 100000 )
+      assert_that( response.status, equal_to( 200 ) )
+      assert_that( body, equal_to( b'ok' ) )
+    connection.close()
+
+
+def PooledWSGIServer_CloseWithoutContentLength_test():
+  with RunningServer( NoContentLengthApp ) as server:
+    connection = HTTPConnection( '127.0.0.1', server.server_port )
+    response, body = Request( connection, '/' )
+    assert_that( response.getheader( 'Connection' ), equal_to( 'close' ) )
+    assert_that( body, equal_to( b'ok' ) )
+    connection.close()
+
+
+def PooledWSGIServer_IdleConnectionReleasesWorker_test():
+  with RunningServer( EchoApp, threads = 1, keep_alive_timeout = 60 ) as server:
+    idle_connection = HTTPConnection( '127.0.0.1', server.server_port )
+    Request( idle_connection, '/idle' )
+
+    # The only worker is waiting on the idle connection, which is closed so that
+    # this request can be served without waiting for the keep-alive timeout.
+    connection = HTTPConnection( '127.0.0.1',
+                                 server.server_port,
+                                 timeout = 10 )
+    response, body = Request( connection, '/busy' )
+    assert_that( body, equal_to( b'/busy:' ) )
+    assert_that( response.getheader( 'Connection' ), none() )
+    connection.close()
+    idle_connection.close()
+
+
+def BlockingApp( started, release ):
+  def App( environ, start_response ):
+    started.set()
+    release.wait( 10 )
+    return EchoApp( environ, start_response )
+  return App
+
+
+def PooledWSGIServer_QueueFull_test():
+  started = threading.Event()
+  release = threading.Event()
+  with RunningServer( BlockingApp( started, release ),
+                      threads = 1,
+                      queue_size = 1 ) as server:
+    responses = {}
+
+    def SendRequest( path ):
+      connection = HTTPConnection( '127.0.0.1',
+                                   server.server_port,
+                                   timeout = 10 )
+      responses[ path ] = Request( connection, path )[ 1 ]
+      connection.close()
+
+    # The first connection keeps the only worker busy, and the second one waits
+    # for it in the queue.
+    busy = threading.Thread( target = SendRequest, args = ( '/busy', ) )
+    busy.start()
+    assert_that( started.wait( 10 ), equal_to( True ) )
+    queued = threading.Thread( target = SendRequest, args = ( '/queued', ) )
+    queued.start()
+    while server.QueueDepth() == 0:
+      time.sleep( 0.01 )
+
+    # Further connections are turned away rather than blocking the server.
+    connection = HTTPConnection( '127.0.0.1', server.server_port, timeout = 10 )
+    response, _ = Request( connection, '/rejected' )
+    assert_that( response.status, equal_to( 503 ) )
+    connection.close()
+
+    release.set()
+    busy.join()
+    queued.join()
+    assert_that( responses, equal_to( { '/busy': b'/busy:',
+                                        '/queued': b'/queued:' } ) )
+
+
+@patch( 'ycmd.wsgi_server.SHUTDOWN_TIMEOUT', 0.1 )
+def PooledWSGIServer_CloseWithBusyWorker_test():
+  started = threading.Event()
+  release = threading.Event()
+  server = PooledWSGIServer( BlockingApp( started, release ), '127.0.0.1', 0 )
+  thread = threading.Thread( target = server.serve_forever )
+  thread.start()
+  try:
+    connection = socket.create_connection( ( '127.0.0.1', server.server_port ) )
+    connection.sendall( b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n' )
+    assert_that( started.wait( 10 ), equal_to( True ) )
+
+    # The worker is stuck on the request, yet the server closes promptly.
+    start = time.monotonic()
+    server.shutdown()
+    server.server_close()
+    assert_that( time.monotonic() - start, less_than( 5 ) )
+    connection.close()
+  finally:
+    release.set()
+    thread.join()
+
+
+@pytest.mark.skipif( OnWindows(), reason = 'Unix domain sockets only' )
+@pytest.mark.parametrize( 'server_class', [ PooledWSGIServer,
+                                            StoppableWSGIServer ] )
+def WSGIServer_UnixSocket_test( server_class ):
+  with TemporaryTestDir() as tmp_dir:
+    path = os.path.join( tmp_dir, 'ycmd.sock' )
+    with RunningServer( EchoApp,
+                        server_class = server_class,
+                        unix_socket = path ) as server:
+      assert_that( server.server_address, equal_to( path ) )
+      assert_that( os.stat( path ).st_mode & 0o777, equal_to( 0o600 ) )
+
+      connection = UnixSocketConnection( path )
+      response, body = Request( connection, '/unix', b'body' )
+      assert_that( response.status, equal_to( 200 ) )
+      assert_that( body, equal_to( b'/unix:body' ) )
+      connection.close()
+
+    assert_that( os.path.exists( path ), equal_to( False ) )
+
+
+@pytest.mark.skipif( OnWindows(), reason = 'Unix domain sockets only' )
+def WSGIServer_UnixSocket_ReplacesStaleSocket_test():
+  with TemporaryTestDir() as tmp_dir:
+    path = os.path.join( tmp_dir, 'ycmd.sock' )
+    # Left behind by a server that was killed.
+    stale = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    stale.bind( path )
+    stale.close()
+
+    with RunningServer( EchoApp, unix_socket = path ):
+      connection = UnixSocketConnection( path )
+      response, body = Request( connection, '/unix' )
+      assert_that( body, equal_to( b'/unix:' ) )
+      connection.close()
+
+
+def WSGIServer_UnixSocket_NotSupported_test():
+  with patch( 'ycmd.wsgi_server.socket', new = types.SimpleNamespace() ):
+    assert_that(
+      calling( PooledWSGIServer ).with_args( EchoApp,
+                                             '127.0.0.1',
+                                             0,
+                                             unix_socket = 'ycmd.sock' ),
+      raises( RuntimeError, 'Unix domain sockets are not supported' ) )
+
+
+def Dummy_test():
+  # Workaround for https://github.com/pytest-dev/pytest-rerunfailures/issues/51
+  assert True
@@ -473,6 +473,17 @@ def GetModificationTime( path ):
     return 0
 
 
+def GetFileStatSignature( path ):
+  """Returns a tuple ( inode, size, mtime in nanoseconds ) which changes
+  whenever the file |path| is modified or replaced on disk, or None if the file
+  can't be accessed."""
+  try:
+    stat = os.stat( path )
+  except OSError:
+    return None
+  return ( stat.st_ino, stat.st_size, stat.st_mtime_ns )
+
+
 def ExpectedCoreVersion():
   return int( ReadFile( os.path.join( ROOT_DIR, 'CORE_VERSION' ) ) )
 
@@ -15,13 +15,365 @@
 # You should have received a copy of the GNU General Public License
 # along with ycmd.  If not, see <http://www.gnu.org/licenses/>.
 
-from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
-from socketserver import ThreadingMixIn
+from wsgiref.simple_server import ServerHandler, WSGIServer, WSGIRequestHandler
+from socketserver import TCPServer, ThreadingMixIn
+import os
+import queue
+import select
+import socket
+import stat
+import threading
+import time
 
+DEFAULT_WORKER_THREADS = 16
+DEFAULT_QUEUE_SIZE = 64
+# Seconds an idle persistent connection is kept open for.
+DEFAULT_KEEP_ALIVE_TIMEOUT = 30
+# While waiting on an idle connection, how often (in seconds) to check whether
+# the worker is needed elsewhere.
+KEEP_ALIVE_POLL_INTERVAL = 0.05
+# Seconds to wait for the workers to finish their current request when the
+# server is closed. Workers still busy after that are abandoned.
+SHUTDOWN_TIMEOUT = 5
+# Response sent to the connections which can't be queued for a worker.
+SERVICE_UNAVAILABLE_RESPONSE = ( b'HTTP/1.1 503 Service Unavailable\r\n'
+                                 b'Content-Length: 0\r\n'
+                                 b'Connection: close\r\n\r\n' )
 
-class StoppableWSGIServer( ThreadingMixIn, WSGIServer ):
+
+def _RemoveStaleUnixSocket( path ):
+  """Removes the socket file at |path| if no server is listening on it, e.g.
+  because a previous server was killed. Anything else at |path| is left alone,
+  so that binding fails."""
+  try:
+    if not stat.S_ISSOCK( os.stat( path ).st_mode ):
+      return
+  except FileNotFoundError:
+    return
+
+  with socket.socket( socket.AF_UNIX, socket.SOCK_STREAM ) as sock:
+    try:
+      sock.connect( path )
+    except ConnectionRefusedError:
+      os.unlink( path )
+
+
+class _UnixSocketServerMixin:
+  """Lets a WSGIServer listen on a Unix domain socket when its address is a path
+  instead of a ( host, port ) pair."""
+
+  def __init__( self, server_address, handler_class ):
+    if isinstance( server_address, str ):
+      if not hasattr( socket, 'AF_UNIX' ):
+        raise RuntimeError( 'Unix domain sockets are not supported on this '
+                            'platform' )
+      self.address_family = socket.AF_UNIX
+    super().__init__( server_address, handler_class )
+
+
+  def IsUnixSocket( self ):
+    return isinstance( self.server_address, str )
+
+
+  def server_bind( self ):
+    if not self.IsUnixSocket():
+      return super().server_bind()
+
+    _RemoveStaleUnixSocket( self.server_address )
+    # Only the user running the server may connect to it. The socket is created
+    # with these permissions, rather than changed after binding, so that no one
+    # else can connect in between.
+    old_umask = os.umask( 0o177 )
+    try:
+      TCPServer.server_bind( self )
+    finally:
+      os.umask( old_umask )
+    # Used to build the CGI environment of the requests.
+    self.server_name = 'localhost'
+    self.server_port = 0
+    self.setup_environ()
+
+
+  def server_close( self ):
+    super().server_close()
+    if self.IsUnixSocket():
+      try:
+        os.unlink( self.server_address )
+      except FileNotFoundError:
+        pass
+
+
+class _UnixSocketRequestHandlerMixin:
+  # TCP_NODELAY can't be set on a Unix domain socket.
+  disable_nagle_algorithm = False
+
+  def setup( self ):
+    # The peer of a Unix domain socket has no address, but the CGI environment
+    # and the request log expect a ( host, port ) pair.
+    self.client_address = ( 'localhost', 0 )
+    super().setup()
+
+
+class _UnixSocketRequestHandler( _UnixSocketRequestHandlerMixin,
+                                 WSGIRequestHandler ):
+  pass
+
+
+class StoppableWSGIServer( ThreadingMixIn, _UnixSocketServerMixin, WSGIServer ):
+  """WSGI server which starts a new thread for every connection. It listens on
+  the Unix domain socket |unix_socket| if given, and on |host|:|port|
+  otherwise."""
   daemon_threads = False
 
-  def __init__( self, app, host, port ):
-    super().__init__( ( host, port ), WSGIRequestHandler )
+  def __init__( self, app, host, port, unix_socket = None ):
+    if unix_socket:
+      super().__init__( unix_socket, _UnixSocketRequestHandler )
+    else:
+      super().__init__( ( host, port ), WSGIRequestHandler )
+    self.set_app( app )
+
+
+class _RequestBody:
+  """File-like wrapper around the connection's input stream which prevents the
+  application from reading past the end of the current request's body, and
+  which allows the unread remainder of the body to be discarded so that the
+  next request on the connection can be read."""
+
+  def __init__( self, rfile, length ):
+    self._rfile = rfile
+    self._remaining = length
+
+
+  def read( self, size = -1 ):
+    if size is None or size < 0 or size > self._remaining:
+      size = self._remaining
+    data = self._rfile.read( size )
+    self._remaining -= len( data )
+    return data
+
+
+  def readline( self, size = -1 ):
+    if size is None or size < 0 or size > self._remaining:
+      size = self._remaining
+    data = self._rfile.readline( size )
+    self._remaining -= len( data )
+    return data
+
+
+  def readlines( self, hint = -1 ):
+    return list( iter( self.readline, b'' ) )
+
+
+  def __iter__( self ):
+    return iter( self.readline, b'' )
+
+
+  def Discard( self ):
+    while self._remaining and self.read( 65536 ):
+      pass
+    return not self._remaining
+
+
+class _KeepAliveServerHandler( ServerHandler ):
+  http_version = '1.1'
+
+  def cleanup_headers( self ):
+    super().cleanup_headers()
+    # Without a Content-Length, the end of the response is signalled by closing
+    # the connection.
+    if 'Content-Length' not in self.headers:
+      self.request_handler.close_connection = True
+    if self.request_handler.close_connection:
+      self.headers[ 'Connection' ] = 'close'
+
+
+class _KeepAliveRequestHandler( WSGIRequestHandler ):
+  """Handles HTTP/1.1 requests on a persistent connection until the client
+  closes it, asks for it to be closed, stays idle for longer than the server's
+  keep-alive timeout, or the worker is needed for another connection."""
+  protocol_version = 'HTTP/1.1'
+  # Responses are written in several chunks (status line, headers, body). On a
+  # persistent connection, Nagle's algorithm would otherwise hold back the last
+  # chunk until the client acknowledges the previous ones.
+  disable_nagle_algorithm = True
+
+  def handle( self ):
+    self.close_connection = True
+    self._HandleOneRequest()
+    while not self.close_connection and self._WaitForNextRequest():
+      self._HandleOneRequest()
+
+
+  def _HandleOneRequest( self ):
+    self.raw_requestline = self.rfile.readline( 65537 )
+    if not self.raw_requestline:
+      self.close_connection = True
+      return
+    if len( self.raw_requestline ) > 65536:
+      self.requestline = ''
+      self.request_version = ''
+      self.command = ''
+      self.send_error( 414 )
+      return
+
+    if not self.parse_request(): # An error code has been sent, just exit
+      return
+
+    environ = self.get_environ()
+    if 'chunked' in self.headers.get( 'Transfer-Encoding', '' ).lower():
+      # Let the application deal with the encoding, but don't try to find where
+      # the next request starts.
+      self.close_connection = True
+      body = self.rfile
+    else:
+      body = _RequestBody( self.rfile,
+                           int( environ.get( 'CONTENT_LENGTH' ) or 0 ) )
+
+    handler = _KeepAliveServerHandler( body,
+                                       self.wfile,
+                                       self.get_stderr(),
+                                       environ,
+                                       multithread = True )
+    handler.request_handler = self # backpointer for logging
+    handler.run( self.server.get_app() )
+
+    if not self.close_connection and not body.Discard():
+      self.close_connection = True
+
+
+  def _WaitForNextRequest( self ):
+    """Waits for the start of the next request on the connection. Returns False
+    if the connection should be closed instead."""
+    deadline = time.monotonic() + self.server.keep_alive_timeout
+    while ( not self.server.IsStopping() and
+            not self.server.HasWaitingConnections() ):
+      # A previous read may have already buffered the start of the next request,
+      # so check the buffer (without blocking) before polling the socket.
+      self.connection.settimeout( 0 )
+      try:
+        if self.rfile.peek( 1 ):
+          return True
+      except OSError:
+        return False
+      finally:
+        self.connection.settimeout( self.timeout )
+
+      timeout = min( deadline - time.monotonic(), KEEP_ALIVE_POLL_INTERVAL )
+      if timeout <= 0:
+        return False
+      readable, _, _ = select.select( [ self.connection ], [], [], timeout )
+      if readable:
+        # Either data is available or the client closed the connection, which
+        # reads as an empty line.
+        return True
+    return False
+
+
+class _UnixSocketKeepAliveRequestHandler( _UnixSocketRequestHandlerMixin,
+                                          _KeepAliveRequestHandler ):
+  pass
+
+
+class PooledWSGIServer( _UnixSocketServerMixin, WSGIServer ):
+  """WSGI server which serves connections from a fixed-size pool of worker
+  threads instead of starting a new thread for every request. Connections are
+  kept alive between requests (HTTP/1.1) and at most |queue_size| accepted
+  connections wait for a worker, beyond which connections are answered with a
+  503 error and closed, so that the accept loop (and thus shutdown) never waits
+  for a worker. Like StoppableWSGIServer, it listens on |unix_socket| if
+  given."""
+
+  def __init__( self,
+                app,
+                host,
+                port,
+                threads = DEFAULT_WORKER_THREADS,
+                queue_size = DEFAULT_QUEUE_SIZE,
+                keep_alive_timeout = DEFAULT_KEEP_ALIVE_TIMEOUT,
+                unix_socket = None ):
+    self.request_queue_size = queue_size
+    self.keep_alive_timeout = keep_alive_timeout
+    if unix_socket:
+      super().__init__( unix_socket, _UnixSocketKeepAliveRequestHandler )
+    else:
+      super().__init__( ( host, port ), _KeepAliveRequestHandler )
     self.set_app( app )
+
+    self._connections = queue.Queue( maxsize = queue_size )
+    self._stopping = threading.Event()
+    self._workers = []
+    for _ in range( threads ):
+      worker = threading.Thread( target = self._Worker )
+      worker.daemon = True
+      worker.start()
+      self._workers.append( worker )
+
+
+  def process_request( self, request, client_address ):
+    try:
+      self._connections.put_nowait( ( request, client_address ) )
+    except queue.Full:
+      self._RejectRequest( request )
+
+
+  def _RejectRequest( self, request ):
+    try:
+      # Don't let a client which doesn't read block the accept loop.
+      request.settimeout( 0 )
+      request.sendall( SERVICE_UNAVAILABLE_RESPONSE )
+    except OSError:
+      pass
+    self.shutdown_request( request )
+
+
+  def server_close( self ):
+    super().server_close()
+    self._stopping.set()
+
+    # Close the connections still waiting for a worker, so that there is room in
+    # the queue to tell each worker to stop.
+    while True:
+      try:
+        item = self._connections.get_nowait()
+      except queue.Empty:
+        break
+      if item is not None:
+        self.shutdown_request( item[ 0 ] )
+    for _ in self._workers:
+      try:
+        self._connections.put_nowait( None )
+      except queue.Full:
+        break
+
+    # The workers are daemon threads, so a worker stuck on a long request
+    # doesn't prevent the process from exiting.
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for worker in self._workers:
+      worker.join( max( deadline - time.monotonic(), 0 ) )
+
+
+  def IsStopping( self ):
+    return self._stopping.is_set()
+
+
+  def HasWaitingConnections( self ):
+    return not self._connections.empty()
+
+
+  def QueueDepth( self ):
+    """Returns the number of connections waiting for a worker thread."""
+    return self._connections.qsize()
+
+
+  def _Worker( self ):
+    while True:
+      item = self._connections.get()
+      if item is None:
+        return
+      request, client_address = item
+      try:
+        self.finish_request( request, client_address )
+      except Exception:
+        self.handle_error( request, client_address )
+      finally:
+        self.shutdown_request( request )